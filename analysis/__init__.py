@@ -0,0 +1,24 @@
+from .sweep import parameter_grid, iter_sweep, run_sweep
+from .ensemble import EnsembleResult, run_ensemble
+from .attribution import host_time_attribution, CriticalPath, critical_path, format_report
+from .quanta_optimizer import QuantaOptimization, optimize_quanta
+from .maxplus import MaxPlusPrediction, MaxPlusSystem, build_maxplus_system, predict_host_time, validate_prediction
+
+__all__ = [
+    "parameter_grid",
+    "iter_sweep",
+    "run_sweep",
+    "EnsembleResult",
+    "run_ensemble",
+    "host_time_attribution",
+    "CriticalPath",
+    "critical_path",
+    "format_report",
+    "QuantaOptimization",
+    "optimize_quanta",
+    "MaxPlusPrediction",
+    "MaxPlusSystem",
+    "build_maxplus_system",
+    "predict_host_time",
+    "validate_prediction",
+]
@@ -0,0 +1,145 @@
+from typing import Any, TYPE_CHECKING
+from collections import Counter
+
+from engines.vectorized import QUANTA_SIMULATION, WAITING_ON_BARRIER, SYNCHRONIZATION
+
+if TYPE_CHECKING:
+    from multi_node import MultiNodeSimulation
+
+
+def host_time_attribution(simulation: "MultiNodeSimulation") -> list[dict[str, Any]]:
+    """Split the host time of every node into quanta (compute), barrier waiting and synchronization.
+
+    The numbers come from the accumulators the nodes keep up to date while simulating. A node that reached its goal
+    and waits for the others counts that time as waiting.
+    """
+    rows = []
+    for node in simulation.nodes:
+        total = node.current_host_time_nanoseconds
+        rows.append({
+            "node_id": node.get_id(),
+            "compute_host_time_nanoseconds": node.compute_host_time_nanoseconds,
+            "wait_host_time_nanoseconds": node.wait_host_time_nanoseconds,
+            "sync_host_time_nanoseconds": node.sync_host_time_nanoseconds,
+            "compute_share": node.compute_host_time_nanoseconds / total if total else 0.0,
+            "wait_share": node.wait_host_time_nanoseconds / total if total else 0.0,
+            "sync_share": node.sync_host_time_nanoseconds / total if total else 0.0,
+        })
+    return rows
+
+
+class CriticalPath:
+    """Chain of quanta and synchronizations that set the final host time, from the start of the simulation to its end.
+
+    segments holds (node index, mode, start host ns, end host ns) in time order, they are contiguous and add up to the
+    final host time. gates holds (waiting node index, gating node index, host ns) for every barrier on the path that
+    a node had to wait on: the gating node's quanta ended at that time and released the waiting one.
+    """
+
+    def __init__(self, simulation: "MultiNodeSimulation", segments: list[tuple[int, int, int, int]], gates: list[tuple[int, int, int]]):
+        self.simulation = simulation
+        self.segments = segments
+        self.gates = gates
+
+    def get_length_nanoseconds(self):
+        """Get the host time covered by the path."""
+        return sum(end - start for _, _, start, end in self.segments)
+
+    def time_per_node(self):
+        """Host time each node contributes to the path, as {node ID: (compute ns, sync ns)}, largest first."""
+        compute = Counter()
+        sync = Counter()
+        for i, mode, start, end in self.segments:
+            (compute if mode == QUANTA_SIMULATION else sync)[i] += end - start
+        nodes = sorted(set(compute) | set(sync), key=lambda i: -(compute[i] + sync[i]))
+        return {self.simulation.nodes[i].get_id(): (compute[i], sync[i]) for i in nodes}
+
+    def gates_per_edge(self):
+        """Number of times each edge gated the path, as {(waiting node ID, gating node ID): count}, most first.
+
+        With a global barrier the gating node is the last one to reach the barrier, it does not need to be a neighbor.
+        """
+        counts = Counter((waiting, gating) for waiting, gating, _ in self.gates)
+        nodes = self.simulation.nodes
+        return {(nodes[waiting].get_id(), nodes[gating].get_id()): count for (waiting, gating), count in counts.most_common()}
+
+
+def critical_path(simulation: "MultiNodeSimulation") -> CriticalPath:
+    """Extract the critical path of a simulation that ran with record_timeline=True (and without fast forward).
+
+    Walking back from the quanta that ended last: a quanta started when the node's previous synchronization ended,
+    which started when the node left its barrier. If the node waited at the barrier, the wait ended because the quanta
+    of a neighbor (any node for a global barrier) ended at that time, and the path continues on that neighbor.
+    Otherwise it continues with the node's own previous quanta. Ties are broken towards the node itself, then the
+    lowest index.
+    """
+    assert simulation.timeline is not None, "The critical path needs the timeline, create the simulation with record_timeline=True."
+    assert not simulation.fast_forward, "Fast forward skips transitions, the timeline would be incomplete."
+    columns = simulation.timeline.intervals()
+    node_indices = columns["node_index"].tolist()
+    modes = columns["mode"].tolist()
+    starts = columns["host_time_nanoseconds"].tolist()
+    ends = columns["end_host_time_nanoseconds"].tolist()
+
+    # Start of the interval of each (node, mode) by its end time, and which nodes ended a quanta at each time.
+    interval_start: dict[tuple[int, int, int], int] = {}
+    quanta_ended_at: dict[int, list[int]] = {}
+    last_quanta_end = 0
+    next_rows = zip(node_indices[1:] + [None], modes[1:] + [None])
+    for i, mode, start, end, (next_i, next_mode) in zip(node_indices, modes, starts, ends, next_rows):
+        interval_start[(i, mode, end)] = start
+        # Only a quanta followed by a barrier actually ended, the last interval of a node may still be running.
+        if mode == QUANTA_SIMULATION and next_i == i and next_mode == WAITING_ON_BARRIER:
+            quanta_ended_at.setdefault(end, []).append(i)
+            last_quanta_end = max(last_quanta_end, end)
+    neighbors = simulation.topology.rows()[0]
+
+    segments = []
+    gates = []
+    i, end = min(quanta_ended_at.get(last_quanta_end, [0])), last_quanta_end
+    while end > 0:
+        start = interval_start[(i, QUANTA_SIMULATION, end)]
+        segments.append((i, QUANTA_SIMULATION, start, end))
+        if start == 0:
+            break
+        sync_start = interval_start[(i, SYNCHRONIZATION, start)]
+        segments.append((i, SYNCHRONIZATION, sync_start, start))
+        wait_start = interval_start.get((i, WAITING_ON_BARRIER, sync_start), sync_start)
+        end = sync_start
+        if wait_start == sync_start:
+            continue
+        ended = quanta_ended_at.get(sync_start, [])
+        candidates = ended if simulation.has_global_barrier else sorted(set(ended) & set(neighbors[i]))
+        if candidates:
+            gating = min(candidates)
+            gates.append((i, gating, sync_start))
+            i = gating
+        else:
+            # Barriers only open when a quanta ends, there is nothing to follow without one.
+            break
+    segments.reverse()
+    gates.reverse()
+    return CriticalPath(simulation, segments, gates)
+
+
+def format_report(simulation: "MultiNodeSimulation", top: int = 10):
+    """Human readable host time attribution and, if the timeline was recorded, critical path of a simulation."""
+    lines = ["node | compute ns | wait ns | sync ns | compute % | wait % | sync %"]
+    for row in host_time_attribution(simulation):
+        lines.append(
+            f"{row['node_id']} | {row['compute_host_time_nanoseconds']} | {row['wait_host_time_nanoseconds']} | "
+            f"{row['sync_host_time_nanoseconds']} | {row['compute_share']:.1%} | {row['wait_share']:.1%} | {row['sync_share']:.1%}"
+        )
+    if simulation.timeline is None or simulation.fast_forward:
+        return "\n".join(lines)
+
+    path = critical_path(simulation)
+    lines.append("")
+    lines.append(f"critical path: {path.get_length_nanoseconds()} ns over {len(path.segments)} segments")
+    lines.append("node | compute ns on path | sync ns on path")
+    for node_id, (compute, sync) in list(path.time_per_node().items())[:top]:
+        lines.append(f"{node_id} | {compute} | {sync}")
+    lines.append("waiting node <- gating node | times on path")
+    for (waiting, gating), count in list(path.gates_per_edge().items())[:top]:
+        lines.append(f"{waiting} <- {gating} | {count}")
+    return "\n".join(lines)
@@ -0,0 +1,102 @@
+from typing import TYPE_CHECKING
+from statistics import NormalDist
+
+import numpy as np
+
+from engines import EnsembleEngine
+
+if TYPE_CHECKING:
+    from multi_node import MultiNodeSimulation
+
+
+class EnsembleResult:
+    """Host times of the replicas of an ensemble and their statistics."""
+
+    def __init__(self, host_times_nanoseconds: np.ndarray, confidence: float):
+        """Initialize the result from the host time of every replica."""
+        self.host_times_nanoseconds = host_times_nanoseconds
+        self.confidence = confidence
+
+    def get_replica_count(self):
+        """Get the number of replicas that were run."""
+        return len(self.host_times_nanoseconds)
+
+    def mean(self):
+        """Mean host time in nanoseconds."""
+        return float(self.host_times_nanoseconds.mean())
+
+    def std(self):
+        """Sample standard deviation of the host time in nanoseconds."""
+        if self.get_replica_count() < 2:
+            return 0.0
+        return float(self.host_times_nanoseconds.std(ddof=1))
+
+    def percentile(self, q: float):
+        """Percentile q (0 to 100) of the host time in nanoseconds."""
+        return float(np.percentile(self.host_times_nanoseconds, q))
+
+    def confidence_interval(self):
+        """Normal approximation confidence interval of the mean host time, as (low, high)."""
+        half_width = NormalDist().inv_cdf(0.5 + self.confidence / 2) * self.std() / np.sqrt(self.get_replica_count())
+        return float(self.mean() - half_width), float(self.mean() + half_width)
+
+    def summary(self):
+        """Get the statistics as a dict, e.g. to print or to add to a sweep row."""
+        low, high = self.confidence_interval()
+        return {
+            "replicas": self.get_replica_count(),
+            "mean_host_time_nanoseconds": self.mean(),
+            "std_host_time_nanoseconds": self.std(),
+            "p5_host_time_nanoseconds": self.percentile(5),
+            "p50_host_time_nanoseconds": self.percentile(50),
+            "p95_host_time_nanoseconds": self.percentile(95),
+            "ci_low_host_time_nanoseconds": low,
+            "ci_high_host_time_nanoseconds": high,
+        }
+
+
+def run_ensemble(simulation: "MultiNodeSimulation",
+                 instructions: int = None,
+                 target_time_nanoseconds: int = None,
+                 replicas: int = 1000,
+                 seed: int = None,
+                 confidence: float = 0.95,
+                 ci_width_nanoseconds: float = None,
+                 max_replicas: int = 100_000) -> EnsembleResult:
+    """Run many noise realizations of a simulation in one batched pass (see engines.EnsembleEngine).
+
+    The simulation is only used as a template: the goal is set on a fork of it, and its nodes are not advanced.
+    Deterministic nodes give the same host time in every replica, noise nodes draw their quanta lengths with
+    sample_quanta_noise.
+
+    Args:
+        simulation (MultiNodeSimulation): A freshly initialized simulation.
+        instructions (int): Run every replica like simulate_for_instructions.
+        target_time_nanoseconds (int): Run every replica like simulate_for_nanoseconds_in_target.
+        replicas (int): Number of replicas, or batch size when ci_width_nanoseconds is given.
+        seed (int): Seed of the noise, the same seed gives the same host times.
+        confidence (float): Confidence level of the interval around the mean.
+        ci_width_nanoseconds (float): If given, keep running batches of replicas until the confidence interval is at most this wide, or max_replicas were run.
+        max_replicas (int): Upper bound on the number of replicas when stopping on the interval width.
+    """
+    assert (instructions is None) != (target_time_nanoseconds is None), "Exactly one of instructions and target_time_nanoseconds must be given."
+    # The goals go on a copy, the caller's simulation keeps its own.
+    template = simulation.fork()
+    for node in template.nodes:
+        node.set_goal(instructions=instructions, time_nanoseconds=target_time_nanoseconds)
+
+    rng = np.random.default_rng(seed)
+    engine = EnsembleEngine(template)
+    host_times = engine.run(replicas, rng)
+    result = EnsembleResult(host_times, confidence)
+    if ci_width_nanoseconds is None:
+        return result
+
+    while result.get_replica_count() < max_replicas:
+        low, high = result.confidence_interval()
+        if high - low <= ci_width_nanoseconds:
+            break
+        batch = min(replicas, max_replicas - result.get_replica_count())
+        host_times = np.concatenate((host_times, engine.run(batch, rng)))
+        result = EnsembleResult(host_times, confidence)
+    return result
@@ -0,0 +1,331 @@
+from typing import Any, Callable, TYPE_CHECKING
+import math
+import time
+
+import numpy as np
+
+from engines.vectorized import is_vectorizable
+from simulation_nodes import SimulationNode
+from topology import CompiledTopology
+
+if TYPE_CHECKING:
+    from multi_node import MultiNodeSimulation
+
+# Finish time of a node that no longer runs quanta, below any real host time.
+NOT_RUNNING = np.iinfo(np.int64).min // 4
+# Distance to the critical nodes of a node that can not reach any, above any real host time.
+UNREACHABLE = np.iinfo(np.int64).max // 4
+
+
+class MaxPlusPrediction:
+    """Host time predicted by a MaxPlusSystem for a goal, see MaxPlusSystem.predict."""
+
+    def __init__(self, host_time_nanoseconds: int, cycle_time_nanoseconds: int, critical_nodes: list[int], iterations: int,
+                 is_closed_form: bool, is_lower_bound: bool = False):
+        """Initialize the prediction.
+
+        Args:
+            host_time_nanoseconds (int): Predicted host time of the whole run.
+            cycle_time_nanoseconds (int): Host time of a quanta once the barriers settle (the max-plus eigenvalue).
+            critical_nodes (list[int]): Indices of the nodes that set the cycle time.
+            iterations (int): Sweeps over the nodes the prediction took.
+            is_closed_form (bool): The host time came from the cycle time, not from stepping the recurrence.
+            is_lower_bound (bool): The run takes at least about this long but can take much longer, see MaxPlusSystem.
+        """
+        self.host_time_nanoseconds = host_time_nanoseconds
+        self.cycle_time_nanoseconds = cycle_time_nanoseconds
+        self.critical_nodes = critical_nodes
+        self.iterations = iterations
+        self.is_closed_form = is_closed_form
+        self.is_lower_bound = is_lower_bound
+
+
+class MaxPlusSystem:
+    """Barrier dynamics of a simulation whose nodes share one quanta, as a max-plus linear system.
+
+    Node i starts its quanta k + 1 (at host time s_i(k + 1)) once its barrier releases it, plus its barrier time b_i.
+    Its barrier releases it when it and the nodes it waits on finished quanta k, each taking c_j host time:
+        s_i(k + 1) = b_i + max over j in W(i) of (s_j(k) + c_j)
+    W(i) is every node with a global barrier, node i and its neighbors with local barriers. That is s(k + 1) = A s(k)
+    in the max-plus algebra, with A_ij = c_j + b_i for j in W(i). Every node waits on itself, so the weight of a cycle
+    of A adds up c + b over the nodes it visits, and the eigenvalue of A (the cycle time the run settles into) is the
+    largest c_i + b_i: the slowest node sets the pace of the nodes connected to it.
+
+    The model is exact for the lockstep semantics with a global barrier, and with local barriers as long as no node
+    gets a quanta ahead of a neighbor still waiting on another one. It breaks down when a barrier takes longer than a
+    quanta, with a global barrier the nodes still synchronizing then restart.
+
+    With noise, c_i is the mean quanta host time and b_i also holds how much later than the slowest mean quanta of W(i)
+    the slowest noisy quanta of W(i) ends on average (see get_noisy_quanta_host_times). That is the expected cycle with
+    a global barrier. With local barriers the delays also add up along the walks of the graph, and a node released
+    while a neighbor still synchronizes ends up waiting on the next quanta of that neighbor: the runs take longer, up
+    to a third on meshes, and the predictions are lower bounds.
+    """
+
+    def __init__(self, topology: CompiledTopology, compute_nanoseconds, barrier_nanoseconds, has_global_barrier: bool,
+                 first_compute_nanoseconds=None, has_noise: bool = False):
+        """Initialize the system.
+
+        Args:
+            topology (CompiledTopology): Graph of the nodes, only used with local barriers.
+            compute_nanoseconds: Host time of a quanta of every node.
+            barrier_nanoseconds: Host time of a barrier of every node, communication and synchronization overhead.
+            has_global_barrier (bool): Every node waits on every other one instead of on its neighbors.
+            first_compute_nanoseconds: Host time of the first quanta of every node if it differs, e.g. it was already drawn.
+            has_noise (bool): Some quanta host times are means of noisy ones, with local barriers the predictions are lower bounds.
+        """
+        self.topology = topology
+        self.has_noise = has_noise
+        self.compute_nanoseconds = np.asarray(compute_nanoseconds, dtype=np.int64)
+        self.barrier_nanoseconds = np.asarray(barrier_nanoseconds, dtype=np.int64)
+        self.has_global_barrier = has_global_barrier
+        self.first_compute_nanoseconds = self.compute_nanoseconds if first_compute_nanoseconds is None else np.asarray(first_compute_nanoseconds, dtype=np.int64)
+        node_count = topology.get_node_count()
+        assert len(self.compute_nanoseconds) == len(self.barrier_nanoseconds) == len(self.first_compute_nanoseconds) == node_count, "Every node needs a quanta and a barrier host time."
+
+        offsets = np.asarray(topology.neighbor_offsets, dtype=np.int64)
+        self.neighbor_indices = np.asarray(topology.neighbor_indices, dtype=np.int64)
+        # np.maximum.reduceat can not reduce empty rows, only the nodes with neighbors are reduced.
+        self.connected = np.flatnonzero(np.diff(offsets) > 0)
+        self.row_starts = offsets[self.connected]
+
+    def get_cycle_time(self):
+        """Eigenvalue of the system: host time of a quanta once the run settled, in nanoseconds."""
+        return int((self.compute_nanoseconds + self.barrier_nanoseconds).max(initial=0))
+
+    def get_critical_nodes(self):
+        """Indices of the nodes on the critical cycles, the ones whose quanta and barrier take the cycle time."""
+        return np.flatnonzero(self.compute_nanoseconds + self.barrier_nanoseconds == self.get_cycle_time()).tolist()
+
+    def release(self, finish: np.ndarray):
+        """Host time at which every node leaves its barrier, given the host time every node finished its quanta at.
+
+        The nodes are the last axis of finish, the leading axes are independent runs.
+        """
+        if self.has_global_barrier:
+            return np.broadcast_to(finish.max(axis=-1, keepdims=True), finish.shape).copy()
+        release = finish.copy()
+        if len(self.connected):
+            neighbor_finish = np.maximum.reduceat(finish[..., self.neighbor_indices], self.row_starts, axis=-1)
+            release[..., self.connected] = np.maximum(release[..., self.connected], neighbor_finish)
+        return release
+
+    def get_distances_to_critical(self, max_rounds: int):
+        """Cheapest way from every node to a critical node, and the number of sweeps it took (None past max_rounds).
+
+        A walk loses cycle time minus c_v + b_v on every node v it enters, the distance of a node is the least a walk
+        from it loses before reaching a critical node (0 for those, a huge value for nodes that can not reach one).
+        """
+        deficits = self.get_cycle_time() - (self.compute_nanoseconds + self.barrier_nanoseconds)
+        distances = np.where(deficits == 0, 0, UNREACHABLE)
+        for rounds in range(1, max_rounds + 1):
+            if not len(self.connected):
+                return distances, rounds
+            entering = np.minimum(distances + deficits, UNREACHABLE)
+            relaxed = distances.copy()
+            relaxed[self.connected] = np.minimum(distances[self.connected], np.minimum.reduceat(entering[self.neighbor_indices], self.row_starts))
+            if (relaxed == distances).all():
+                return distances, rounds
+            distances = relaxed
+        return distances, None
+
+    def predict_closed_form(self, quanta_count: int):
+        """Host time of quanta_count quanta of every node from the cycle time, and the sweeps it took. None if not exact.
+
+        Unrolling the recurrence, the last quanta of the run ends at the weight of the heaviest walk of
+        quanta_count - 1 steps over the graph W: the first quanta of its first node, plus c + b of every node it steps
+        to. Once the walks are long enough, the heaviest one reaches a critical node as cheaply as it can (see
+        get_distances_to_critical) and stays there, so the host time is
+            (quanta_count - 1) * cycle time + max over u of (first quanta of u - distance of u)
+        That holds when the walk fits in the steps, and when a walk that never reaches a critical node loses at least
+        the gap between the cycle time and the next largest c + b per step, more than it can gain over this one.
+        """
+        steps = quanta_count - 1
+        cycle_time = self.get_cycle_time()
+        first_compute = self.first_compute_nanoseconds
+        if self.has_global_barrier:
+            return int(first_compute.max()) + steps * cycle_time, 1
+
+        distances, rounds = self.get_distances_to_critical(steps)
+        if rounds is None:
+            return None
+        reachable = distances < UNREACHABLE
+        best = int((first_compute[reachable] - distances[reachable]).max())
+        weights = self.compute_nanoseconds + self.barrier_nanoseconds
+        gap = cycle_time - int(weights[weights < cycle_time].max(initial=cycle_time - UNREACHABLE))
+        if steps * gap < int(first_compute.max()) - best:
+            return None
+        return steps * cycle_time + best, rounds
+
+    def predict_recurrence(self, quanta_counts: np.ndarray):
+        """Host time until every node ran its quanta, stepping the recurrence, and the sweeps it took.
+
+        The recurrence is stepped one quanta at a time until every node advances by the cycle time each quanta. From
+        there s(k + m) = s(k) + m times the cycle time, so the quanta up to the first node reaching its goal are
+        skipped at once. With local barriers a node that reached its goal stops and no longer holds its neighbors
+        back, with a global barrier it is released with the others and keeps running quanta.
+        """
+        cycle_time = self.get_cycle_time()
+        last_quanta = int(quanta_counts.max())
+        first_goal = int(quanta_counts.min())
+
+        start = np.zeros(len(quanta_counts), dtype=np.int64)
+        host_time = 0
+        is_periodic = False
+        iterations = 0
+        k = 1
+        while True:
+            iterations += 1
+            finish = start + (self.first_compute_nanoseconds if k == 1 else self.compute_nanoseconds)
+            finishing = quanta_counts == k
+            if finishing.any():
+                host_time = max(host_time, int(finish[finishing].max()))
+            if k == last_quanta:
+                return host_time, iterations
+            if not self.has_global_barrier:
+                finish = np.where(quanta_counts >= k, finish, NOT_RUNNING)
+            next_start = self.release(finish) + self.barrier_nanoseconds
+            k += 1
+
+            if not is_periodic and 2 < k < first_goal and (next_start - start == cycle_time).all():
+                is_periodic = True
+                skipped = first_goal - k
+                next_start += skipped * cycle_time
+                k += skipped
+            start = next_start
+
+    def predict(self, quanta_counts) -> MaxPlusPrediction:
+        """Predict the host time until every node ran its number of quanta.
+
+        When every node runs the same number of quanta the host time comes from the cycle time in a few sweeps (see
+        predict_closed_form), otherwise, or when that is not exact yet, the recurrence is stepped (see
+        predict_recurrence).
+
+        Args:
+            quanta_counts: Number of quanta every node runs to reach the goal.
+        """
+        quanta_counts = np.asarray(quanta_counts, dtype=np.int64)
+        assert len(quanta_counts) == len(self.compute_nanoseconds) and (quanta_counts > 0).all(), "Every node runs at least one quanta."
+        closed_form = None
+        if (quanta_counts == quanta_counts[0]).all():
+            closed_form = self.predict_closed_form(int(quanta_counts[0]))
+        host_time, iterations = closed_form or self.predict_recurrence(quanta_counts)
+        return MaxPlusPrediction(host_time, self.get_cycle_time(), self.get_critical_nodes(), iterations, closed_form is not None,
+                                 is_lower_bound=self.has_noise and not self.has_global_barrier)
+
+
+def sample_quanta_host_times(nodes: list[SimulationNode], count: int, rng: np.random.Generator):
+    """Host time of count quanta of every node, drawn independently, as a count x len(nodes) array."""
+    samples = np.empty((count, len(nodes)), dtype=np.int64)
+    for i, node in enumerate(nodes):
+        without_noise = SimulationNode.target_quanta_nanoseconds_to_host_nanoseconds(node)
+        if node.has_constant_quanta_host_time():
+            samples[:, i] = without_noise
+            continue
+        factors = node.sample_quanta_noise(rng, (count,))
+        assert factors is not None, f"Node {node.get_id()} has no noise model to draw its quanta host time from."
+        samples[:, i] = (without_noise * (1 + np.asarray(factors))).astype(np.int64)
+    return samples
+
+
+def get_noisy_quanta_host_times(system: MaxPlusSystem, nodes: list[SimulationNode], noise_samples: int, rng: np.random.Generator):
+    """Mean quanta host time of every node, and how much later its barrier releases it than with those means.
+
+    A barrier waits on the slowest quanta of the nodes it waits on, which ends on average later than the slowest of
+    their mean quanta. The quanta of all nodes are drawn jointly, noise_samples times, and released like the system
+    releases them (see MaxPlusSystem.release): the mean of those releases minus the release of the means is the delay.
+    """
+    # Every row releases len(neighbor_indices) values, a few rows are drawn at a time to bound the memory.
+    chunk = max(1, (1 << 22) // max(len(system.neighbor_indices), len(nodes)))
+    quanta_total = np.zeros(len(nodes))
+    release_total = np.zeros(len(nodes))
+    for start in range(0, noise_samples, chunk):
+        samples = sample_quanta_host_times(nodes, min(chunk, noise_samples - start), rng)
+        quanta_total += samples.sum(axis=0)
+        release_total += system.release(samples).sum(axis=0)
+    mean_quanta = quanta_total / noise_samples
+    delays = release_total / noise_samples - system.release(mean_quanta)
+    return mean_quanta.astype(np.int64), np.maximum(np.round(delays), 0).astype(np.int64)
+
+
+def build_maxplus_system(simulation: "MultiNodeSimulation", noise_samples: int = 65536, seed: int = 0) -> MaxPlusSystem:
+    """Max-plus system of a simulation that did not run yet.
+
+    The first quanta of every node is the one it already drew when it was initialized, the next ones take its mean
+    quanta host time, and with noise its barrier also takes as long as the slowest of the noisy quanta it waits on
+    ends after the slowest mean one (see get_noisy_quanta_host_times).
+
+    Args:
+        simulation (MultiNodeSimulation): The simulation. Its nodes must share one quanta and step like SimulationNode, without an active master, adaptive quanta or grouped barriers.
+        noise_samples (int): Quanta of every node drawn to average the quanta host times and barrier delays with noise.
+        seed (int): Seed of the generator those quanta are drawn from.
+    """
+    nodes = simulation.nodes
+    assert simulation.step_count == 0, "The prediction starts from the beginning of the run."
+    assert not simulation.needs_node_stepping() and simulation.barrier_groups is None, "The master, adaptive quanta and grouped barriers are not part of the model."
+    assert all(is_vectorizable(node) for node in nodes), "Every node must step like SimulationNode."
+    assert len({node.get_quanta_nanoseconds() for node in nodes}) == 1, "The nodes must share one quanta (has_global_quanta=True), the quanta of their neighbors would not line up otherwise."
+
+    has_noise = not all(node.has_constant_quanta_host_time() for node in nodes)
+    system = MaxPlusSystem(
+        simulation.topology,
+        [SimulationNode.target_quanta_nanoseconds_to_host_nanoseconds(node) for node in nodes],
+        [node.get_synchronization_communication_overhead() + node.get_synchronization_overhead_in_nanoseconds() for node in nodes],
+        simulation.has_global_barrier,
+        first_compute_nanoseconds=[node.execution_details.get_total_execution_time() for node in nodes],
+        has_noise=has_noise,
+    )
+    if has_noise:
+        system.compute_nanoseconds, delays = get_noisy_quanta_host_times(system, nodes, noise_samples, np.random.default_rng(seed))
+        system.barrier_nanoseconds = system.barrier_nanoseconds + delays
+    return system
+
+
+def get_quanta_counts(simulation: "MultiNodeSimulation", instructions: int = None, target_time_nanoseconds: int = None):
+    """Number of quanta every node runs to reach a goal of simulate_for_instructions or simulate_for_nanoseconds_in_target."""
+    assert (instructions is None) != (target_time_nanoseconds is None), "Exactly one of instructions and target_time_nanoseconds must be given."
+    if instructions is not None:
+        return [math.ceil(instructions / node.get_instructions_per_quanta()) for node in simulation.nodes]
+    return [math.ceil(target_time_nanoseconds / node.get_quanta_nanoseconds()) for node in simulation.nodes]
+
+
+def predict_host_time(simulation: "MultiNodeSimulation", instructions: int = None, target_time_nanoseconds: int = None,
+                      **kwargs) -> MaxPlusPrediction:
+    """Predict the host time of simulate_for_instructions or simulate_for_nanoseconds_in_target without running it.
+
+    Args:
+        simulation (MultiNodeSimulation): The simulation, see build_maxplus_system. It is not changed.
+        instructions (int): Goal of simulate_for_instructions.
+        target_time_nanoseconds (int): Goal of simulate_for_nanoseconds_in_target.
+        kwargs: Arguments of build_maxplus_system.
+    """
+    quanta_counts = get_quanta_counts(simulation, instructions, target_time_nanoseconds)
+    return build_maxplus_system(simulation, **kwargs).predict(quanta_counts)
+
+
+def validate_prediction(factory: Callable[[], "MultiNodeSimulation"], instructions: int = None,
+                        target_time_nanoseconds: int = None) -> dict[str, Any]:
+    """Compare the predicted host time of a simulation with the one simulate() gives, on two simulations from factory."""
+    start = time.perf_counter()
+    prediction = predict_host_time(factory(), instructions, target_time_nanoseconds)
+    prediction_seconds = time.perf_counter() - start
+
+    simulation = factory()
+    start = time.perf_counter()
+    if instructions is not None:
+        simulated = simulation.simulate_for_instructions(instructions)
+    else:
+        simulated = simulation.simulate_for_nanoseconds_in_target(target_time_nanoseconds)
+    simulation_seconds = time.perf_counter() - start
+
+    return {
+        "predicted_host_time_nanoseconds": prediction.host_time_nanoseconds,
+        "simulated_host_time_nanoseconds": simulated,
+        "relative_error": (prediction.host_time_nanoseconds - simulated) / simulated if simulated else 0.0,
+        "cycle_time_nanoseconds": prediction.cycle_time_nanoseconds,
+        "is_closed_form": prediction.is_closed_form,
+        "is_lower_bound": prediction.is_lower_bound,
+        "iterations": prediction.iterations,
+        "prediction_seconds": prediction_seconds,
+        "simulation_seconds": simulation_seconds,
+    }
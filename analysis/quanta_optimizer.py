@@ -0,0 +1,106 @@
+from typing import Any, Callable, TYPE_CHECKING
+
+from quanta import latency_bounds
+
+if TYPE_CHECKING:
+    from multi_node import MultiNodeSimulation
+
+
+def get_slack(quanta_nanoseconds: dict[str, int], bounds: dict[str, int]):
+    """How far the largest quanta goes over its latency bound, as a share of the bound (0 when all are within)."""
+    return max([0.0] + [quanta_nanoseconds[node_id] / bound - 1 for node_id, bound in bounds.items()])
+
+
+class QuantaOptimization:
+    """Quanta assignments evaluated by optimize_quanta, with their host time and slack.
+
+    points holds one dict per evaluated assignment: its quanta_nanoseconds by node ID, its host_time_nanoseconds and
+    its slack (see get_slack).
+    """
+
+    def __init__(self, bounds: dict[str, int], points: list[dict[str, Any]]):
+        """Initialize the result from the latency bound of every node and the evaluated points."""
+        self.bounds = bounds
+        self.points = points
+
+    def frontier(self):
+        """Pareto frontier of host time against slack: the points no other point beats on both, by increasing slack."""
+        frontier = []
+        for point in sorted(self.points, key=lambda point: (point["slack"], point["host_time_nanoseconds"])):
+            if not frontier or point["host_time_nanoseconds"] < frontier[-1]["host_time_nanoseconds"]:
+                frontier.append(point)
+        return frontier
+
+    def best(self, max_slack: float = 0.0):
+        """Fastest point whose slack is at most max_slack, None if there is none."""
+        points = [point for point in self.points if point["slack"] <= max_slack]
+        return min(points, key=lambda point: point["host_time_nanoseconds"], default=None)
+
+
+def optimize_quanta(factory: Callable[..., "MultiNodeSimulation"],
+                    instructions: int = None,
+                    target_time_nanoseconds: int = None,
+                    slacks: tuple[float, ...] = (0.0, 0.25, 0.5, 1.0),
+                    factors: tuple[float, ...] = (1.0, 0.5, 0.25),
+                    max_evaluations: int = 500) -> QuantaOptimization:
+    """Search per-node quanta that minimize the host time of a simulation, for growing slacks over the latency bounds.
+
+    The latency bound of a node is the smallest latency of its edges (see quanta.latency_bounds), so that a quanta
+    never outruns a link. For every allowed slack, quanta are capped at (1 + slack) times the bound. The search
+    starts with the same factor of the cap for every node, then moves one node at a time to another factor of its
+    cap or to the quanta of one of its neighbors (aligned neighbors wait less on each other), as long as the host
+    time improves. Every evaluated assignment is kept, QuantaOptimization.frontier gives the trade-off.
+
+    Args:
+        factory (Callable[..., MultiNodeSimulation]): Builds the simulation, called with quanta_nanoseconds (by node ID) to override the default quanta. Give it a fast engine.
+        instructions (int): Evaluate with simulate_for_instructions.
+        target_time_nanoseconds (int): Evaluate with simulate_for_nanoseconds_in_target.
+        slacks (tuple[float, ...]): Allowed slacks, 0 keeps every quanta within its bound.
+        factors (tuple[float, ...]): Shares of the cap tried for each node.
+        max_evaluations (int): Upper bound on the number of simulations run.
+    """
+    assert (instructions is None) != (target_time_nanoseconds is None), "Exactly one of instructions and target_time_nanoseconds must be given."
+    template = factory()
+    node_ids = [node.get_id() for node in template.nodes]
+    bounds = {node_id: bound for node_id, bound in zip(node_ids, latency_bounds(template.topology)) if bound is not None}
+    neighbors = {node_ids[i]: [node_ids[j] for j in row] for i, row in enumerate(template.topology.rows()[0])}
+
+    host_times: dict[tuple, int] = {}
+
+    def evaluate(quanta_nanoseconds: dict[str, int]):
+        key = tuple(sorted(quanta_nanoseconds.items()))
+        if key not in host_times:
+            simulation = factory(quanta_nanoseconds=quanta_nanoseconds)
+            if instructions is not None:
+                host_times[key] = simulation.simulate_for_instructions(instructions)
+            else:
+                host_times[key] = simulation.simulate_for_nanoseconds_in_target(target_time_nanoseconds)
+        return host_times[key]
+
+    # The assignment the simulation makes on its own, from the edge latencies.
+    evaluate({node.get_id(): node.get_quanta_nanoseconds() for node in template.nodes if node.get_id() in bounds})
+
+    for slack in slacks:
+        caps = {node_id: max(1, int(bound * (1 + slack))) for node_id, bound in bounds.items()}
+        uniform = [{node_id: max(1, int(cap * factor)) for node_id, cap in caps.items()} for factor in factors]
+        best = min(uniform, key=evaluate)
+        improved = True
+        while improved and len(host_times) < max_evaluations:
+            improved = False
+            for node_id, cap in caps.items():
+                candidates = {max(1, int(cap * factor)) for factor in factors}
+                candidates |= {best[neighbor] for neighbor in neighbors[node_id] if neighbor in best and best[neighbor] <= cap}
+                candidates.discard(best[node_id])
+                for candidate in sorted(candidates, reverse=True):
+                    if len(host_times) >= max_evaluations:
+                        break
+                    trial = {**best, node_id: candidate}
+                    if evaluate(trial) < evaluate(best):
+                        best = trial
+                        improved = True
+
+    points = [
+        {"quanta_nanoseconds": dict(key), "host_time_nanoseconds": host_time, "slack": get_slack(dict(key), bounds)}
+        for key, host_time in host_times.items()
+    ]
+    return QuantaOptimization(bounds, points)
@@ -0,0 +1,152 @@
+from typing import Any, Callable, Iterator, TYPE_CHECKING
+from multiprocessing import shared_memory
+import csv
+import itertools
+import multiprocessing
+import time
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from multi_node import MultiNodeSimulation
+
+# Set in each worker process by initialize_worker.
+worker_factory: Callable[..., "MultiNodeSimulation"] = None
+worker_goal: tuple[str, int] = None
+worker_shared: dict[str, np.ndarray] = {}
+worker_shared_memories: list[shared_memory.SharedMemory] = []
+
+
+def parameter_grid(**values: list) -> list[dict[str, Any]]:
+    """Every combination of the given parameter values, e.g. parameter_grid(has_global_barrier=[True, False], seed=range(10))."""
+    names = list(values)
+    return [dict(zip(names, combination)) for combination in itertools.product(*values.values())]
+
+
+def share_arrays(arrays: dict[str, Any]):
+    """Copy arrays into shared memory, returns the segments (to close and unlink) and how to attach to them."""
+    memories = []
+    specs = {}
+    for name, values in arrays.items():
+        values = np.ascontiguousarray(values)
+        memory = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+        np.ndarray(values.shape, dtype=values.dtype, buffer=memory.buf)[...] = values
+        memories.append(memory)
+        specs[name] = (memory.name, values.shape, values.dtype.str)
+    return memories, specs
+
+
+def attach_arrays(specs: dict[str, tuple[str, tuple, str]]):
+    """Attach to arrays shared by share_arrays, read only."""
+    memories = []
+    arrays = {}
+    for name, (memory_name, shape, dtype) in specs.items():
+        memory = shared_memory.SharedMemory(name=memory_name)
+        array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=memory.buf)
+        array.flags.writeable = False
+        memories.append(memory)
+        arrays[name] = array
+    return memories, arrays
+
+
+def initialize_worker(factory: Callable[..., "MultiNodeSimulation"], goal: tuple[str, int], shared_specs: dict):
+    """Pool initializer, keeps what every task of the sweep needs in the worker."""
+    global worker_factory, worker_goal, worker_shared, worker_shared_memories
+    worker_factory = factory
+    worker_goal = goal
+    worker_shared_memories, worker_shared = attach_arrays(shared_specs)
+
+
+def run_point(task: tuple[int, dict[str, Any]]):
+    """Build and run the simulation of one point of the grid, returns its row."""
+    index, params = task
+    row = {"index": index, **params}
+    start = time.perf_counter()
+    try:
+        simulation = worker_factory(**params, **worker_shared)
+        kind, value = worker_goal
+        if kind == "instructions":
+            row["host_time_nanoseconds"] = simulation.simulate_for_instructions(value)
+        else:
+            row["host_time_nanoseconds"] = simulation.simulate_for_nanoseconds_in_target(value)
+        row["error"] = ""
+    except Exception as error:
+        row["host_time_nanoseconds"] = None
+        row["error"] = repr(error)
+    row["wall_time_seconds"] = time.perf_counter() - start
+    return row
+
+
+def iter_sweep(factory: Callable[..., "MultiNodeSimulation"],
+               grid: list[dict[str, Any]],
+               instructions: int = None,
+               target_time_nanoseconds: int = None,
+               shared: dict[str, Any] = None,
+               processes: int = None,
+               chunksize: int = None) -> Iterator[dict[str, Any]]:
+    """Run factory(**params) for every point of the grid over a process pool, yielding rows as they finish.
+
+    Args:
+        factory (Callable): Builds a fresh MultiNodeSimulation from keyword arguments, like the get_simulation of the scenarios. Must be picklable (a module level function).
+        grid (list[dict]): One dict of keyword arguments per run, see parameter_grid.
+        instructions (int): Run each point with simulate_for_instructions.
+        target_time_nanoseconds (int): Run each point with simulate_for_nanoseconds_in_target.
+        shared (dict): Large inputs (e.g. noise arrays) passed to every factory call as read only numpy arrays. They are copied into shared memory once instead of being pickled per task.
+        processes (int): Number of worker processes, all cores by default. 1 runs in this process.
+        chunksize (int): Points sent to a worker at a time, by default about 4 chunks per worker.
+
+    Rows are dicts with "index" (position in the grid), the parameters, "host_time_nanoseconds", "error" (repr of the exception if the run failed, empty otherwise) and "wall_time_seconds". They come in completion order.
+    """
+    assert (instructions is None) != (target_time_nanoseconds is None), "Exactly one of instructions and target_time_nanoseconds must be given."
+    goal = ("instructions", instructions) if instructions is not None else ("target_time_nanoseconds", target_time_nanoseconds)
+    tasks = list(enumerate(grid))
+    processes = processes or multiprocessing.cpu_count()
+
+    memories, specs = share_arrays(shared or {})
+    try:
+        if processes == 1:
+            initialize_worker(factory, goal, specs)
+            for task in tasks:
+                yield run_point(task)
+            return
+
+        if chunksize is None:
+            chunksize = max(1, len(tasks) // (processes * 4))
+        with multiprocessing.Pool(processes, initializer=initialize_worker, initargs=(factory, goal, specs)) as pool:
+            yield from pool.imap_unordered(run_point, tasks, chunksize=chunksize)
+    finally:
+        for memory in memories:
+            memory.close()
+            memory.unlink()
+
+
+def run_sweep(factory: Callable[..., "MultiNodeSimulation"],
+              grid: list[dict[str, Any]],
+              csv_path: str = None,
+              on_row: Callable[[dict[str, Any]], None] = None,
+              **kwargs) -> list[dict[str, Any]]:
+    """Run a sweep with iter_sweep and collect its table, sorted by grid index.
+
+    Args:
+        csv_path (str): If given, every row is appended to this CSV file as soon as it finishes.
+        on_row (Callable): Called with every row as soon as it finishes, e.g. to print progress.
+        **kwargs: Passed to iter_sweep.
+    """
+    rows = []
+    csv_file = open(csv_path, "w", newline="") if csv_path is not None else None
+    writer = None
+    try:
+        for row in iter_sweep(factory, grid, **kwargs):
+            rows.append(row)
+            if on_row is not None:
+                on_row(row)
+            if csv_file is not None:
+                if writer is None:
+                    writer = csv.DictWriter(csv_file, fieldnames=list(row))
+                    writer.writeheader()
+                writer.writerow(row)
+                csv_file.flush()
+    finally:
+        if csv_file is not None:
+            csv_file.close()
+    return sorted(rows, key=lambda row: row["index"])
@@ -0,0 +1,202 @@
+from simulation_nodes import SimulationNode
+
+
+class BarrierTracker:
+    """Keeps the barrier readiness of the nodes up to date from their mode changes.
+
+    Instead of rescanning every node and its neighbors after each step, the tracker listens to change_mode and keeps:
+    - the number of nodes that are not in QUANTA_SIMULATION, the global barrier is ready when that is all of them.
+    - for every node waiting on its barrier (and not done), the number of neighbors still in QUANTA_SIMULATION at a
+      target time not after its own. The node can leave its local barrier once that count is zero.
+    A mode change only touches the node and its neighbors. Anything that moves the clocks without change_mode (an
+    engine writing the node state directly, a fast forward) must be followed by rebuild().
+
+    With groups the nodes use grouped barriers instead of local ones: a group is released as a whole once every member
+    waits on its barrier (and one of them is not done), like a global barrier restricted to the group. Between groups
+    only the edges crossing them synchronize, and with the slack their latency leaves: a waiting node is held back by a
+    neighbor of another group still in quanta at a target time not after its own minus the latency of their edge plus
+    its quanta. The tracker then keeps per group the number of members waiting and of members held back that way.
+    """
+
+    def __init__(self, nodes: list[SimulationNode], neighbors: list[list[int]], groups: list[int] = None,
+                 latencies: list[list[int]] = None):
+        """Initialize the tracker and start listening to the nodes.
+
+        Args:
+            nodes (list[SimulationNode]): The nodes of the simulation, in simulation order.
+            neighbors (list[list[int]]): For every node, the indices of the nodes it is connected to.
+            groups (list[int]): Group index of every node for grouped barriers, None for local barriers.
+            latencies (list[list[int]]): Latency of every edge, in the order of neighbors, needed with groups.
+        """
+        self.nodes = nodes
+        self.neighbors = neighbors
+        self.index = {node.get_id(): i for i, node in enumerate(nodes)}
+
+        self.groups = groups
+        if groups is not None:
+            assert len(groups) == len(nodes) and latencies is not None, "Grouped barriers need a group and the edge latencies of every node."
+            self.members: list[list[int]] = [[] for _ in range(max(groups, default=-1) + 1)]
+            for i, group in enumerate(groups):
+                self.members[group].append(i)
+            # Neighbors of every node in another group, with the latency of the edge to them.
+            self.cross_neighbors = [
+                [(j, latency) for j, latency in zip(node_neighbors, node_latencies) if groups[j] != groups[i]]
+                for i, (node_neighbors, node_latencies) in enumerate(zip(neighbors, latencies))
+            ]
+            self.group_waiting = [0] * len(self.members)
+            self.group_not_done = [0] * len(self.members)
+            self.group_held_back = [0] * len(self.members)
+            self.changed_groups: set[int] = set()
+
+        self.not_in_quanta_count = 0
+        # Target time at which each node entered its current quanta.
+        self.quanta_target_time = [0] * len(nodes)
+        self.waiting = [False] * len(nodes)
+        self.neighbors_behind = [0] * len(nodes)
+        self.ready: set[int] = set()
+
+        self.rebuild()
+        for node in nodes:
+            node.add_mode_listener(self.on_mode_change)
+
+    def count_neighbors_behind(self, i: int):
+        """Number of neighbors in quanta at a target time not after the one of node i."""
+        target_time = self.nodes[i].current_target_time_nanoseconds
+        return sum(
+            1 for j in self.neighbors[i]
+            if self.nodes[j].MODE == "QUANTA_SIMULATION" and self.quanta_target_time[j] <= target_time
+        )
+
+    def is_held_back(self, i: int, latency: int, quanta_target_time: int):
+        """Check if node i, waiting, is held back by a neighbor of another group in quanta since quanta_target_time, over an edge of the given latency."""
+        slack = max(0, latency - self.nodes[i].get_quanta_nanoseconds())
+        return quanta_target_time + slack <= self.nodes[i].current_target_time_nanoseconds
+
+    def count_cross_neighbors_behind(self, i: int):
+        """Number of neighbors in other groups holding node i back."""
+        return sum(
+            1 for j, latency in self.cross_neighbors[i]
+            if self.nodes[j].MODE == "QUANTA_SIMULATION" and self.is_held_back(i, latency, self.quanta_target_time[j])
+        )
+
+    def rebuild(self):
+        """Recompute everything from the current state of the nodes."""
+        nodes = self.nodes
+        if self.groups is not None:
+            self.rebuild_groups()
+            return
+        self.not_in_quanta_count = sum(node.MODE != "QUANTA_SIMULATION" for node in nodes)
+        self.quanta_target_time = [node.current_target_time_nanoseconds for node in nodes]
+        self.waiting = [node.MODE == "WAITING_ON_BARRIER" and not node.is_done() for node in nodes]
+        self.neighbors_behind = [self.count_neighbors_behind(i) if self.waiting[i] else 0 for i in range(len(nodes))]
+        self.ready = {i for i in range(len(nodes)) if self.waiting[i] and self.neighbors_behind[i] == 0}
+
+    def rebuild_groups(self):
+        """Recompute the grouped barrier counters from the current state of the nodes."""
+        nodes = self.nodes
+        self.quanta_target_time = [node.current_target_time_nanoseconds for node in nodes]
+        self.waiting = [node.MODE == "WAITING_ON_BARRIER" and not node.is_done() for node in nodes]
+        self.neighbors_behind = [self.count_cross_neighbors_behind(i) if self.waiting[i] else 0 for i in range(len(nodes))]
+        for group, members in enumerate(self.members):
+            self.group_waiting[group] = sum(nodes[i].MODE == "WAITING_ON_BARRIER" for i in members)
+            self.group_not_done[group] = sum(self.waiting[i] for i in members)
+            self.group_held_back[group] = sum(self.neighbors_behind[i] > 0 for i in members)
+        self.changed_groups = set(range(len(self.members)))
+
+    def set_neighbors_behind(self, i: int, count: int):
+        """Change the number of neighbors of other groups holding node i back, and the count of its group."""
+        group = self.groups[i]
+        self.group_held_back[group] += (count > 0) - (self.neighbors_behind[i] > 0)
+        self.neighbors_behind[i] = count
+        self.changed_groups.add(group)
+
+    def on_group_mode_change(self, i: int, node: SimulationNode, previous_mode: str):
+        """Mode listener with grouped barriers, update the counters of the node, its group and its neighbors in other groups."""
+        mode = node.MODE
+        group = self.groups[i]
+        self.changed_groups.add(group)
+
+        if previous_mode == "QUANTA_SIMULATION" and mode != "QUANTA_SIMULATION":
+            for j, latency in self.cross_neighbors[i]:
+                if self.waiting[j] and self.is_held_back(j, latency, self.quanta_target_time[i]):
+                    self.set_neighbors_behind(j, self.neighbors_behind[j] - 1)
+
+        elif mode == "QUANTA_SIMULATION" and previous_mode != "QUANTA_SIMULATION":
+            self.quanta_target_time[i] = node.current_target_time_nanoseconds
+            for j, latency in self.cross_neighbors[i]:
+                if self.waiting[j] and self.is_held_back(j, latency, self.quanta_target_time[i]):
+                    self.set_neighbors_behind(j, self.neighbors_behind[j] + 1)
+
+        if mode == "WAITING_ON_BARRIER" and previous_mode != "WAITING_ON_BARRIER":
+            self.group_waiting[group] += 1
+            self.waiting[i] = not node.is_done()
+            if self.waiting[i]:
+                self.group_not_done[group] += 1
+                self.set_neighbors_behind(i, self.count_cross_neighbors_behind(i))
+
+        elif previous_mode == "WAITING_ON_BARRIER" and mode != "WAITING_ON_BARRIER":
+            self.group_waiting[group] -= 1
+            if self.waiting[i]:
+                self.group_not_done[group] -= 1
+                self.set_neighbors_behind(i, 0)
+            self.waiting[i] = False
+
+    def on_mode_change(self, node: SimulationNode, previous_mode: str):
+        """Mode listener, update the counters of the node and its neighbors."""
+        i = self.index[node.get_id()]
+        if self.groups is not None:
+            self.on_group_mode_change(i, node, previous_mode)
+            return
+        mode = node.MODE
+        nodes = self.nodes
+
+        if previous_mode == "QUANTA_SIMULATION" and mode != "QUANTA_SIMULATION":
+            self.not_in_quanta_count += 1
+            quanta_target_time = self.quanta_target_time[i]
+            for j in self.neighbors[i]:
+                if self.waiting[j] and quanta_target_time <= nodes[j].current_target_time_nanoseconds:
+                    self.neighbors_behind[j] -= 1
+                    if self.neighbors_behind[j] == 0:
+                        self.ready.add(j)
+
+        elif mode == "QUANTA_SIMULATION" and previous_mode != "QUANTA_SIMULATION":
+            self.not_in_quanta_count -= 1
+            quanta_target_time = node.current_target_time_nanoseconds
+            self.quanta_target_time[i] = quanta_target_time
+            for j in self.neighbors[i]:
+                if self.waiting[j] and quanta_target_time <= nodes[j].current_target_time_nanoseconds:
+                    self.neighbors_behind[j] += 1
+                    self.ready.discard(j)
+
+        if mode == "WAITING_ON_BARRIER" and previous_mode != "WAITING_ON_BARRIER":
+            # The target time of the node moved at the end of its quanta, count its neighbors from scratch.
+            self.waiting[i] = not node.is_done()
+            if self.waiting[i]:
+                self.neighbors_behind[i] = self.count_neighbors_behind(i)
+                if self.neighbors_behind[i] == 0:
+                    self.ready.add(i)
+
+        elif previous_mode == "WAITING_ON_BARRIER" and mode != "WAITING_ON_BARRIER":
+            self.waiting[i] = False
+            self.ready.discard(i)
+
+    def is_global_barrier_ready(self):
+        """Check if every node reached its barrier, same as MultiNodeSimulation.is_glbal_barrier_ready."""
+        return self.not_in_quanta_count == len(self.nodes)
+
+    def pop_ready(self):
+        """Indices of the nodes that can leave their local barrier, in node order. They are expected to be released.
+
+        With groups, the members of every group that can leave its barrier.
+        """
+        if self.groups is not None:
+            ready = sorted(
+                i for group in self.changed_groups
+                if self.group_waiting[group] == len(self.members[group]) and self.group_not_done[group] > 0 and self.group_held_back[group] == 0
+                for i in self.members[group]
+            )
+            self.changed_groups.clear()
+            return ready
+        ready = sorted(self.ready)
+        self.ready.clear()
+        return ready
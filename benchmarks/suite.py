@@ -0,0 +1,321 @@
+"""Wall-clock benchmarks of MultiNodeSimulation.simulate over generated topologies.
+
+Every case runs in a fresh process, so that its import time and peak RSS are its own. Run it from the repository root:
+
+    python -m benchmarks.suite --preset quick --output results.json
+    python -m benchmarks.suite --preset quick --output new.json --baseline results.json
+
+With --baseline, cases that got slower or bigger than their noise allows are listed and the exit code is 1. Every case
+runs --repeat times and keeps its best times; how far the repeats spread tells how noisy the case is, and a metric
+only regresses when it moves by more than --threshold and by more than the spread of the case (see find_regressions).
+The other engines are also reported in node steps per second over the lockstep engine on the same case (see
+add_speedup), when that case ran.
+"""
+from typing import Any
+import argparse
+import json
+import math
+import multiprocessing
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+PRESETS = {
+    "quick": dict(
+        topology=["line", "mesh", "fat_tree"],
+        nodes=[16, 256],
+        has_global_barrier=[True, False],
+        has_global_quanta=[True],
+        noise=[False],
+        engine=["lockstep", "event", "vectorized"],
+    ),
+    "full": dict(
+        topology=["line", "ring", "mesh", "fat_tree", "random_regular"],
+        nodes=[2, 16, 128, 1024, 10_000],
+        has_global_barrier=[True, False],
+        has_global_quanta=[True, False],
+        noise=[False, True],
+        engine=["lockstep", "event", "vectorized"],
+    ),
+}
+# Edge latencies are drawn from these, so per-edge quanta differ from the global one.
+LATENCIES_NANOSECONDS = [500, 1000, 2000]
+# Metrics where higher is worse, and the one where lower is worse, compared against a baseline.
+HIGHER_IS_WORSE = ("startup_seconds", "peak_rss_bytes")
+LOWER_IS_WORSE = ("steps_per_second", "node_steps_per_second")
+# The timed quantity each metric is derived from, whose spread across repeats is the noise of the metric.
+SPREAD_OF_METRIC = {
+    "startup_seconds": "startup_spread",
+    "steps_per_second": "run_spread",
+    "node_steps_per_second": "run_spread",
+}
+
+
+def case_name(case: dict[str, Any]):
+    """Name identifying a case across runs of the suite."""
+    return "-".join((
+        case["topology"],
+        f"n{case['nodes']}",
+        "global_barrier" if case["has_global_barrier"] else "local_barrier",
+        "global_quanta" if case["has_global_quanta"] else "edge_quanta",
+        "noise" if case["noise"] else "deterministic",
+        case["engine"],
+    ))
+
+
+def build_cases(preset: str = "quick", quanta: int = 200, lockstep_max_nodes: int = 2000, **overrides: list):
+    """Every combination of the preset's values, with the lists in overrides replacing the preset ones.
+
+    Args:
+        preset (str): Name of a PRESETS entry.
+        quanta (int): Length of every run in quanta of the largest latency.
+        lockstep_max_nodes (int): Larger cases are not run with the lockstep engine, they would take too long.
+    """
+    from analysis import parameter_grid
+
+    values = {**PRESETS[preset], **{name: value for name, value in overrides.items() if value}}
+    cases = []
+    for case in parameter_grid(**values):
+        if case["engine"] == "lockstep" and case["nodes"] > lockstep_max_nodes:
+            continue
+        case["quanta"] = quanta
+        case["name"] = case_name(case)
+        cases.append(case)
+    return cases
+
+
+def build_topology(name: str, node_count: int, seed: int = 0):
+    """Generate a topology of about node_count nodes (mesh and fat tree round to their own shapes)."""
+    import topology
+
+    latencies = topology.random_latencies(LATENCIES_NANOSECONDS, seed)
+    if name == "line":
+        return topology.line(node_count, latencies)
+    if name == "ring":
+        return topology.ring(max(node_count, 3), latencies)
+    if name == "mesh":
+        rows = max(1, round(math.sqrt(node_count)))
+        return topology.mesh_2d(rows, max(1, node_count // rows), latencies)
+    if name == "fat_tree":
+        k = 2
+        while k * k * k // 4 + 5 * k * k // 4 < node_count:
+            k += 2
+        return topology.fat_tree(k, latencies)
+    if name == "random_regular":
+        degree = min(4, node_count - 1)
+        if node_count * degree % 2:
+            degree -= 1
+        return topology.random_regular(node_count, degree, latencies, seed=seed)
+    raise ValueError(f"Unknown topology {name}.")
+
+
+def build_simulation(case: dict[str, Any], seed: int = 0):
+    """Build the simulation of a case, with deterministic or (seeded) noisy nodes."""
+    from multi_node import MultiNodeSimulation
+    from simulation_nodes import MasterNode, SimpleQemuSimulationNode, SimpleQemuSimulationNodeWithNoiseModel, UniformNoise, spawn_seeds
+
+    graph = build_topology(case["topology"], case["nodes"], seed)
+    nodes = []
+    for node_id, node_seed in zip(graph.node_ids, spawn_seeds(seed, graph.get_node_count())):
+        if case["noise"]:
+            nodes.append(SimpleQemuSimulationNodeWithNoiseModel(
+                noise_model=UniformNoise(seed=node_seed), simulation_speed_ips=5e8, id=node_id, manages_quanta=False
+            ))
+        else:
+            nodes.append(SimpleQemuSimulationNode(simulation_speed_ips=5e8, id=node_id, manages_quanta=False))
+    return MultiNodeSimulation(
+        has_global_barrier=case["has_global_barrier"],
+        is_distributed=False,
+        has_global_quanta=case["has_global_quanta"],
+        nodes=nodes,
+        graph=graph,
+        master_node=MasterNode(),
+        engine=case["engine"],
+    )
+
+
+def spread(times: list[float]):
+    """Relative spread of repeated timings, (slowest - fastest) / fastest."""
+    return (max(times) - min(times)) / min(times)
+
+
+def measure_case(case: dict[str, Any], repeat: int = 5):
+    """Run a case in this process and return its row. Times are the best of repeat runs, with their spread."""
+    start = time.perf_counter()
+    import multi_node  # noqa: F401, only imported to time it
+    import_seconds = time.perf_counter() - start
+
+    target_time_nanoseconds = case["quanta"] * max(LATENCIES_NANOSECONDS)
+    startup_times, run_times = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        simulation = build_simulation(case)
+        startup_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        host_time_nanoseconds = simulation.simulate_for_nanoseconds_in_target(target_time_nanoseconds)
+        run_times.append(time.perf_counter() - start)
+    startup_seconds, run_seconds = min(startup_times), min(run_times)
+
+    # A node step is one quanta of one node, the work every engine has to do whatever its step structure.
+    node_steps = sum(node.current_target_time_nanoseconds // node.get_quanta_nanoseconds() for node in simulation.nodes)
+    return {
+        **case,
+        "node_count": len(simulation.nodes),
+        "host_time_nanoseconds": host_time_nanoseconds,
+        "steps": simulation.step_count,
+        "node_steps": node_steps,
+        "import_seconds": import_seconds,
+        "startup_seconds": startup_seconds,
+        "run_seconds": run_seconds,
+        "repeat": repeat,
+        "startup_spread": spread(startup_times),
+        "run_spread": spread(run_times),
+        "steps_per_second": simulation.step_count / run_seconds,
+        "node_steps_per_second": node_steps / run_seconds,
+        # ru_maxrss is in KiB on Linux.
+        "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        "error": "",
+    }
+
+
+def measure_in_child(case: dict[str, Any], repeat: int, results: multiprocessing.Queue):
+    """Process target, puts the row of the case (or its error) on the queue."""
+    try:
+        results.put(measure_case(case, repeat))
+    except Exception as error:
+        results.put({**case, "error": repr(error)})
+
+
+def run_case(case: dict[str, Any], repeat: int = 5, timeout_seconds: float = None):
+    """Run a case in a fresh process and return its row."""
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=measure_in_child, args=(case, repeat, results))
+    process.start()
+    try:
+        row = results.get(timeout=timeout_seconds)
+    except Exception:
+        process.kill()
+        row = {**case, "error": f"no result within {timeout_seconds} seconds"}
+    process.join()
+    return row
+
+
+def metadata():
+    """Where and on which version the suite ran."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": multiprocessing.cpu_count(),
+    }
+
+
+def get_tolerance(metric: str, row: dict[str, Any], before: dict[str, Any], threshold: float, noise_factor: float):
+    """Relative change of a metric between before and row that is still noise.
+
+    That is threshold, or noise_factor times the larger spread across repeats of the two runs, whichever is larger.
+    Rows of older baselines have no spread, they count as 0.
+    """
+    spread_name = SPREAD_OF_METRIC.get(metric)
+    if spread_name is None:
+        return threshold
+    return max(threshold, noise_factor * max(row.get(spread_name, 0.0), before.get(spread_name, 0.0)))
+
+
+def add_speedup(row: dict[str, Any], results: list[dict[str, Any]]):
+    """Set speedup_over_lockstep of a row, its node steps per second over the ones of the lockstep row of its case.
+
+    It stays None for the lockstep rows themselves, and for cases lockstep did not run (see build_cases) or failed on.
+    """
+    row["speedup_over_lockstep"] = None
+    if row["engine"] == "lockstep" or row.get("error"):
+        return
+    lockstep_name = case_name({**row, "engine": "lockstep"})
+    for other in results:
+        if other["name"] == lockstep_name and not other.get("error"):
+            row["speedup_over_lockstep"] = row["node_steps_per_second"] / other["node_steps_per_second"]
+
+
+def find_regressions(results: list[dict[str, Any]], baseline: list[dict[str, Any]], threshold: float = 0.25, noise_factor: float = 2.0):
+    """Compare rows against a baseline by case name.
+
+    A metric regresses when it is worse than the baseline by more than its tolerance (relative, see get_tolerance): a
+    case whose repeats spread widely needs a larger change to be reported. A changed host time is also reported, the
+    engines are expected to keep their results across versions.
+    """
+    baseline_rows = {row["name"]: row for row in baseline if not row.get("error")}
+    regressions = []
+    for row in results:
+        before = baseline_rows.get(row["name"])
+        if before is None or row.get("error"):
+            continue
+        for metric in HIGHER_IS_WORSE:
+            if row[metric] > before[metric] * (1 + get_tolerance(metric, row, before, threshold, noise_factor)):
+                regressions.append((row["name"], metric, before[metric], row[metric]))
+        for metric in LOWER_IS_WORSE:
+            # A slowdown by a factor of 1 + tolerance, the same tolerance as for the times the metric comes from.
+            if row[metric] * (1 + get_tolerance(metric, row, before, threshold, noise_factor)) < before[metric]:
+                regressions.append((row["name"], metric, before[metric], row[metric]))
+        if row["host_time_nanoseconds"] != before["host_time_nanoseconds"]:
+            regressions.append((row["name"], "host_time_nanoseconds", before["host_time_nanoseconds"], row["host_time_nanoseconds"]))
+    return regressions
+
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(description="Benchmark the simulation engines over generated topologies.")
+    parser.add_argument("--preset", choices=list(PRESETS), default="quick")
+    parser.add_argument("--topology", nargs="*", help="Override the topologies of the preset.")
+    parser.add_argument("--nodes", nargs="*", type=int, help="Override the node counts of the preset.")
+    parser.add_argument("--engine", nargs="*", help="Override the engines of the preset.")
+    parser.add_argument("--quanta", type=int, default=200, help="Length of each run, in quanta of the largest latency.")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per case, the best time and the spread of the times are kept.")
+    parser.add_argument("--timeout", type=float, default=None, help="Seconds after which a case is abandoned.")
+    parser.add_argument("--output", help="JSON file to save the results to.")
+    parser.add_argument("--baseline", help="JSON file of an earlier run to compare against.")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Smallest relative change reported as a regression.")
+    parser.add_argument("--noise-factor", type=float, default=2.0, help="A change must also exceed this many times the spread of the repeats.")
+    arguments = parser.parse_args(argv)
+
+    cases = build_cases(arguments.preset, arguments.quanta, topology=arguments.topology, nodes=arguments.nodes, engine=arguments.engine)
+    results = []
+    for i, case in enumerate(cases):
+        row = run_case(case, arguments.repeat, arguments.timeout)
+        add_speedup(row, results)
+        results.append(row)
+        if row["error"]:
+            print(f"[{i + 1}/{len(cases)}] {row['name']}: {row['error']}")
+        else:
+            speedup = "" if row["speedup_over_lockstep"] is None else f" ({row['speedup_over_lockstep']:.1f}x lockstep)"
+            print(
+                f"[{i + 1}/{len(cases)}] {row['name']}: {row['steps_per_second']:.0f} steps/s, "
+                f"{row['node_steps_per_second']:.0f} node steps/s{speedup} (repeats within {row['run_spread']:.0%}), "
+                f"startup {row['startup_seconds'] * 1e3:.1f} ms, peak RSS {row['peak_rss_bytes'] / 2**20:.0f} MiB"
+            )
+
+    if arguments.output:
+        with open(arguments.output, "w") as output_file:
+            json.dump({"metadata": metadata(), "results": results}, output_file, indent=1)
+
+    if arguments.baseline:
+        with open(arguments.baseline) as baseline_file:
+            baseline = json.load(baseline_file)["results"]
+        regressions = find_regressions(results, baseline, arguments.threshold, arguments.noise_factor)
+        for name, metric, before, after in regressions:
+            print(f"REGRESSION {name}: {metric} {before:.6g} -> {after:.6g}")
+        if regressions:
+            return 1
+        print("No regressions.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
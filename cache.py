@@ -0,0 +1,232 @@
+from array import array
+import hashlib
+import json
+import mmap
+import os
+import random
+import sqlite3
+import sys
+import time
+import zlib
+from typing import Any, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from multi_node import MultiNodeSimulation
+
+# Part of every cache key, bump it with any change that alters the results of a simulation so older entries miss.
+ENGINE_VERSION = 1
+
+# Attributes that are not part of the configuration: links back to the simulation, its nodes and its listeners.
+SKIPPED_ATTRIBUTES = {"nodes", "index", "simulation", "mode_listeners", "connected_nodes"}
+
+# Lists and tuples of numbers longer than this are described by a digest, like arrays, rather than item by item.
+LONG_SEQUENCE_LENGTH = 64
+
+
+def digest(data) -> str:
+    """SHA-256 of bytes, hex encoded."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def get_numpy():
+    """numpy if it was imported, else None.
+
+    A value can only be a numpy object once numpy is imported, so the key of a run that does not use it does not
+    import it either.
+    """
+    return sys.modules.get("numpy")
+
+
+def describe_file_array(value) -> dict | None:
+    """Description of an array memory mapped from a file by its path, size, modification time and place in the file.
+
+    Hashing the content of a large trace or CSR file on every key would cost as much as reading it. A file rewritten
+    in place within the resolution of its modification time is missed, the same trade off make takes. Returns None
+    for anything but a whole numpy memmap, a slice of one shares its filename and offset but not its data.
+    """
+    np = get_numpy()
+    if np is None or not isinstance(value, np.memmap) or not isinstance(value.base, mmap.mmap) or value.filename is None:
+        return None
+    status = os.stat(value.filename)
+    return {
+        "file": value.filename,
+        "size": status.st_size,
+        "mtime": status.st_mtime_ns,
+        "offset": value.offset,
+        "array": value.dtype.str,
+        "shape": list(value.shape),
+    }
+
+
+def describe_sequence(value: list | tuple) -> Any:
+    """Description of a list or tuple, a digest of its bytes when it is a long sequence of ints or floats."""
+    if len(value) > LONG_SEQUENCE_LENGTH:
+        for typecode in ("q", "d"):
+            try:
+                values = array(typecode, value)
+            except (TypeError, OverflowError):
+                continue
+            return {"sequence": typecode, "length": len(values), "digest": digest(values.tobytes())}
+    return [describe(item) for item in value]
+
+
+def get_object_state(value) -> dict[str, Any]:
+    """Attributes of an object as pickle sees them, for slotted and regular classes alike."""
+    state = value.__getstate__()
+    if isinstance(state, tuple):
+        instance_state, slot_state = state
+        state = {**(instance_state or {}), **(slot_state or {})}
+    state = dict(state or {})
+    np = get_numpy()
+    if np is None:
+        return state
+    # Arrays a class leaves out of its pickled state (the memory mapped trace of a trace node) still count by content.
+    for cls in type(value).__mro__:
+        for name in getattr(cls, "__slots__", ()):
+            if name not in state and isinstance(getattr(value, name, None), np.ndarray):
+                state[name] = getattr(value, name)
+    return state
+
+
+def describe(value) -> Any:
+    """JSON-able description of a value, equal for two values that configure a simulation the same way.
+
+    Arrays and long sequences of numbers are described by their content digest, memory mapped files by their path
+    and modification time, random generators by their state and other objects by their class and attributes, minus
+    the SKIPPED_ATTRIBUTES.
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    np = get_numpy()
+    if np is not None:
+        if isinstance(value, np.generic):
+            return value.item()
+        if isinstance(value, np.ndarray):
+            file_description = describe_file_array(value)
+            if file_description is not None:
+                return file_description
+            return {"array": value.dtype.str, "shape": list(value.shape), "digest": digest(np.ascontiguousarray(value).tobytes())}
+        if isinstance(value, np.random.Generator):
+            return describe(value.bit_generator.state)
+    if isinstance(value, (list, tuple)):
+        return describe_sequence(value)
+    if isinstance(value, dict):
+        return {str(key): describe(item) for key, item in sorted(value.items(), key=lambda item: str(item[0]))}
+    cls = type(value)
+    state = {name: item for name, item in get_object_state(value).items() if name not in SKIPPED_ATTRIBUTES}
+    return {"class": f"{cls.__module__}.{cls.__qualname__}", "state": describe(state)}
+
+
+def configuration_key(simulation: "MultiNodeSimulation") -> str:
+    """Stable hash of everything the result of simulate depends on, from the current state of the simulation.
+
+    It covers the engine version, the barrier and quanta flags, the topology, the master and quanta controller, and
+    every node: its class, parameters, goals, clocks and noise (arrays by content, generators by state). Nodes drawing
+    from the global random generators add their state. The engine is left out, every engine gives the same results.
+    """
+    topology = simulation.topology
+    arrays = (topology.neighbor_offsets, topology.neighbor_indices, topology.edge_latencies_nanoseconds)
+    configuration = {
+        "engine_version": ENGINE_VERSION,
+        "has_global_barrier": simulation.has_global_barrier,
+        "is_distributed": simulation.is_distributed,
+        "has_global_quanta": simulation.has_global_quanta,
+        "barrier_groups": simulation.barrier_groups,
+        # Compiled topologies hash their array('q') arrays, the memory maps of CSR files are described by the file.
+        "topology": [list(topology.node_ids)] + [describe_file_array(values) or digest(values) for values in arrays],
+        "master_node": describe(simulation.master_node),
+        "quanta_controller": describe(simulation.quanta_controller),
+        "nodes": [describe(node) for node in simulation.nodes],
+    }
+    if any(node.uses_shared_random_state() for node in simulation.nodes):
+        import numpy as np
+
+        configuration["shared_random_state"] = [describe(random.getstate()), describe(np.random.get_state())]
+    return digest(json.dumps(configuration, sort_keys=True, separators=(",", ":")).encode())
+
+
+class ResultCache:
+    """Persistent cache of simulation results in an SQLite file, keyed by configuration_key.
+
+    Entries are evicted least recently used first once they take more than max_bytes. The database runs in WAL mode
+    with a busy timeout, so several processes (e.g. the workers of a sweep) can share one file, each process opens
+    its own connection.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 1 << 30, timeout_seconds: float = 60.0):
+        """Initialize the cache, the file is created on first use.
+
+        Args:
+            path (str): SQLite file of the cache.
+            max_bytes (int): Largest total size of the stored entries.
+            timeout_seconds (float): How long a process waits for another one writing to the cache.
+        """
+        assert max_bytes > 0, "The cache needs room for at least one entry."
+        self.path = path
+        self.max_bytes = max_bytes
+        self.timeout_seconds = timeout_seconds
+        self.connection: sqlite3.Connection = None
+        self.connection_pid = None
+        self.hits = 0
+        self.misses = 0
+
+    def __getstate__(self):
+        """Pickle the settings only, a connection does not cross processes (see checkpoint)."""
+        state = self.__dict__.copy()
+        state["connection"] = None
+        state["connection_pid"] = None
+        return state
+
+    def connect(self) -> sqlite3.Connection:
+        """Connection of this process, opened (and the table created) on first use."""
+        if self.connection is None or self.connection_pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=self.timeout_seconds, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)")
+            self.connection = connection
+            self.connection_pid = os.getpid()
+        return self.connection
+
+    def get(self, key: str) -> dict | None:
+        """Stored entry of key, None on a miss. A hit becomes the most recently used entry."""
+        connection = self.connect()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                connection.execute("UPDATE results SET last_used = ? WHERE key = ?", (time.time(), key))
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(self, key: str, entry: dict):
+        """Store entry under key, then evict the least recently used entries over max_bytes."""
+        value = zlib.compress(json.dumps(entry, separators=(",", ":")).encode())
+        connection = self.connect()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)", (key, value, len(value), time.time()))
+            excess = connection.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0] - self.max_bytes
+            if excess > 0:
+                evicted = []
+                for old_key, size in connection.execute("SELECT key, size FROM results WHERE key != ? ORDER BY last_used", (key,)):
+                    if excess <= 0:
+                        break
+                    evicted.append((old_key,))
+                    excess -= size
+                connection.executemany("DELETE FROM results WHERE key = ?", evicted)
+
+    def get_statistics(self):
+        """Hits and misses of this process, and the number and total size of the stored entries."""
+        entries, size = self.connect().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": size}
+
+    def clear(self):
+        """Remove every entry."""
+        with self.connect() as connection:
+            connection.execute("DELETE FROM results")
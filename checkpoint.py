@@ -0,0 +1,80 @@
+import pickle
+import random
+import struct
+import zlib
+
+# Checkpoint file: header with a format version and whether the payload is compressed, then the pickled simulation
+# and the global random states its nodes draw from.
+CHECKPOINT_MAGIC = b"MNSCKP"
+CHECKPOINT_VERSION = 1
+CHECKPOINT_HEADER = struct.Struct("<6sHB")
+
+
+def get_shared_random_state(simulation):
+    """State of the global random generators, if a node of the simulation draws its noise from them."""
+    if not any(node.uses_shared_random_state() for node in simulation.nodes):
+        return None
+    import numpy as np
+
+    return random.getstate(), np.random.get_state()
+
+
+def set_shared_random_state(state):
+    """Restore the global random generators saved by get_shared_random_state."""
+    if state is None:
+        return
+    import numpy as np
+
+    random.setstate(state[0])
+    np.random.set_state(state[1])
+
+
+def dumps_checkpoint(simulation, compress: bool = True) -> bytes:
+    """Snapshot of the full state of a simulation, between two calls to simulate or two of its steps.
+
+    Everything the simulation reaches is saved: the clocks, modes and execution details of the nodes, the position and
+    generator state of their noise, the barrier tracker, the master, the timeline. Trace nodes keep the path of their
+    trace rather than its samples.
+
+    Args:
+        simulation (MultiNodeSimulation): The simulation to save.
+        compress (bool): Whether to compress the payload with zlib, smaller but slower to save and restore.
+    """
+    payload = pickle.dumps((simulation, get_shared_random_state(simulation)), protocol=pickle.HIGHEST_PROTOCOL)
+    if compress:
+        payload = zlib.compress(payload, 1)
+    return CHECKPOINT_HEADER.pack(CHECKPOINT_MAGIC, CHECKPOINT_VERSION, compress) + payload
+
+
+def loads_checkpoint(data: bytes):
+    """Restore a simulation from dumps_checkpoint, and the global random state its nodes were drawing from."""
+    magic, version, compressed = CHECKPOINT_HEADER.unpack_from(data)
+    assert magic == CHECKPOINT_MAGIC, "Not a simulation checkpoint."
+    assert version == CHECKPOINT_VERSION, f"Checkpoint format {version} is not supported, expected {CHECKPOINT_VERSION}."
+    payload = memoryview(data)[CHECKPOINT_HEADER.size:]
+    if compressed:
+        payload = zlib.decompress(payload)
+    simulation, shared_random_state = pickle.loads(payload)
+    set_shared_random_state(shared_random_state)
+    return simulation
+
+
+def save_checkpoint(simulation, path: str, compress: bool = True):
+    """Write dumps_checkpoint(simulation) to path."""
+    with open(path, "wb") as checkpoint_file:
+        checkpoint_file.write(dumps_checkpoint(simulation, compress))
+
+
+def load_checkpoint(path: str):
+    """Restore a simulation saved with save_checkpoint."""
+    with open(path, "rb") as checkpoint_file:
+        return loads_checkpoint(checkpoint_file.read())
+
+
+def fork_simulation(simulation):
+    """Independent copy of a simulation in its current state, continuing it does not change the original.
+
+    The copy goes through pickle in memory without compression, which is faster than copy.deepcopy on the node graph.
+    Nodes drawing from the global random generators (uses_shared_random_state) still share them with the original.
+    """
+    return pickle.loads(pickle.dumps(simulation, protocol=pickle.HIGHEST_PROTOCOL))
@@ -0,0 +1,13 @@
+from .endpoints import Endpoint, SubprocessEndpoint, SocketEndpoint, standin_command, encode_message, decode_message
+from .coordinator import LiveCoordinator, run_cosimulation
+
+__all__ = [
+    "Endpoint",
+    "SubprocessEndpoint",
+    "SocketEndpoint",
+    "standin_command",
+    "encode_message",
+    "decode_message",
+    "LiveCoordinator",
+    "run_cosimulation",
+]
@@ -0,0 +1,192 @@
+import asyncio
+import time
+
+from multi_node import MultiNodeSimulation
+from simulation_nodes import SimulationNode
+from .endpoints import Endpoint
+
+
+class LiveCoordinator:
+    """Runs the barriers of a MultiNodeSimulation over real simulator processes instead of the modeled nodes.
+
+    Every node is backed by an Endpoint. When a node is released it is sent a run message for its next quanta, when its
+    simulator answers the node moves to its barrier like at the end of a modeled quanta (its target time and
+    instructions advance, change_mode('WAITING_ON_BARRIER')), and the simulation's update_barriers decides which nodes
+    are released, with the same barrier tracker as the engines. The synchronization itself is the exchange of messages,
+    a released node starts its next quanta right away.
+
+    The coordinator handles the messages one event loop tick at a time: every answer that arrived by then is applied,
+    update_barriers runs once, and the releases are written together before the loop waits again.
+
+    The run reports the measured coordination latency next to the model's: for every quanta the time between sending
+    run and receiving done that the simulator did not spend simulating, plus the time the coordinator took on the tick,
+    against the cost of a barrier in the model (synchronization communication overhead plus synchronization overhead).
+    """
+
+    def __init__(self, simulation: MultiNodeSimulation, endpoints: list[Endpoint]):
+        """Initialize the coordinator.
+
+        Args:
+            simulation (MultiNodeSimulation): The nodes, topology and barrier mode, it must not have run yet.
+            endpoints (list[Endpoint]): Endpoint of every node, in the order of simulation.nodes.
+        """
+        assert len(endpoints) == len(simulation.nodes), "Every node needs an endpoint."
+        assert all(node.current_host_time_nanoseconds == 0 for node in simulation.nodes), "A live run starts from a simulation that has not run yet."
+        self.simulation = simulation
+        self.nodes = simulation.nodes
+        self.endpoints = endpoints
+        self.index = {node.get_id(): i for i, node in enumerate(self.nodes)}
+
+        self.released: list[int] = []
+        self.start_nanoseconds = 0
+        self.run_sent_nanoseconds = [0] * len(self.nodes)
+        self.barrier_start_nanoseconds = [0] * len(self.nodes)
+        self.quanta_count = 0
+        self.tick_count = 0
+        self.message_count = 0
+        self.transport_nanoseconds = 0
+        self.max_transport_nanoseconds = 0
+        self.tick_nanoseconds = 0
+
+    def on_mode_change(self, node: SimulationNode, previous_mode: str):
+        """Mode listener, collect the nodes update_barriers released."""
+        if node.MODE == "SYNCHRONIZATION":
+            self.released.append(self.index[node.get_id()])
+
+    def get_elapsed_nanoseconds(self):
+        """Host time since the start of the live run."""
+        return time.perf_counter_ns() - self.start_nanoseconds
+
+    def start_quanta(self, i: int):
+        """Start the next quanta of node i and queue its run message."""
+        node = self.nodes[i]
+        now = self.get_elapsed_nanoseconds()
+        if node.MODE == "SYNCHRONIZATION":
+            node.wait_host_time_nanoseconds += now - self.barrier_start_nanoseconds[i]
+            node.change_mode("QUANTA_SIMULATION")
+        node.current_host_time_nanoseconds = now
+        self.run_sent_nanoseconds[i] = now
+        self.endpoints[i].send({
+            "type": "run",
+            "quanta_nanoseconds": node.get_quanta_nanoseconds(),
+            "host_nanoseconds": node.execution_details.get_total_execution_time(),
+        })
+
+    def finish_quanta(self, i: int, message: dict, received_nanoseconds: int):
+        """Apply the done message of node i, it reaches its barrier."""
+        node = self.nodes[i]
+        assert node.MODE == "QUANTA_SIMULATION", f"Node {node.get_id()} answered a quanta it was not running."
+        host_nanoseconds = int(message["host_nanoseconds"])
+        transport = max(0, received_nanoseconds - self.run_sent_nanoseconds[i] - host_nanoseconds)
+        self.quanta_count += 1
+        self.transport_nanoseconds += transport
+        self.max_transport_nanoseconds = max(self.max_transport_nanoseconds, transport)
+
+        node.execution_details.time_executed_ns = node.execution_details.get_total_execution_time()
+        node.compute_host_time_nanoseconds += host_nanoseconds
+        node.sync_host_time_nanoseconds += transport
+        node.current_host_time_nanoseconds = received_nanoseconds
+        node.current_target_time_nanoseconds += node.get_quanta_nanoseconds()
+        node.target_instructions_executed += int(message.get("instructions", node.execution_details.instructions_executed))
+        self.barrier_start_nanoseconds[i] = received_nanoseconds
+        node.change_mode("WAITING_ON_BARRIER")
+
+    async def read_messages(self, i: int, queue: asyncio.Queue):
+        """Forward the messages of node i to queue with the host time they arrived at, until its endpoint closes."""
+        endpoint = self.endpoints[i]
+        while True:
+            message = await endpoint.receive()
+            await queue.put((i, message, self.get_elapsed_nanoseconds()))
+            if message is None:
+                return
+
+    def predict_host_time(self):
+        """Host time the model predicts for the run, from a fork of the simulation."""
+        return self.simulation.fork().simulate()
+
+    async def run(self, instructions: int = None, time_nanoseconds: int = None):
+        """Run the simulators until every node reaches its goal, and report the measured and predicted costs.
+
+        Args:
+            instructions (int): Goal of every node in instructions, like simulate_for_instructions.
+            time_nanoseconds (int): Goal of every node in target time, like simulate_for_nanoseconds_in_target.
+        """
+        nodes = self.nodes
+        if instructions is not None or time_nanoseconds is not None:
+            for node in nodes:
+                node.set_goal(instructions=instructions, time_nanoseconds=time_nanoseconds)
+        predicted_host_time = self.predict_host_time()
+
+        self.simulation.schedule_nodes()
+        self.simulation.barrier_tracker.rebuild()
+        for node in nodes:
+            node.add_mode_listener(self.on_mode_change)
+
+        await asyncio.gather(*(endpoint.connect() for endpoint in self.endpoints))
+        queue = asyncio.Queue()
+        readers = [asyncio.create_task(self.read_messages(i, queue)) for i in range(len(nodes))]
+        try:
+            self.start_nanoseconds = time.perf_counter_ns()
+            for i in range(len(nodes)):
+                self.start_quanta(i)
+            await asyncio.gather(*(endpoint.drain() for endpoint in self.endpoints))
+
+            done_count = 0
+            while done_count < len(nodes):
+                # Everything that arrived by this tick is handled together, with a single update of the barriers.
+                batch = [await queue.get()]
+                while not queue.empty():
+                    batch.append(queue.get_nowait())
+                tick_start = batch[0][2]
+                for i, message, received_nanoseconds in batch:
+                    if message is None:
+                        raise ConnectionError(f"The simulator of node {nodes[i].get_id()} closed its connection.")
+                    self.finish_quanta(i, message, received_nanoseconds)
+                self.message_count += len(batch)
+
+                self.simulation.update_barriers()
+                released, self.released = self.released, []
+                for i in released:
+                    self.start_quanta(i)
+                await asyncio.gather(*(self.endpoints[i].drain() for i in set(released)))
+                self.message_count += len(released)
+                self.tick_count += 1
+                self.tick_nanoseconds += self.get_elapsed_nanoseconds() - tick_start
+                done_count = sum(node.is_done() for node in nodes)
+            host_time = max(node.current_host_time_nanoseconds for node in nodes)
+        finally:
+            for endpoint in self.endpoints:
+                endpoint.send({"type": "stop"})
+            await asyncio.gather(*(endpoint.close() for endpoint in self.endpoints), return_exceptions=True)
+            for reader in readers:
+                reader.cancel()
+
+        return self.get_report(host_time, predicted_host_time)
+
+    def get_report(self, host_time_nanoseconds: int, predicted_host_time_nanoseconds: int):
+        """Measured costs of the live run next to the ones of the model."""
+        quanta_count = max(self.quanta_count, 1)
+        tick_count = max(self.tick_count, 1)
+        mean_transport = self.transport_nanoseconds / quanta_count
+        mean_tick = self.tick_nanoseconds / tick_count
+        predicted_barrier = sum(
+            node.get_synchronization_communication_overhead() + node.get_synchronization_overhead_in_nanoseconds() for node in self.nodes
+        ) / len(self.nodes)
+        return {
+            "host_time_nanoseconds": host_time_nanoseconds,
+            "predicted_host_time_nanoseconds": predicted_host_time_nanoseconds,
+            "quanta": self.quanta_count,
+            "ticks": self.tick_count,
+            "messages": self.message_count,
+            "mean_messages_per_tick": self.message_count / tick_count,
+            "mean_transport_nanoseconds": mean_transport,
+            "max_transport_nanoseconds": self.max_transport_nanoseconds,
+            "mean_tick_nanoseconds": mean_tick,
+            "coordination_latency_nanoseconds": mean_transport + mean_tick,
+            "predicted_coordination_latency_nanoseconds": predicted_barrier,
+        }
+
+
+def run_cosimulation(simulation: MultiNodeSimulation, endpoints: list[Endpoint], instructions: int = None, time_nanoseconds: int = None):
+    """Run a LiveCoordinator in a new event loop and return its report."""
+    return asyncio.run(LiveCoordinator(simulation, endpoints).run(instructions=instructions, time_nanoseconds=time_nanoseconds))
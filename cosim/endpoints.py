@@ -0,0 +1,103 @@
+import asyncio
+import json
+import os
+import sys
+
+# Messages are JSON objects, one per line. The simulator sends {"type": "ready"} once it is up, the coordinator sends {"type": "run", "quanta_nanoseconds": ...,
+# "host_nanoseconds": ...} to start a quanta and {"type": "stop"} at the end, the simulator answers every run with
+# {"type": "done", "host_nanoseconds": ..., "instructions": ...} once its quanta is simulated. host_nanoseconds is the
+# host time the model expects the quanta to take in a run message, and the time it took in a done message.
+# instructions is optional, the model's instructions per quanta are used without it.
+
+
+def encode_message(message: dict) -> bytes:
+    """Line of a message on the wire."""
+    return json.dumps(message, separators=(",", ":")).encode() + b"\n"
+
+
+def decode_message(line: bytes) -> dict:
+    """Message of a line read from the wire."""
+    return json.loads(line)
+
+
+def standin_command(time_scale: float = 1.0):
+    """Command line of the stand-in simulator (see cosim.standin), to give to a SubprocessEndpoint."""
+    return [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "standin.py"), "--time-scale", str(time_scale)]
+
+
+class Endpoint:
+    """Connection to the process backing one node: messages go out on writer and come back on reader."""
+
+    def __init__(self):
+        self.reader: asyncio.StreamReader = None
+        self.writer: asyncio.StreamWriter = None
+
+    async def open(self):
+        """Start or connect to the simulator, sets reader and writer."""
+        raise NotImplementedError("This method should be implemented in subclasses.")
+
+    async def connect(self):
+        """Open the endpoint and wait for the simulator to be ready, so its start up is not counted in the run."""
+        await self.open()
+        message = await self.receive()
+        if message is None or message["type"] != "ready":
+            raise ConnectionError(f"Expected a ready message from the simulator, got {message}.")
+
+    def send(self, message: dict):
+        """Queue a message, it is written with the other messages of the tick on the next drain."""
+        self.writer.write(encode_message(message))
+
+    async def drain(self):
+        """Wait until the queued messages are handed to the transport."""
+        await self.writer.drain()
+
+    async def receive(self) -> dict | None:
+        """Next message of the simulator, None once it closed the connection."""
+        line = await self.reader.readline()
+        return decode_message(line) if line else None
+
+    async def close(self):
+        """Close the connection."""
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+class SubprocessEndpoint(Endpoint):
+    """Simulator started as a subprocess, talking over its stdin and stdout."""
+
+    def __init__(self, command: list[str]):
+        """Initialize the endpoint.
+
+        Args:
+            command (list[str]): Command line of the simulator, e.g. standin_command().
+        """
+        super().__init__()
+        self.command = command
+        self.process: asyncio.subprocess.Process = None
+
+    async def open(self):
+        self.process = await asyncio.create_subprocess_exec(*self.command, stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE)
+        self.reader = self.process.stdout
+        self.writer = self.process.stdin
+
+    async def close(self):
+        await super().close()
+        await self.process.wait()
+
+
+class SocketEndpoint(Endpoint):
+    """Simulator listening on a TCP socket, e.g. `python cosim/standin.py --listen 5000` on another host."""
+
+    def __init__(self, host: str, port: int):
+        """Initialize the endpoint.
+
+        Args:
+            host (str): Host the simulator listens on.
+            port (int): Port the simulator listens on.
+        """
+        super().__init__()
+        self.host = host
+        self.port = port
+
+    async def open(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
@@ -0,0 +1,47 @@
+"""Stand-in for a simulator process, to test the co-simulation coordinator without real simulators.
+
+It answers every run message of the coordinator (see cosim.endpoints) after sleeping for the host time the model
+expects the quanta to take, times --time-scale. It talks over stdin and stdout, or over one TCP connection with --listen.
+Only the standard library is used, so it can be started on its own as a script.
+"""
+import argparse
+import json
+import socket
+import sys
+import time
+
+
+def serve(lines, write, time_scale: float):
+    """Answer the run messages read from lines until a stop message or the end of the input."""
+    write(json.dumps({"type": "ready"}) + "\n")
+    for line in lines:
+        message = json.loads(line)
+        if message["type"] == "stop":
+            break
+        start = time.perf_counter_ns()
+        time.sleep(message["host_nanoseconds"] * time_scale * 1e-9)
+        elapsed = time.perf_counter_ns() - start
+        write(json.dumps({"type": "done", "host_nanoseconds": elapsed}) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--time-scale", type=float, default=1.0, help="Factor applied to the host time of every quanta.")
+    parser.add_argument("--listen", type=int, default=None, help="Serve one coordinator on this TCP port instead of stdin and stdout.")
+    arguments = parser.parse_args()
+
+    if arguments.listen is None:
+        def write(text):
+            sys.stdout.write(text)
+            sys.stdout.flush()
+        serve(sys.stdin, write, arguments.time_scale)
+        return
+
+    with socket.create_server(("", arguments.listen)) as server:
+        connection, _ = server.accept()
+        with connection, connection.makefile("r") as lines:
+            serve(lines, lambda text: connection.sendall(text.encode()), arguments.time_scale)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+from .event_driven import EventDrivenEngine
+from .vectorized import VectorizedEngine
+from .fast_forward import SteadyStateDetector
+from .ensemble import EnsembleEngine
+from .parallel import ParallelEngine, partition_nodes
+
+ENGINES = {
+    "event": EventDrivenEngine,
+    "vectorized": VectorizedEngine,
+    "parallel": ParallelEngine,
+}
+
+__all__ = [
+    "EventDrivenEngine",
+    "VectorizedEngine",
+    "SteadyStateDetector",
+    "EnsembleEngine",
+    "ParallelEngine",
+    "partition_nodes",
+    "ENGINES",
+]
@@ -0,0 +1,178 @@
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from simulation_nodes import SimulationNode
+from .vectorized import MODE_CODES, NEVER, QUANTA_SIMULATION, WAITING_ON_BARRIER, SYNCHRONIZATION, VectorizedEngine
+
+if TYPE_CHECKING:
+    from multi_node import MultiNodeSimulation
+
+
+class EnsembleEngine:
+    """Runs independent noise realizations of one simulation at once, with a leading replica axis on the state arrays.
+
+    Replica r is the lock-step loop of the simulation where every quanta of a noise node takes
+    int(base quanta host time * (1 + factor)), with the factors drawn from node.sample_quanta_noise instead of the
+    node's own noise. Each replica advances by its own minimum every step, replicas that are done stop moving.
+    Noise factors are drawn in blocks of block_size quanta per node and replica.
+    """
+
+    def __init__(self, simulation: "MultiNodeSimulation", block_size: int = 64):
+        """Initialize the engine for a freshly initialized simulation (nothing simulated yet).
+
+        Args:
+            simulation (MultiNodeSimulation): The simulation to replicate, its goals must be set.
+            block_size (int): Number of noise factors drawn at a time per node and replica.
+        """
+        self.simulation = simulation
+        self.nodes = simulation.nodes
+        self.block_size = block_size
+
+        # Same neighbor matrix and sentinel node as the vectorized engine, the replicas always use the matrix.
+        arrays = VectorizedEngine(simulation)
+        assert arrays.is_supported(), "Ensembles need nodes that step like SimulationNode, and no listeners changing them."
+        self.neighbor_matrix = arrays.neighbor_matrix
+        if self.neighbor_matrix is None:
+            node_count = len(self.nodes)
+            degrees = np.diff(np.asarray(simulation.topology.neighbor_offsets))
+            self.neighbor_matrix = np.full((node_count, int(degrees.max())), node_count, dtype=np.int64)
+            positions = np.arange(len(arrays.edge_destination)) - np.repeat(np.cumsum(degrees) - degrees, degrees)
+            self.neighbor_matrix[arrays.edge_source, positions] = arrays.edge_destination
+
+        for node in self.nodes:
+            assert node.current_host_time_nanoseconds == 0, "Ensembles start from a simulation that has not run yet."
+            assert node.has_constant_quanta_host_time() or node.sample_quanta_noise(np.random.default_rng(0), (1,)) is not None, \
+                f"Node {node.get_id()} has a variable quanta host time but can not sample its noise."
+
+    def load_state(self, replicas: int, rng: np.random.Generator):
+        """Build the (replicas, nodes + sentinel) state arrays from the initial state of the nodes."""
+        nodes = self.nodes
+        node_count = len(nodes)
+        self.rng = rng
+        self.replicas = replicas
+
+        def per_node(values, sentinel=0):
+            return np.array(list(values) + [sentinel], dtype=np.int64)
+
+        self.quanta_nanoseconds = per_node(node.get_quanta_nanoseconds() for node in nodes)
+        self.instructions_per_quanta = per_node(node.get_instructions_per_quanta() for node in nodes)
+        self.barrier_time = per_node(
+            node.get_synchronization_communication_overhead() + node.get_synchronization_overhead_in_nanoseconds() for node in nodes
+        )
+        # Host time of a quanta without noise, kept as float for the noise nodes to truncate after applying the factor.
+        self.base_quanta_host_time = np.array(
+            [SimulationNode.target_quanta_nanoseconds_to_host_nanoseconds(node) for node in nodes] + [0], dtype=np.float64
+        )
+        self.constant_quanta_host_time = per_node(
+            node.target_quanta_nanoseconds_to_host_nanoseconds() if node.has_constant_quanta_host_time() else 0 for node in nodes
+        )
+        self.noisy = np.array([not node.has_constant_quanta_host_time() for node in nodes], dtype=bool)
+        self.noisy_nodes = np.flatnonzero(self.noisy)
+        self.instructions_goal = per_node(node.target_instructions_goal for node in nodes)
+        self.target_time_goal = per_node(node.target_time_nanoseconds_goal for node in nodes)
+
+        self.current_time_nanoseconds = np.zeros(replicas, dtype=np.int64)
+        self.target_time = np.tile(per_node(node.current_target_time_nanoseconds for node in nodes), (replicas, 1))
+        self.instructions = np.tile(per_node(node.target_instructions_executed for node in nodes), (replicas, 1))
+        self.mode = np.tile(np.array([MODE_CODES[node.MODE] for node in nodes] + [WAITING_ON_BARRIER], dtype=np.int8), (replicas, 1))
+        self.end_time = np.tile(per_node((
+            NEVER if node.execution_details is None else node.execution_details.get_total_execution_time() for node in nodes
+        ), sentinel=NEVER), (replicas, 1))
+
+        # noise[k, r, b] is the b-th drawn factor of noise node noisy_nodes[k] in replica r.
+        self.noise = np.zeros((len(self.noisy_nodes), replicas, self.block_size))
+        self.noise_cursor = np.zeros((replicas, node_count + 1), dtype=np.int64)
+        # Last factor used by each replica, new blocks continue from it for models with memory (AR1Noise).
+        self.last_noise = np.zeros((len(self.noisy_nodes), replicas))
+        for k in range(len(self.noisy_nodes)):
+            self.refill_noise(k, continued=False)
+
+        # The first quanta of the noise nodes was drawn by the node itself, redraw it for every replica.
+        starting = np.zeros((replicas, node_count + 1), dtype=bool)
+        starting[:, self.noisy_nodes] = self.mode[:, self.noisy_nodes] == QUANTA_SIMULATION
+        self.end_time[starting] = self.quanta_host_time(starting)[starting]
+
+        self.done = self.is_done()
+        self.done[:, node_count] = True
+        self.first_step = True
+
+    def refill_noise(self, k: int, continued: bool = True):
+        """Draw a new block of factors for the k-th noise node, in every replica."""
+        node = self.nodes[self.noisy_nodes[k]]
+        previous = self.last_noise[k] if continued else None
+        self.noise[k] = node.sample_quanta_noise(self.rng, (self.replicas, self.block_size), previous=previous)
+        self.noise_cursor[:, self.noisy_nodes[k]] = 0
+
+    def quanta_host_time(self, starting: np.ndarray):
+        """Host time of a new quanta for the (replica, node) entries that start one, consumes their noise."""
+        host_time = np.broadcast_to(self.constant_quanta_host_time, starting.shape).copy()
+        for k, i in enumerate(self.noisy_nodes):
+            replicas = np.flatnonzero(starting[:, i])
+            if len(replicas) == 0:
+                continue
+            if self.noise_cursor[replicas, i].max() >= self.block_size:
+                self.refill_noise(k)
+            factors = self.noise[k, replicas, self.noise_cursor[replicas, i]]
+            self.noise_cursor[replicas, i] += 1
+            self.last_noise[k, replicas] = factors
+            # Same float arithmetic and truncation as int(without_noise * (1 + noise_factor)) in the noise nodes.
+            host_time[replicas, i] = np.trunc(self.base_quanta_host_time[i] * (1 + factors)).astype(np.int64)
+        return host_time
+
+    def is_done(self):
+        """SimulationNode.is_done for every replica and node."""
+        return np.where(
+            self.instructions_goal > 0,
+            self.instructions >= self.instructions_goal,
+            (self.target_time_goal > 0) & (self.target_time >= self.target_time_goal)
+        )
+
+    def step(self, running: np.ndarray):
+        """Do one step of the lock-step loop in every running replica."""
+        next_time = self.end_time.min(axis=1)
+        if (next_time[running] == NEVER).any():
+            raise ValueError("Nodes are not finished yet, but none of them can make progress.")
+        self.current_time_nanoseconds = np.where(running, next_time, self.current_time_nanoseconds)
+        now = self.current_time_nanoseconds[:, np.newaxis]
+
+        ending = (self.end_time == next_time[:, np.newaxis]) & running[:, np.newaxis]
+        in_quanta = self.mode == QUANTA_SIMULATION
+        quanta_ending = ending & in_quanta
+        synchronization_ending = ending & ~in_quanta
+
+        self.target_time += np.where(quanta_ending, self.quanta_nanoseconds, 0)
+        self.instructions += np.where(quanta_ending, self.instructions_per_quanta, 0)
+        self.mode[quanta_ending] = WAITING_ON_BARRIER
+        self.end_time[quanta_ending] = NEVER
+        self.done |= quanta_ending & self.is_done()
+
+        self.mode[synchronization_ending] = QUANTA_SIMULATION
+        self.end_time = np.where(synchronization_ending, now + self.quanta_host_time(synchronization_ending), self.end_time)
+
+        if self.simulation.has_global_barrier:
+            releasing = ~(self.mode == QUANTA_SIMULATION).any(axis=1) & running
+            if not self.first_step:
+                releasing &= quanta_ending.any(axis=1)
+            releasing = np.broadcast_to(releasing[:, np.newaxis], self.mode.shape).copy()
+            releasing[:, -1] = False
+        else:
+            quanta_target_time = np.where(self.mode == QUANTA_SIMULATION, self.target_time, NEVER)
+            rows = np.arange(self.replicas)[:, np.newaxis, np.newaxis]
+            behind = quanta_target_time[rows, self.neighbor_matrix[np.newaxis]].min(axis=2)
+            releasing = (self.mode[:, :-1] == WAITING_ON_BARRIER) & ~self.done[:, :-1] & (behind > self.target_time[:, :-1])
+            releasing = np.concatenate((releasing, np.zeros((self.replicas, 1), dtype=bool)), axis=1) & running[:, np.newaxis]
+        self.mode[releasing] = SYNCHRONIZATION
+        self.end_time = np.where(releasing, now + self.barrier_time, self.end_time)
+        self.first_step = False
+
+    def run(self, replicas: int, rng: np.random.Generator):
+        """Run the replicas until each of them is done, returns their host times."""
+        self.load_state(replicas, rng)
+        # Like the lock-step loop, every replica does at least one step.
+        self.step(np.ones(replicas, dtype=bool))
+        running = ~self.done.all(axis=1)
+        while running.any():
+            self.step(running)
+            running = ~self.done.all(axis=1)
+        return self.current_time_nanoseconds.copy()
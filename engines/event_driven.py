@@ -0,0 +1,178 @@
+import heapq
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from multi_node import MultiNodeSimulation
+
+# Up to this many nodes nearly every node transitions at every step, the lock-step loop does the same work with less
+# bookkeeping.
+LOCKSTEP_MAX_NODES = 3
+# Fewest nodes for which VectorizedEngine runs a global barrier faster, below it the fixed cost of its array
+# operations is more than the per-node work it saves.
+VECTORIZED_MIN_NODES = 16
+
+
+class EventDrivenEngine:
+    """Discrete-event engine, returns the same results as the lock-step loop in MultiNodeSimulation.simulate.
+
+    Every node that is not waiting on a barrier has exactly one pending transition: the host time at which its
+    current execution details run out. The nodes are kept in buckets by the time of that transition, with a heap of
+    the times, so a step only touches the nodes whose transition is due, plus the barriers they can affect, and nodes
+    moving in step (same speed, same quanta) cost one heap operation per step, not one per node. Nodes that are not
+    touched keep an old host time and are caught up (node.simulate with the missing host time) right before they are
+    used.
+
+    With a global barrier and no noise, the barrier keeps the nodes in step and nearly all of them transition at every
+    step, there is nothing to skip: those runs are handed to VectorizedEngine when it supports them and there are
+    VECTORIZED_MIN_NODES nodes or more. Runs of at most LOCKSTEP_MAX_NODES nodes are handed to the lock-step loop.
+    """
+
+    def __init__(self, simulation: "MultiNodeSimulation"):
+        """Initialize the engine for a simulation, the simulation must already be initialized."""
+        self.simulation = simulation
+        self.nodes = simulation.nodes
+        self.barrier_tracker = simulation.barrier_tracker
+
+        # Host time of a pending transition -> indices of the nodes it is due for, and a heap of those times.
+        self.due: dict[int, list[int]] = {}
+        self.times: list[int] = []
+        self.current_time_nanoseconds = 0
+
+    def catch_up(self, i: int):
+        """Bring a node that was not touched by the last steps to the current host time."""
+        node = self.nodes[i]
+        lag = self.current_time_nanoseconds - node.current_host_time_nanoseconds
+        if lag > 0:
+            node.simulate(lag)
+
+    def schedule(self, i: int):
+        """Add the next transition of a node that has none pending, nothing for a node waiting on its barrier."""
+        node = self.nodes[i]
+        if node.MODE != "WAITING_ON_BARRIER":
+            event_time = self.current_time_nanoseconds + node.execution_details.get_time_left_ns()
+            bucket = self.due.get(event_time)
+            if bucket is None:
+                self.due[event_time] = [i]
+                heapq.heappush(self.times, event_time)
+            else:
+                bucket.append(i)
+
+    def schedule_all(self):
+        """Replace the pending transitions by the next one of every node, in one pass."""
+        self.due.clear()
+        self.times.clear()
+        for i in range(len(self.nodes)):
+            self.schedule(i)
+
+    def release_all(self):
+        """Move every node to synchronization at the current host time, for the global barrier.
+
+        The nodes still synchronizing restart and their pending transitions are dropped, every node is scheduled again
+        in the same pass.
+        """
+        current_time = self.current_time_nanoseconds
+        pending = self.due
+        pending.clear()
+        for i, node in enumerate(self.nodes):
+            lag = current_time - node.current_host_time_nanoseconds
+            if lag > 0:
+                node.simulate(lag)
+            node.change_mode("SYNCHRONIZATION")
+            event_time = current_time + node.execution_details.get_time_left_ns()
+            bucket = pending.get(event_time)
+            if bucket is None:
+                pending[event_time] = [i]
+            else:
+                bucket.append(i)
+        # One heapify instead of a push per distinct time.
+        self.times[:] = pending
+        heapq.heapify(self.times)
+
+    def run(self):
+        """Run until every node is done and return the host time, like MultiNodeSimulation.simulate."""
+        nodes = self.nodes
+        node_count = len(nodes)
+        has_global_barrier = self.simulation.has_global_barrier
+        if node_count <= LOCKSTEP_MAX_NODES:
+            for _ in self.simulation.run_lockstep():
+                pass
+            return max(node.current_host_time_nanoseconds for node in nodes)
+        if has_global_barrier and node_count >= VECTORIZED_MIN_NODES and all(node.has_constant_quanta_host_time() for node in nodes):
+            from .vectorized import VectorizedEngine
+
+            engine = VectorizedEngine(self.simulation)
+            if engine.is_supported():
+                return engine.run()
+
+        self.current_time_nanoseconds = max(node.current_host_time_nanoseconds for node in nodes)
+        for i in range(node_count):
+            self.catch_up(i)
+        self.schedule_all()
+
+        done = [node.is_done() for node in nodes]
+        done_count = sum(done)
+        barrier_tracker = self.barrier_tracker
+
+        # schedule_all and release_all refill these in place, they stay valid for the whole run.
+        pending = self.due
+        times = self.times
+        pop_ready = barrier_tracker.pop_ready
+        steps = 0
+        finished = False
+        while not finished:
+            steps += 1
+            if not times:
+                raise ValueError("Nodes are not finished yet, but none of them can make progress.")
+            event_time = heapq.heappop(times)
+            assert event_time > self.current_time_nanoseconds, "Nodes are not finished yet, but no time to simulate. This should not happen."
+            self.current_time_nanoseconds = event_time
+
+            # Same order as the lock-step loop: transitions happen in node order, so nodes sharing the global random
+            # state draw their noise in the same order.
+            due = pending.pop(event_time)
+            if len(due) > 1:
+                due.sort()
+            for i in due:
+                node = nodes[i]
+                previous_mode = node.MODE
+                node.simulate(event_time - node.current_host_time_nanoseconds)
+                # schedule(i), inlined: this is the only per-node work of a step.
+                if node.MODE != "WAITING_ON_BARRIER":
+                    next_time = event_time + node.execution_details.get_time_left_ns()
+                    bucket = pending.get(next_time)
+                    if bucket is None:
+                        pending[next_time] = [i]
+                        heapq.heappush(times, next_time)
+                    else:
+                        bucket.append(i)
+
+                if previous_mode == "QUANTA_SIMULATION" and not done[i] and node.is_done():
+                    done[i] = True
+                    done_count += 1
+
+            finished = done_count == node_count
+
+            if has_global_barrier:
+                if barrier_tracker.is_global_barrier_ready():
+                    self.release_all()
+            else:
+                # Releasing a node, with the same inlined scheduling.
+                for i in pop_ready():
+                    node = nodes[i]
+                    lag = event_time - node.current_host_time_nanoseconds
+                    if lag > 0:
+                        node.simulate(lag)
+                    node.change_mode("SYNCHRONIZATION")
+                    next_time = event_time + node.execution_details.get_time_left_ns()
+                    bucket = pending.get(next_time)
+                    if bucket is None:
+                        pending[next_time] = [i]
+                        heapq.heappush(times, next_time)
+                    else:
+                        bucket.append(i)
+
+        for i in range(node_count):
+            self.catch_up(i)
+        self.simulation.step_count += steps
+
+        return self.current_time_nanoseconds
@@ -0,0 +1,113 @@
+from simulation_nodes import SimulationNode
+
+
+class SteadyStateDetector:
+    """Detects when the joint state of the nodes repeats and jumps ahead by whole periods.
+
+    The future of a simulation only depends on the modes, the time left in the current execution details, the target
+    times relative to each other and which nodes are done. When every quanta takes the same host time that state is a
+    deterministic function of the previous one, so once it repeats every following period adds the same host time,
+    target time, instructions and compute, wait and sync host time to each node. The detector then moves those ahead
+    by as many whole periods as it can without any node reaching its goal, and the engine finishes the remainder
+    normally.
+    """
+
+    def __init__(self, nodes: list[SimulationNode], max_history: int = 100_000):
+        """Initialize the detector.
+
+        Args:
+            nodes (list[SimulationNode]): The nodes of the simulation, in simulation order.
+            max_history (int): Number of states remembered before the history is cleared, bounds the memory used while waiting for a period.
+        """
+        self.nodes = nodes
+        self.max_history = max_history
+        # For every state seen: the host time, and per node the target time, instructions and host time accumulators.
+        self.history: dict[tuple, tuple[int, list[tuple[int, int, int, int, int]]]] = {}
+        self.is_applicable = all(node.has_constant_quanta_host_time() for node in nodes)
+
+    def state_key(self):
+        """Key of the joint state, equal for two states with the same future up to a shift of the clocks."""
+        min_target_time = min(node.current_target_time_nanoseconds for node in self.nodes)
+        return tuple(
+            (
+                node.MODE,
+                None if node.execution_details is None else node.execution_details.get_time_left_ns(),
+                node.current_target_time_nanoseconds - min_target_time,
+                node.is_done(),
+            )
+            for node in self.nodes
+        )
+
+    def get_clocks(self):
+        """Target time, instructions and compute, wait and sync host time of every node, the values a period moves."""
+        return [
+            (
+                node.current_target_time_nanoseconds,
+                node.target_instructions_executed,
+                node.compute_host_time_nanoseconds,
+                node.wait_host_time_nanoseconds,
+                node.sync_host_time_nanoseconds,
+            )
+            for node in self.nodes
+        ]
+
+    def periods_before_goal(self, target_time_period: list[int], instructions_period: list[int]):
+        """Largest number of periods that can be skipped while every node that is not done stays short of its goal."""
+        periods = None
+        for node, target_time_increment, instructions_increment in zip(self.nodes, target_time_period, instructions_period):
+            if node.is_done():
+                continue
+            if node.target_instructions_goal > 0:
+                progress, goal, increment = node.target_instructions_executed, node.target_instructions_goal, instructions_increment
+            elif node.target_time_nanoseconds_goal > 0:
+                progress, goal, increment = node.current_target_time_nanoseconds, node.target_time_nanoseconds_goal, target_time_increment
+            else:
+                continue
+            if increment <= 0:
+                continue
+            # Skipping m periods is safe if the node is still short of its goal after them: its progress never
+            # decreases, so it also was at every step in between.
+            node_periods = -(-(goal - progress) // increment) - 1
+            periods = node_periods if periods is None else min(periods, node_periods)
+        return 0 if periods is None else periods
+
+    def observe(self):
+        """Record the state after a step, jump ahead if it repeats. Returns the number of periods skipped."""
+        if not self.is_applicable:
+            return 0
+
+        key = self.state_key()
+        host_time = self.nodes[0].current_host_time_nanoseconds
+        clocks = self.get_clocks()
+
+        previous = self.history.get(key)
+        if previous is None:
+            if len(self.history) >= self.max_history:
+                self.history.clear()
+            self.history[key] = (host_time, clocks)
+            return 0
+
+        previous_host_time, previous_clocks = previous
+        host_time_period = host_time - previous_host_time
+        # What every node gained over one period, measured rather than derived from its quanta: a barrier released
+        # again before its synchronization ended, for one, does not add a whole synchronization.
+        increments = [
+            tuple(now - before for now, before in zip(node_clocks, node_previous_clocks))
+            for node_clocks, node_previous_clocks in zip(clocks, previous_clocks)
+        ]
+
+        periods = self.periods_before_goal([increment[0] for increment in increments], [increment[1] for increment in increments])
+        if periods <= 0:
+            self.history[key] = (host_time, clocks)
+            return 0
+
+        for node, (target_time_increment, instructions_increment, compute_increment, wait_increment, sync_increment) in zip(self.nodes, increments):
+            node.current_host_time_nanoseconds += periods * host_time_period
+            node.current_target_time_nanoseconds += periods * target_time_increment
+            node.target_instructions_executed += periods * instructions_increment
+            node.compute_host_time_nanoseconds += periods * compute_increment
+            node.wait_host_time_nanoseconds += periods * wait_increment
+            node.sync_host_time_nanoseconds += periods * sync_increment
+        # The clocks moved, the remembered states are not a period behind anymore.
+        self.history.clear()
+        return periods
@@ -0,0 +1,401 @@
+from multiprocessing.sharedctypes import RawArray
+from threading import BrokenBarrierError
+from typing import TYPE_CHECKING
+import heapq
+import multiprocessing
+import os
+
+import numpy as np
+
+from simulation_nodes import SimulationNode
+from .event_driven import EventDrivenEngine
+from .vectorized import MODE_CODES, NEVER, QUANTA_SIMULATION, WAITING_ON_BARRIER, SYNCHRONIZATION
+
+if TYPE_CHECKING:
+    from multi_node import MultiNodeSimulation
+    from topology import CompiledTopology
+
+
+def partition_nodes(topology: "CompiledTopology", count: int) -> list[list[int]]:
+    """Split the node indices into up to count parts of equal size.
+
+    The parts are consecutive runs of a breadth first order of the graph, so each of them is a connected region and
+    few edges (and so few boundary nodes) are cut.
+    """
+    node_count = topology.get_node_count()
+    neighbors = topology.rows()[0]
+    order = []
+    seen = [False] * node_count
+    for root in range(node_count):
+        if seen[root]:
+            continue
+        seen[root] = True
+        head = len(order)
+        order.append(root)
+        while head < len(order):
+            for j in neighbors[order[head]]:
+                if not seen[j]:
+                    seen[j] = True
+                    order.append(j)
+            head += 1
+    size = -(-node_count // count)
+    return [sorted(order[start:start + size]) for start in range(0, node_count, size)]
+
+
+class ParallelEngine:
+    """Conservative parallel engine for local barriers, returns the same results as the lock-step loop.
+
+    The graph is partitioned and every partition is simulated by its own worker process, with the same per-node
+    stepping as EventDrivenEngine. A node only interacts with its neighbors through their barrier state (in quanta or
+    not, and at which target time), so a partition only needs the state of the remote neighbors of its nodes (its
+    ghosts). That state is known ahead of time up to a lookahead: a quanta that started ends at a known host time,
+    and a node that ended its quanta or waits on its barrier can not start a new one before it went through its
+    synchronization, so before its synchronization overhead has passed.
+
+    Workers run in synchronous windows. Each one publishes the barrier state of its boundary nodes to shared memory,
+    waits for the others, and simulates its nodes up to the horizon until which the state of every boundary node is
+    known (see PartitionWorker.get_horizon), so that all of them end the window at the same host time. The windows
+    repeat until every node is done. The lookahead comes from the synchronization overheads, the edge latencies only
+    set the quanta. Nodes drawing their noise from the shared global random state or without a noise state, global barriers, zero
+    synchronization overheads on boundary nodes, listeners changing the nodes, a recorded timeline and simulations
+    that already ran are handed to EventDrivenEngine. Workers are forked, step_count counts windows for this engine.
+    Each worker sends back the clocks and the noise state (see SimulationNode.get_noise_state) of its nodes.
+    """
+
+    def __init__(self, simulation: "MultiNodeSimulation", processes: int = None, partitions: list[list[int]] = None):
+        """Initialize the engine for a freshly initialized simulation.
+
+        Args:
+            simulation (MultiNodeSimulation): The simulation to run.
+            processes (int): Number of worker processes (and partitions), the number of cores by default.
+            partitions (list[list[int]]): Node indices of each partition, see partition_nodes by default.
+        """
+        self.simulation = simulation
+        self.nodes = simulation.nodes
+        self.processes = processes or os.cpu_count()
+        self.partitions = partitions if partitions is not None else partition_nodes(simulation.topology, self.processes)
+
+        node_count = len(self.nodes)
+        self.owner = [0] * node_count
+        for p, partition in enumerate(self.partitions):
+            for i in partition:
+                self.owner[i] = p
+        neighbors = simulation.topology.rows()[0]
+        self.boundary = [i for i in range(node_count) if any(self.owner[j] != self.owner[i] for j in neighbors[i])]
+        self.boundary_position = {i: position for position, i in enumerate(self.boundary)}
+        # Edges between partitions, as boundary positions in both directions.
+        cut = [(self.boundary_position[i], self.boundary_position[j]) for i in self.boundary for j in neighbors[i] if self.owner[j] != self.owner[i]]
+        self.cut_sources = np.array([source for source, _ in cut], dtype=np.int64)
+        self.cut_targets = np.array([target for _, target in cut], dtype=np.int64)
+
+    def is_supported(self):
+        """Check if the simulation can be run in parallel with the same results."""
+        simulation = self.simulation
+        if simulation.has_global_barrier or simulation.barrier_groups is not None or simulation.needs_node_stepping() or simulation.timeline is not None or len(self.partitions) < 2:
+            return False
+        if "fork" not in multiprocessing.get_all_start_methods():
+            return False
+        for node in self.nodes:
+            if node.uses_shared_random_state():
+                return False
+            # The noise a worker advanced has to come back to the parent, see SimulationNode.get_noise_state.
+            if not node.has_constant_quanta_host_time() and type(node).get_noise_state is SimulationNode.get_noise_state:
+                return False
+            if node.current_host_time_nanoseconds != 0 or node.MODE != "QUANTA_SIMULATION":
+                return False
+        return all(
+            self.nodes[i].get_synchronization_communication_overhead() + self.nodes[i].get_synchronization_overhead_in_nanoseconds() > 0
+            for i in self.boundary
+        )
+
+    def run(self):
+        """Run until every node is done and return the host time, like MultiNodeSimulation.simulate."""
+        if not self.is_supported():
+            return EventDrivenEngine(self.simulation).run()
+
+        nodes = self.nodes
+        partition_count = len(self.partitions)
+        context = multiprocessing.get_context("fork")
+
+        # Everything the workers share, double buffered by window parity: a worker writes one buffer while the others
+        # may still read the other one, the barrier between windows keeps them apart.
+        def shared(width):
+            return np.frombuffer(RawArray("q", max(2 * width, 1)), dtype=np.int64)[:2 * width].reshape(2, width)
+
+        boundary_count = len(self.boundary)
+        self.boundary_mode = shared(boundary_count)
+        self.boundary_target = shared(boundary_count)
+        self.boundary_event = shared(boundary_count)
+        self.boundary_done = shared(boundary_count)
+        self.boundary_release = shared(boundary_count)
+        self.partition_done_count = shared(partition_count)
+        self.partition_pending = shared(partition_count)
+        self.barrier = context.Barrier(partition_count)
+        results = context.Queue()
+
+        self.barrier_time = [node.get_synchronization_communication_overhead() + node.get_synchronization_overhead_in_nanoseconds() for node in nodes]
+        self.quanta_host_time = [node.target_quanta_nanoseconds_to_host_nanoseconds() if node.has_constant_quanta_host_time() else None for node in nodes]
+        self.boundary_barrier_time = np.array([self.barrier_time[i] for i in self.boundary], dtype=np.int64)
+        # -1 for nodes whose quanta host time is noisy.
+        self.boundary_quanta_host_time = np.array([
+            -1 if self.quanta_host_time[i] is None else self.quanta_host_time[i] for i in self.boundary
+        ], dtype=np.int64)
+        # A noisy quanta takes at least a nanosecond.
+        self.minimum_quanta_host_time = [1 if quanta_host_time is None else quanta_host_time for quanta_host_time in self.quanta_host_time]
+        self.boundary_minimum_quanta_host_time = np.maximum(self.boundary_quanta_host_time, 1)
+
+        workers = [context.Process(target=self.run_worker, args=(p, results)) for p in range(partition_count)]
+        for worker in workers:
+            worker.start()
+        messages = [results.get() for _ in workers]
+        for worker in workers:
+            worker.join()
+
+        errors = [message[1] for message in messages if message[0] == "error"]
+        if errors:
+            raise errors[0]
+
+        rows = [row for message in messages for row in message[1]]
+        end_time = max(row[6] for row in rows)
+        for i, target_time, instructions, compute, wait, sync, done_time, noise_state in rows:
+            node = nodes[i]
+            # The workers advanced the noise of their nodes, continuing the run (or a checkpoint, fork or cache entry of
+            # it) draws from where they stopped.
+            node.set_noise_state(noise_state)
+            node.current_host_time_nanoseconds = end_time
+            node.current_target_time_nanoseconds = target_time
+            node.target_instructions_executed = instructions
+            node.compute_host_time_nanoseconds = compute
+            # Done nodes wait on their barrier until the last node is done.
+            node.wait_host_time_nanoseconds = wait + end_time - done_time
+            node.sync_host_time_nanoseconds = sync
+            node.MODE = "WAITING_ON_BARRIER"
+            node.execution_details = None
+        self.simulation.step_count += max(message[2] for message in messages)
+        return end_time
+
+    def run_worker(self, p: int, results: multiprocessing.Queue):
+        """Worker process entry point, simulates partition p and puts its result (or its error) on the queue."""
+        try:
+            worker = PartitionWorker(self, p)
+            rows, windows = worker.run()
+            results.put(("result", rows, windows))
+        except BrokenBarrierError:
+            # Another worker failed, it reports the error.
+            results.put(("aborted", [], 0))
+        except Exception as error:
+            self.barrier.abort()
+            results.put(("error", error, 0))
+
+
+class PartitionWorker:
+    """Simulates the nodes of one partition of a ParallelEngine, inside its worker process."""
+
+    def __init__(self, engine: ParallelEngine, p: int):
+        """Initialize the worker for partition p."""
+        self.engine = engine
+        self.p = p
+        self.nodes = engine.nodes
+        self.local = engine.partitions[p]
+        neighbors = engine.simulation.topology.rows()[0]
+        owner = engine.owner
+
+        self.neighbors = {i: neighbors[i] for i in self.local}
+        self.local_boundary = [i for i in self.local if i in engine.boundary_position]
+        self.ghosts = sorted({j for i in self.local for j in neighbors[i] if owner[j] != p})
+        # For every node whose quanta end can release local nodes, its local neighbors.
+        self.local_neighbors = {i: [j for j in neighbors[i] if owner[j] == p] for i in self.local + self.ghosts}
+
+        self.now = 0
+        self.heap: list[tuple[int, int, int]] = []
+        self.sequence = {i: 0 for i in self.local}
+        self.done_time = {i: None for i in self.local}
+        self.done_count = 0
+        self.ghost_mode: dict[int, int] = {}
+        self.ghost_target: dict[int, int] = {}
+        self.ghost_events: list[tuple[int, int, int]] = []
+
+    def catch_up(self, i: int):
+        """Bring a local node to the current host time, see EventDrivenEngine.catch_up."""
+        node = self.nodes[i]
+        lag = self.now - node.current_host_time_nanoseconds
+        if lag > 0:
+            node.simulate(lag)
+
+    def schedule(self, i: int):
+        """Push the next transition of a local node, invalidating the one it had before."""
+        node = self.nodes[i]
+        self.sequence[i] += 1
+        if node.MODE != "WAITING_ON_BARRIER":
+            heapq.heappush(self.heap, (self.now + node.execution_details.get_time_left_ns(), i, self.sequence[i]))
+
+    def next_event_time(self):
+        """Drop invalidated transitions and return the time of the next valid one, NEVER if there is none."""
+        heap = self.heap
+        while heap and heap[0][2] != self.sequence[heap[0][1]]:
+            heapq.heappop(heap)
+        return heap[0][0] if heap else NEVER
+
+    def publish(self, buffer: int):
+        """Write the barrier state of the boundary nodes and the progress of the partition to shared memory."""
+        engine = self.engine
+        for i in self.local_boundary:
+            position = engine.boundary_position[i]
+            node = self.nodes[i]
+            engine.boundary_mode[buffer, position] = MODE_CODES[node.MODE]
+            engine.boundary_target[buffer, position] = node.current_target_time_nanoseconds
+            engine.boundary_done[buffer, position] = node.is_done()
+            if node.MODE == "WAITING_ON_BARRIER":
+                engine.boundary_event[buffer, position] = NEVER
+                engine.boundary_release[buffer, position] = min((self.get_next_quanta_end(j) for j in self.local_neighbors[i]), default=NEVER)
+            else:
+                engine.boundary_event[buffer, position] = node.current_host_time_nanoseconds + node.execution_details.get_time_left_ns()
+        engine.partition_done_count[buffer, self.p] = self.done_count
+        engine.partition_pending[buffer, self.p] = self.next_event_time() != NEVER
+
+    def get_next_quanta_end(self, i: int):
+        """Earliest host time after the current one at which the quanta of local node i can end."""
+        node = self.nodes[i]
+        if node.MODE == "WAITING_ON_BARRIER":
+            if node.is_done():
+                return NEVER
+            return self.now + 1 + self.engine.barrier_time[i] + self.engine.minimum_quanta_host_time[i]
+        end_time = node.current_host_time_nanoseconds + node.execution_details.get_time_left_ns()
+        if node.MODE == "SYNCHRONIZATION":
+            end_time += self.engine.minimum_quanta_host_time[i]
+        return end_time
+
+    def read_ghosts(self, buffer: int):
+        """Load the state and the known transitions of the ghosts."""
+        engine = self.engine
+        self.ghost_events = []
+        for j in self.ghosts:
+            position = engine.boundary_position[j]
+            mode = int(engine.boundary_mode[buffer, position])
+            event_time = int(engine.boundary_event[buffer, position])
+            self.ghost_mode[j] = mode
+            self.ghost_target[j] = int(engine.boundary_target[buffer, position])
+            if mode == QUANTA_SIMULATION:
+                self.ghost_events.append((event_time, j, WAITING_ON_BARRIER))
+            elif mode == SYNCHRONIZATION:
+                self.ghost_events.append((event_time, j, QUANTA_SIMULATION))
+                quanta_host_time = engine.quanta_host_time[j]
+                if quanta_host_time is not None:
+                    self.ghost_events.append((event_time + quanta_host_time, j, WAITING_ON_BARRIER))
+        heapq.heapify(self.ghost_events)
+
+    def get_horizon(self, buffer: int):
+        """Host time up to which (included) the barrier state of every boundary node is known, the end of the window.
+
+        A quanta ends at a known time and the node can not start the next one before its synchronization overhead
+        passed, a node in synchronization starts its quanta at a known time and, when every quanta takes the same
+        host time, ends it at a known time too. A waiting node is only released when the quanta of a neighbor ends,
+        its workers publishes the earliest end among its local neighbors and the remote ones are taken from the
+        boundary state. Every worker computes it over all boundary nodes, so that they all move to the same time.
+        """
+        engine = self.engine
+        mode = engine.boundary_mode[buffer]
+        event_time = engine.boundary_event[buffer]
+        barrier_time = engine.boundary_barrier_time
+        quanta_host_time = engine.boundary_quanta_host_time
+        minimum_quanta_host_time = engine.boundary_minimum_quanta_host_time
+        done = engine.boundary_done[buffer] != 0
+
+        # Wrapped sums of NEVER are only computed for the modes they do not apply to, np.where drops them.
+        next_quanta_end = np.where(
+            mode == QUANTA_SIMULATION, event_time, np.where(
+                mode == SYNCHRONIZATION, event_time + minimum_quanta_host_time,
+                np.where(done, NEVER, self.now + 1 + barrier_time + minimum_quanta_host_time)
+            )
+        )
+        release = engine.boundary_release[buffer].copy()
+        np.minimum.at(release, engine.cut_targets, next_quanta_end[engine.cut_sources])
+        waiting = np.where(done | (release == NEVER), NEVER, release + barrier_time - 1)
+        synchronizing = np.where(quanta_host_time >= 0, event_time + quanta_host_time + barrier_time - 1, event_time)
+        known_until = np.where(
+            mode == QUANTA_SIMULATION, event_time + barrier_time - 1, np.where(mode == SYNCHRONIZATION, synchronizing, waiting)
+        )
+        return int(known_until.min()) if len(known_until) else NEVER
+
+    def is_blocked(self, i: int):
+        """Check if a neighbor of local node i is in quanta at a target time not after its own."""
+        nodes = self.nodes
+        target_time = nodes[i].current_target_time_nanoseconds
+        owner = self.engine.owner
+        for j in self.neighbors[i]:
+            if owner[j] == self.p:
+                if nodes[j].MODE == "QUANTA_SIMULATION" and nodes[j].current_target_time_nanoseconds <= target_time:
+                    return True
+            elif self.ghost_mode[j] == QUANTA_SIMULATION and self.ghost_target[j] <= target_time:
+                return True
+        return False
+
+    def advance(self, horizon: int):
+        """Simulate every step of the partition up to horizon (included), like EventDrivenEngine.run."""
+        nodes = self.nodes
+        heap = self.heap
+        ghost_events = self.ghost_events
+        while True:
+            ghost_time = ghost_events[0][0] if ghost_events else NEVER
+            time = min(self.next_event_time(), ghost_time)
+            if time > horizon or time == NEVER:
+                break
+            self.now = time
+
+            # Nodes that may leave their barrier: the ones whose quanta ended and the neighbors of those.
+            candidates = set()
+            while heap and heap[0][0] == time:
+                _, i, event_sequence = heapq.heappop(heap)
+                if event_sequence != self.sequence[i]:
+                    continue
+                node = nodes[i]
+                previous_mode = node.MODE
+                self.catch_up(i)
+                self.schedule(i)
+                if previous_mode == "QUANTA_SIMULATION":
+                    candidates.add(i)
+                    candidates.update(self.local_neighbors[i])
+                    if self.done_time[i] is None and node.is_done():
+                        self.done_time[i] = time
+                        self.done_count += 1
+            while ghost_events and ghost_events[0][0] == time:
+                _, j, mode = heapq.heappop(ghost_events)
+                self.ghost_mode[j] = mode
+                if mode == WAITING_ON_BARRIER:
+                    candidates.update(self.local_neighbors[j])
+
+            for i in sorted(candidates):
+                node = nodes[i]
+                if node.MODE == "WAITING_ON_BARRIER" and not node.is_done() and not self.is_blocked(i):
+                    self.catch_up(i)
+                    node.change_mode("SYNCHRONIZATION")
+                    self.schedule(i)
+        self.now = max(self.now, horizon)
+
+    def run(self):
+        """Run windows until every node of the simulation is done, return the rows of the local nodes."""
+        for i in self.local:
+            self.schedule(i)
+        engine = self.engine
+        node_count = len(self.nodes)
+        window = 0
+        while True:
+            buffer = window % 2
+            self.publish(buffer)
+            engine.barrier.wait()
+            if engine.partition_done_count[buffer].sum() == node_count:
+                break
+            if not engine.partition_pending[buffer].any():
+                raise ValueError("Nodes are not finished yet, but none of them can make progress.")
+            self.read_ghosts(buffer)
+            self.advance(self.get_horizon(buffer))
+            window += 1
+
+        rows = []
+        for i in self.local:
+            node = self.nodes[i]
+            rows.append((
+                i, node.current_target_time_nanoseconds, node.target_instructions_executed, node.compute_host_time_nanoseconds,
+                node.wait_host_time_nanoseconds, node.sync_host_time_nanoseconds, self.done_time[i], node.get_noise_state(),
+            ))
+        return rows, window
@@ -0,0 +1,480 @@
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from simulation_nodes import SimulationNode
+from .event_driven import EventDrivenEngine
+
+if TYPE_CHECKING:
+    from multi_node import MultiNodeSimulation
+
+MODES = ("QUANTA_SIMULATION", "WAITING_ON_BARRIER", "SYNCHRONIZATION")
+QUANTA_SIMULATION, WAITING_ON_BARRIER, SYNCHRONIZATION = range(len(MODES))
+MODE_CODES = {mode: code for code, mode in enumerate(MODES)}
+NEVER = np.iinfo(np.int64).max
+
+# Methods that define how a node steps, a node overriding any of them can not be described by the arrays.
+STEPPING_METHODS = ("simulate", "change_mode", "continue_quanta_simulation", "continue_sync", "is_done")
+
+
+def is_vectorizable(node: SimulationNode):
+    """Check if a node steps exactly like SimulationNode, so its state can live in the engine arrays."""
+    return all(getattr(type(node), method) is getattr(SimulationNode, method) for method in STEPPING_METHODS)
+
+
+class VectorizedEngine:
+    """Struct-of-arrays engine, returns the same results as the lock-step loop in MultiNodeSimulation.simulate.
+
+    The clocks, modes and execution details of all nodes are kept in NumPy arrays (modes encoded with MODE_CODES) and
+    the lock-step loop is done with array operations: a reduction over the whole cluster to find the next transitions,
+    then fancy indexing on the transitioning nodes and their neighbors only. Nodes with a constant quanta host time are
+    fully handled by the arrays, nodes that override target_quanta_nanoseconds_to_host_nanoseconds (the noise nodes)
+    are still asked for the length of each new quanta. If a node overrides the stepping itself, or listeners change
+    the nodes (see MultiNodeSimulation.needs_node_stepping), the simulation is handed to the per-object
+    EventDrivenEngine.
+
+    When every quanta host time is constant and there is no timeline to record, the steps are done a window at a time
+    (see step_window): the quanta ends of the next shortest quanta host time are all known in advance, so the steps
+    in it only differ by which barriers open when, and that is worked out for all of them at once. With a global
+    barrier, the whole period from one opening to the next is a single update when it is the same for every opening
+    (see step_period).
+    """
+
+    def __init__(self, simulation: "MultiNodeSimulation"):
+        """Initialize the engine for a simulation, the simulation must already be initialized."""
+        self.simulation = simulation
+        self.nodes = simulation.nodes
+        # The nodes do not change mode while the arrays hold their state, the transitions are recorded here instead.
+        self.timeline = getattr(simulation, "timeline", None)
+
+        topology = simulation.topology
+        node_count = len(self.nodes)
+        offsets = np.asarray(topology.neighbor_offsets, dtype=np.int64)
+        degrees = np.diff(offsets)
+        max_degree = int(degrees.max())
+        # Both directions, a node is blocked by edge (source, destination) if destination is behind it.
+        self.edge_source = np.repeat(np.arange(node_count), degrees)
+        self.edge_destination = np.asarray(topology.neighbor_indices, dtype=np.int64)
+
+        # Row i holds the neighbors of node i, padded with the index node_count. The arrays have one extra entry for
+        # that sentinel node, which is always waiting on its barrier and done, so it never blocks nor gets released.
+        # With very uneven degrees the matrix would be mostly padding, the local barriers then scan the edge list.
+        self.neighbor_matrix = None
+        self.neighbor_columns = None
+        if node_count * max_degree <= 4 * len(self.edge_destination):
+            self.neighbor_matrix = np.full((node_count, max_degree), node_count, dtype=np.int64)
+            positions = np.arange(len(self.edge_destination)) - np.repeat(offsets[:-1], degrees)
+            self.neighbor_matrix[self.edge_source, positions] = self.edge_destination
+            # The same matrix transposed, what the local barriers use: taking the columns of a few nodes and reducing
+            # over the first axis is several times faster than indexing and reducing the short rows of the matrix.
+            self.neighbor_columns = np.ascontiguousarray(self.neighbor_matrix.T)
+
+    def is_supported(self):
+        """Check if the arrays can describe every node of the simulation (and its master and barriers)."""
+        if self.simulation.needs_node_stepping() or self.simulation.barrier_groups is not None or not all(is_vectorizable(node) for node in self.nodes):
+            return False
+        constants = [node.get_quanta_nanoseconds() for node in self.nodes]
+        constants += [node.get_instructions_per_quanta() for node in self.nodes]
+        constants += [node.get_synchronization_communication_overhead() for node in self.nodes]
+        constants += [node.get_synchronization_overhead_in_nanoseconds() for node in self.nodes]
+        constants += [node.target_quanta_nanoseconds_to_host_nanoseconds() for node in self.nodes if node.has_constant_quanta_host_time()]
+        return all(float(value).is_integer() for value in constants)
+
+    def load_state(self):
+        """Copy the state of the node objects into the arrays."""
+        nodes = self.nodes
+
+        def array(values, sentinel=0):
+            return np.array(list(values) + [sentinel], dtype=np.int64)
+
+        self.current_time_nanoseconds = max(node.current_host_time_nanoseconds for node in nodes)
+        self.target_time = array(node.current_target_time_nanoseconds for node in nodes)
+        self.instructions = array(node.target_instructions_executed for node in nodes)
+        self.mode = np.array([MODE_CODES[node.MODE] for node in nodes] + [WAITING_ON_BARRIER], dtype=np.int8)
+        # Host time at which the current execution details started and will run out, NEVER while waiting on a barrier.
+        self.start_time = array(
+            node.current_host_time_nanoseconds - (0 if node.execution_details is None else node.execution_details.time_executed_ns)
+            for node in nodes
+        )
+        self.end_time = array((
+            NEVER if node.execution_details is None else self.start_time[i] + node.execution_details.get_total_execution_time()
+            for i, node in enumerate(nodes)
+        ), sentinel=NEVER)
+        self.quanta_instructions = array(node.execution_details.instructions_executed if node.MODE == "QUANTA_SIMULATION" else 0 for node in nodes)
+        # Host time spent in each mode up to start_time, the time since start_time goes to the current mode.
+        elapsed = [node.current_host_time_nanoseconds - int(self.start_time[i]) for i, node in enumerate(nodes)]
+        self.compute_time = array(node.compute_host_time_nanoseconds - (elapsed[i] if node.MODE == "QUANTA_SIMULATION" else 0) for i, node in enumerate(nodes))
+        self.wait_time = array(node.wait_host_time_nanoseconds - (elapsed[i] if node.MODE == "WAITING_ON_BARRIER" else 0) for i, node in enumerate(nodes))
+        self.sync_time = array(node.sync_host_time_nanoseconds - (elapsed[i] if node.MODE == "SYNCHRONIZATION" else 0) for i, node in enumerate(nodes))
+
+        self.quanta_nanoseconds = array(node.get_quanta_nanoseconds() for node in nodes)
+        self.instructions_per_quanta = array(node.get_instructions_per_quanta() for node in nodes)
+        self.communication_overhead = array(node.get_synchronization_communication_overhead() for node in nodes)
+        self.synchronization_overhead = array(node.get_synchronization_overhead_in_nanoseconds() for node in nodes)
+        self.barrier_time = self.communication_overhead + self.synchronization_overhead
+
+        self.has_constant_quanta = np.array([node.has_constant_quanta_host_time() for node in nodes] + [True], dtype=bool)
+        self.all_constant_quanta = bool(self.has_constant_quanta.all())
+        self.quanta_host_time = array(node.target_quanta_nanoseconds_to_host_nanoseconds() if node.has_constant_quanta_host_time() else 0 for node in nodes)
+        # No quanta started at some host time ends before this much later, the length of the windows of step_window.
+        self.minimum_quanta_host_time = int(self.quanta_host_time[:-1].min()) if self.all_constant_quanta else 0
+        # Once the global barrier opens every node synchronizes then runs a quanta, and it opens again at the last
+        # quanta end, unless some node ends its quanta before another ends its synchronization (0 then).
+        period_host_times = (self.barrier_time + self.quanta_host_time)[:-1]
+        self.period_host_time = 0
+        if self.all_constant_quanta and self.barrier_time[:-1].max() <= period_host_times.min():
+            self.period_host_time = int(period_host_times.max())
+        self.period_wait_time = np.append(self.period_host_time - period_host_times, 0)
+        self.period_steps = len(np.unique(np.concatenate((self.barrier_time[:-1], period_host_times))))
+        self.global_release_time = None
+        # Host time at which the nodes start a quanta later in the current window, NEVER outside of step_window.
+        self.quanta_start_time = np.full(len(nodes) + 1, NEVER, dtype=np.int64)
+
+        self.instructions_goal = array(node.target_instructions_goal for node in nodes)
+        self.target_time_goal = array(node.target_time_nanoseconds_goal for node in nodes)
+        # simulate_for_instructions and simulate_for_nanoseconds_in_target give every node the same kind of goal.
+        self.progress, self.goal = None, None
+        if all(node.target_instructions_goal > 0 for node in nodes):
+            self.progress, self.goal = self.instructions, self.instructions_goal
+        elif all(node.target_instructions_goal <= 0 and node.target_time_nanoseconds_goal > 0 for node in nodes):
+            self.progress, self.goal = self.target_time, self.target_time_goal
+        self.done = np.append(self.is_done(np.arange(len(nodes))), True)
+        self.done_count = int(self.done[:-1].sum())
+        # What the local barriers look at: target time of the nodes in quanta (NEVER for the others), and which nodes
+        # are waiting on their barrier without being done.
+        self.quanta_target_time = np.where(self.mode == QUANTA_SIMULATION, self.target_time, NEVER)
+        self.waiting = (self.mode == WAITING_ON_BARRIER) & ~self.done
+        self.in_quanta_count = int((self.mode == QUANTA_SIMULATION).sum())
+        self.first_step = True
+
+    def store_state(self):
+        """Copy the arrays back into the node objects."""
+        for i, node in enumerate(self.nodes):
+            node.current_host_time_nanoseconds = self.current_time_nanoseconds
+            node.current_target_time_nanoseconds = int(self.target_time[i])
+            node.target_instructions_executed = int(self.instructions[i])
+            node.MODE = MODES[self.mode[i]]
+            elapsed = int(self.current_time_nanoseconds - self.start_time[i])
+            node.compute_host_time_nanoseconds = int(self.compute_time[i]) + (elapsed if self.mode[i] == QUANTA_SIMULATION else 0)
+            node.wait_host_time_nanoseconds = int(self.wait_time[i]) + (elapsed if self.mode[i] == WAITING_ON_BARRIER else 0)
+            node.sync_host_time_nanoseconds = int(self.sync_time[i]) + (elapsed if self.mode[i] == SYNCHRONIZATION else 0)
+            # The records the node reuses from quanta to quanta, see SimulationNode.change_mode.
+            if self.mode[i] == QUANTA_SIMULATION:
+                node.execution_details = node.quanta_execution
+                node.execution_details.host_length_to_execute_ns = int(self.end_time[i] - self.start_time[i])
+                node.execution_details.instructions_executed = int(self.quanta_instructions[i])
+            elif self.mode[i] == SYNCHRONIZATION:
+                node.execution_details = node.barrier_execution
+                node.execution_details.communication_overhead_ns = int(self.communication_overhead[i])
+                node.execution_details.synchronization_overhead_ns = int(self.synchronization_overhead[i])
+            else:
+                node.execution_details = None
+            if node.execution_details is not None:
+                node.execution_details.time_executed_ns = int(self.current_time_nanoseconds - self.start_time[i])
+
+    def is_done(self, i: np.ndarray, after_quanta: bool = False):
+        """Vectorized SimulationNode.is_done for the given nodes.
+
+        Args:
+            i: The nodes.
+            after_quanta: Whether to check the nodes as they will be once they end their current or next quanta.
+        """
+        if self.progress is not None:
+            progress = self.progress[i]
+            if after_quanta:
+                progress = progress + (self.quanta_nanoseconds[i] if self.progress is self.target_time else self.instructions_per_quanta[i])
+            return progress >= self.goal[i]
+        target_time, instructions = self.target_time[i], self.instructions[i]
+        if after_quanta:
+            target_time, instructions = target_time + self.quanta_nanoseconds[i], instructions + self.instructions_per_quanta[i]
+        return np.where(
+            self.instructions_goal[i] > 0,
+            instructions >= self.instructions_goal[i],
+            (self.target_time_goal[i] > 0) & (target_time >= self.target_time_goal[i])
+        )
+
+    def end_quanta(self, ending: np.ndarray, times=None):
+        """Move the given nodes from their quanta to their barrier.
+
+        Args:
+            ending: The nodes ending their quanta.
+            times: Host time at which each node ends it, the current host time if None.
+        """
+        times = self.current_time_nanoseconds if times is None else times
+        self.target_time[ending] += self.quanta_nanoseconds[ending]
+        self.instructions[ending] += self.quanta_instructions[ending]
+        self.mode[ending] = WAITING_ON_BARRIER
+        self.compute_time[ending] += times - self.start_time[ending]
+        self.start_time[ending] = times
+        self.end_time[ending] = NEVER
+        self.quanta_target_time[ending] = NEVER
+        self.in_quanta_count -= len(ending)
+        newly_done = ending[~self.done[ending] & self.is_done(ending)]
+        self.done[newly_done] = True
+        self.done_count += len(newly_done)
+        self.waiting[ending] = ~self.done[ending]
+        self.record(ending, WAITING_ON_BARRIER)
+
+    def start_quanta(self, starting: np.ndarray, times=None):
+        """Start a new quanta on the given nodes (which end their synchronization), in node order like the lock-step loop.
+
+        Args:
+            starting: The nodes ending their synchronization.
+            times: Host time at which each node ends it, the current host time if None.
+        """
+        times = self.current_time_nanoseconds if times is None else times
+        self.sync_time[starting] += times - self.start_time[starting]
+        self.mode[starting] = QUANTA_SIMULATION
+        self.start_time[starting] = times
+        self.end_time[starting] = times + self.quanta_host_time[starting]
+        self.quanta_instructions[starting] = self.instructions_per_quanta[starting]
+        self.quanta_target_time[starting] = self.target_time[starting]
+        if not self.all_constant_quanta:
+            # The other nodes draw their quanta length themselves.
+            for i in starting[~self.has_constant_quanta[starting]]:
+                self.end_time[i] = self.start_time[i] + self.nodes[i].target_quanta_nanoseconds_to_host_nanoseconds()
+        self.in_quanta_count += len(starting)
+        self.record(starting, QUANTA_SIMULATION)
+
+    def start_synchronization(self, starting: np.ndarray, times=None):
+        """Move the given nodes from their barrier to synchronization.
+
+        Args:
+            starting: The nodes released by their barrier.
+            times: Host time at which each node is released, the current host time if None.
+        """
+        times = self.current_time_nanoseconds if times is None else times
+        elapsed = times - self.start_time[starting]
+        if self.simulation.has_global_barrier:
+            # A global barrier also restarts the nodes still synchronizing from the previous one, like the lock-step
+            # loop their time so far is sync time.
+            synchronizing = self.mode[starting] == SYNCHRONIZATION
+            self.wait_time[starting] += np.where(synchronizing, 0, elapsed)
+            self.sync_time[starting] += np.where(synchronizing, elapsed, 0)
+        else:
+            self.wait_time[starting] += elapsed
+        self.mode[starting] = SYNCHRONIZATION
+        self.waiting[starting] = False
+        self.start_time[starting] = times
+        self.end_time[starting] = times + self.barrier_time[starting]
+        self.record(starting, SYNCHRONIZATION)
+
+    def record(self, nodes: np.ndarray, mode: int):
+        """Record the given nodes entering mode in the timeline of the simulation, if it has one."""
+        if self.timeline is not None and len(nodes):
+            # The local barriers may release the same candidate twice.
+            nodes = np.unique(nodes)
+            self.timeline.record_many(nodes, mode, self.current_time_nanoseconds, self.target_time[nodes], self.instructions[nodes])
+
+    def release_local_barriers(self, candidates: np.ndarray):
+        """Release the candidates that are waiting, not done and have no neighbor in quanta behind them."""
+        candidates = candidates[self.waiting[candidates]]
+        if len(candidates) == 0:
+            return
+        if self.neighbor_columns is not None:
+            behind = self.quanta_target_time.take(self.neighbor_columns.take(candidates, axis=1)).min(axis=0)
+            self.start_synchronization(candidates[behind > self.target_time[candidates]])
+        else:
+            source, destination = self.edge_source, self.edge_destination
+            blocking = self.quanta_target_time[destination] <= self.target_time[source]
+            blocked = np.zeros(len(self.mode), dtype=bool)
+            blocked[source[blocking]] = True
+            self.start_synchronization(candidates[~blocked[candidates]])
+
+    def release_local_barriers_in_window(self, quanta_ending: np.ndarray, synchronization_ending: np.ndarray, window_end: int, quanta_target_time: np.ndarray, end_time: np.ndarray):
+        """Release the nodes whose local barrier opens in the window of step_window, at the host time it opens.
+
+        A waiting node opens at the latest quanta end of the neighbors behind it, unless a neighbor behind it starts a
+        quanta before that. Those starts come from releases earlier in the window, each pass settles the releases up
+        to one synchronization later, until no release changes.
+
+        Args:
+            quanta_ending: The nodes that ended their quanta in the window.
+            synchronization_ending: The nodes that ended their synchronization in the window.
+            window_end: Host time at which the window ends.
+            quanta_target_time: The quanta_target_time array as the window started.
+            end_time: The end_time array as the window started.
+
+        Returns:
+            np.ndarray: Host times of the synchronizations that also ended in the window.
+        """
+        is_candidate = np.zeros(len(self.mode), dtype=bool)
+        is_candidate[quanta_ending] = True
+        is_candidate[self.neighbor_columns.take(quanta_ending, axis=1)] = True
+        candidates = (is_candidate & self.waiting).nonzero()[0]
+        neighbors = self.neighbor_columns.take(candidates, axis=1)
+        target_time = self.target_time[candidates]
+        # The neighbors that were in quanta behind a candidate block it until they end that quanta, the candidates
+        # already waiting as the window started have one of them left.
+        behind = quanta_target_time.take(neighbors) <= target_time
+        release_times = np.maximum((end_time.take(neighbors) * behind).max(axis=0), self.start_time[candidates])
+        releasable = release_times < window_end
+        candidates, neighbors = candidates.compress(releasable), neighbors.compress(releasable, axis=1)
+        target_time, release_times = target_time.compress(releasable), release_times.compress(releasable)
+
+        # The neighbors starting a quanta behind a candidate in the window block it from that start on, the neighbors
+        # that are not behind are replaced by the sentinel, which never starts one.
+        self.quanta_start_time[synchronization_ending] = self.start_time[synchronization_ending]
+        neighbors = np.where(self.target_time.take(neighbors) <= target_time, neighbors, len(self.nodes))
+        synchronization_end_times = release_times + self.barrier_time[candidates]
+        # Releasing a candidate can only block others, so the candidates released when none of the others are and
+        # the ones still released when all of them are bound the releases from both sides.
+        released = release_times < self.quanta_start_time.take(neighbors).min(axis=0)
+        self.quanta_start_time[candidates] = synchronization_end_times
+        surely_released = release_times < self.quanta_start_time.take(neighbors).min(axis=0)
+        self.quanta_start_time[candidates] = np.where(surely_released, synchronization_end_times, NEVER)
+        undecided = (released & ~surely_released).nonzero()[0]
+        if len(undecided):
+            undecided_candidates, undecided_neighbors = candidates[undecided], neighbors.take(undecided, axis=1)
+            undecided_release_times, undecided_end_times = release_times[undecided], synchronization_end_times[undecided]
+            undecided_released = np.zeros(len(undecided), dtype=bool)
+            while True:
+                now_released = undecided_release_times < self.quanta_start_time.take(undecided_neighbors).min(axis=0)
+                if not (now_released != undecided_released).any():
+                    break
+                undecided_released = now_released
+                self.quanta_start_time[undecided_candidates] = np.where(undecided_released, undecided_end_times, NEVER)
+            surely_released[undecided] = undecided_released
+        released = surely_released
+        self.quanta_start_time[synchronization_ending] = NEVER
+        self.quanta_start_time[candidates] = NEVER
+
+        candidates = candidates[released]
+        self.start_synchronization(candidates, release_times[released])
+        ending = candidates[self.end_time[candidates] < window_end]
+        self.start_quanta(ending, self.end_time[ending])
+        return self.start_time[ending]
+
+    def step(self):
+        """Do one step of the lock-step loop, return whether all nodes are done.
+
+        The whole-array work is finding the next transition time and the nodes that transition at it, everything
+        after that only works on those nodes and their neighbors.
+        """
+        next_time = int(self.end_time.min())
+        if next_time == NEVER:
+            raise ValueError("Nodes are not finished yet, but none of them can make progress.")
+        assert next_time > self.current_time_nanoseconds, "Nodes are not finished yet, but no time to simulate. This should not happen."
+        self.current_time_nanoseconds = next_time
+
+        ending = (self.end_time == next_time).nonzero()[0]
+        ending_in_quanta = self.mode[ending] == QUANTA_SIMULATION
+        quanta_ending = ending[ending_in_quanta]
+        synchronization_ending = ending[~ending_in_quanta]
+
+        if len(quanta_ending):
+            self.end_quanta(quanta_ending)
+        if len(synchronization_ending):
+            self.start_quanta(synchronization_ending)
+
+        # Barriers can only open when a quanta ended, or on the first step where nodes may have been left waiting.
+        if self.simulation.has_global_barrier:
+            if self.in_quanta_count == 0 and (len(quanta_ending) or self.first_step):
+                self.start_synchronization(np.arange(len(self.nodes)))
+                self.global_release_time = next_time
+        elif self.first_step:
+            self.release_local_barriers(np.arange(len(self.nodes)))
+        elif len(quanta_ending):
+            # Candidates may repeat or be the sentinel, releasing is idempotent and the sentinel is done.
+            if self.neighbor_columns is not None:
+                self.release_local_barriers(np.concatenate((quanta_ending, self.neighbor_columns.take(quanta_ending, axis=1).ravel())))
+            else:
+                self.release_local_barriers(np.arange(len(self.nodes)))
+        self.first_step = False
+
+        return self.done_count == len(self.nodes)
+
+    def step_window(self):
+        """Do the steps of the lock-step loop up to the shortest quanta host time after the next transition.
+
+        The quanta started in the window end after it, so the quanta ending in it were all running as it started and
+        only the barriers are left to work out. A global barrier opening ends the window. A window that could finish
+        the run is left to step, which stops at the exact step.
+
+        Returns:
+            tuple[bool, int]: Whether all nodes are done, and how many steps of the lock-step loop were done.
+        """
+        nodes = slice(len(self.nodes))
+        if self.period_host_time and self.current_time_nanoseconds == self.global_release_time:
+            if self.done_count + np.count_nonzero(~self.done[nodes] & self.is_done(nodes, after_quanta=True)) < len(self.nodes):
+                return self.step_period()
+
+        next_time = int(self.end_time.min())
+        if next_time == NEVER:
+            raise ValueError("Nodes are not finished yet, but none of them can make progress.")
+        window_end = next_time + self.minimum_quanta_host_time
+        if self.simulation.has_global_barrier and not (self.mode == SYNCHRONIZATION).any():
+            # Only the barrier starts the next quanta.
+            window_end = NEVER
+        ending = (self.end_time < window_end).nonzero()[0]
+        ending_times = self.end_time[ending]
+        ending_in_quanta = self.mode[ending] == QUANTA_SIMULATION
+        quanta_ending, quanta_times = ending[ending_in_quanta], ending_times[ending_in_quanta]
+        if self.done_count + len(quanta_ending) >= len(self.nodes):
+            if self.done_count + np.count_nonzero(~self.done[quanta_ending] & self.is_done(quanta_ending, after_quanta=True)) == len(self.nodes):
+                return self.step(), 1
+        synchronization_ending, synchronization_times = ending[~ending_in_quanta], ending_times[~ending_in_quanta]
+
+        if self.simulation.has_global_barrier:
+            self.end_quanta(quanta_ending, quanta_times)
+            # The barrier opens at the last quanta end, unless a synchronization ends before and starts a quanta.
+            release_time = int(quanta_times.max()) if len(quanta_ending) and self.in_quanta_count == 0 else NEVER
+            if release_time != NEVER and (synchronization_times > release_time).all():
+                self.current_time_nanoseconds = release_time
+                self.start_synchronization(np.arange(len(self.nodes)))
+                self.global_release_time = release_time
+                step_times = quanta_times
+            else:
+                self.start_quanta(synchronization_ending, synchronization_times)
+                step_times = ending_times
+        else:
+            quanta_target_time, end_time = self.quanta_target_time.copy(), self.end_time.copy()
+            self.end_quanta(quanta_ending, quanta_times)
+            self.start_quanta(synchronization_ending, synchronization_times)
+            step_times = np.concatenate((ending_times, self.release_local_barriers_in_window(quanta_ending, synchronization_ending, window_end, quanta_target_time, end_time)))
+        step_times.sort()
+        self.current_time_nanoseconds = int(step_times[-1])
+
+        return False, 1 + int(np.count_nonzero(step_times[1:] != step_times[:-1]))
+
+    def step_period(self):
+        """Do the steps of the lock-step loop from an opening of the global barrier to the next, see period_host_time.
+
+        Returns:
+            tuple[bool, int]: Whether all nodes are done, and how many steps of the lock-step loop were done.
+        """
+        nodes = slice(len(self.nodes))
+        self.sync_time += self.barrier_time
+        self.compute_time += self.quanta_host_time
+        self.wait_time += self.period_wait_time
+        self.target_time += self.quanta_nanoseconds
+        self.instructions += self.instructions_per_quanta
+        self.done[nodes] |= self.is_done(nodes)
+        self.done_count = int(np.count_nonzero(self.done[nodes]))
+        self.current_time_nanoseconds += self.period_host_time
+        self.global_release_time = self.current_time_nanoseconds
+        self.start_time[nodes] = self.current_time_nanoseconds
+        self.end_time[nodes] = self.current_time_nanoseconds + self.barrier_time[nodes]
+
+        return self.done_count == len(self.nodes), self.period_steps
+
+    def run(self):
+        """Run until every node is done and return the host time, like MultiNodeSimulation.simulate."""
+        if not self.is_supported():
+            return EventDrivenEngine(self.simulation).run()
+
+        self.load_state()
+        # The windows need the length of every quanta in advance, and record no transition.
+        use_windows = self.timeline is None and self.minimum_quanta_host_time > 0 and (self.simulation.has_global_barrier or self.neighbor_columns is not None)
+        steps = 0
+        finished = False
+        while not finished:
+            if use_windows and not self.first_step:
+                finished, window_steps = self.step_window()
+            else:
+                finished, window_steps = self.step(), 1
+            steps += window_steps
+        self.store_state()
+        self.simulation.step_count += steps
+
+        return self.current_time_nanoseconds
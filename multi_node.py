@@ -1,9 +1,17 @@
+from typing import TYPE_CHECKING
 import sys
 
 from simulation_nodes import SimulationNode, MasterNode
+from barriers import BarrierTracker
+from quanta import AdaptiveQuantaController, latency_bounds
+from topology import CompiledTopology, SyncCostModel, compile_graph, group_indices, detect_communities
 
-import networkx as nx
-from loguru import logger
+# Only what the lock-step loop needs is imported here, so that small runs start fast (see scenarios.__main__). The
+# engines, the timeline, checkpoints and the result cache (and numpy with them), networkx and loguru are imported
+# where they are used.
+if TYPE_CHECKING:
+    import networkx as nx
+    from cache import ResultCache
 
 class MultiNodeSimulation:
     """Configuration for the simulation environment comprised of multiple hardware simulators."""
@@ -13,9 +21,18 @@ class MultiNodeSimulation:
                  is_distributed: bool,
                  has_global_quanta: bool,
                  nodes: list[SimulationNode],
-                 graph: nx.Graph,
+                 graph: "nx.Graph | CompiledTopology",
                  master_node: MasterNode = None,
-                 verbose: bool = False):
+                 verbose: bool = False,
+                 engine: str = "lockstep",
+                 fast_forward: bool = False,
+                 record_timeline: bool = False,
+                 engine_options: dict = None,
+                 quanta_nanoseconds: dict[str, int] = None,
+                 adaptive_quanta: bool = False,
+                 sync_cost_model: SyncCostModel = None,
+                 barrier_groups: dict[str, object] | str = None,
+                 result_cache: "ResultCache" = None):
     
         """        Initialize the simulation configuration.
 
@@ -23,11 +40,23 @@ class MultiNodeSimulation:
             has_global_barrier (bool): Whether the simulation has a global barrier. if false will only pause nodes based on their virtual clock and the clock of the nodes its connected to.
             is_distributed (bool): Whether the simulation is distributed across multiple nodes. If false, the simulation will be managed via one master node and multiple worker nodes.
             has_global_quanta (bool): Whether the simulation has global quanta. if false, the quanta on each component will be managed based on its connections to other nodes.
+            graph (nx.Graph | CompiledTopology): The connections between the nodes, with a 'latency_nanoseconds' per edge. A networkx graph is compiled once (see topology.compile_graph), large topologies can be loaded directly as a CompiledTopology.
+            engine (str): Which engine runs simulate(). "lockstep" advances every node by the global minimum each step, "event" only touches nodes whose state changes (see engines.EventDrivenEngine), "vectorized" keeps the state of all nodes in NumPy arrays (see engines.VectorizedEngine), "parallel" splits local barrier simulations over worker processes (see engines.ParallelEngine). All of them return the same results.
+            fast_forward (bool): Whether the lock-step loop detects a repeating joint node state and skips whole periods of it (see engines.SteadyStateDetector). Only has an effect when every quanta takes the same host time, the results are the same as without it.
+            record_timeline (bool): Whether to record every mode transition of the nodes in self.timeline (see tracing.TimelineRecorder), to export it for Perfetto.
+            engine_options (dict): Keyword arguments of the engine, e.g. processes for the parallel engine.
+            quanta_nanoseconds (dict[str, int]): Quanta of some nodes by node ID, instead of the one derived from the edge latencies (see analysis.optimize_quanta).
+            adaptive_quanta (bool): Whether the quanta of the nodes are resized at run time from their barrier waits (see quanta.AdaptiveQuantaController, tunable through self.quanta_controller).
+            sync_cost_model (SyncCostModel): How the communication cost of the barriers scales with the cluster (see topology.sync_costs), it sets the synchronization communication overhead of every node. The nodes keep their own by default.
+            barrier_groups (dict[str, object] | str): Group of every node ID for grouped barriers, or "communities" to group the nodes by the communities of the graph (see topology.detect_communities). A group synchronizes like a global barrier every quanta, groups only wait on each other over the edges between them once their latency is used up (see BarrierTracker). Needs has_global_barrier=False, nodes without a group are grouped alone.
+            result_cache (ResultCache): Where simulate_for_instructions and simulate_for_nanoseconds_in_target look up the result of the same configuration before running it, and store it after (see cache.ResultCache). On a hit the nodes get the clocks and accumulators of the stored run without being stepped.
         """
         self.has_global_barrier = has_global_barrier
         self.is_distributed = is_distributed
         self.has_global_quanta = has_global_quanta
         self.current_time_nanoseconds = 0
+        # Number of steps (global transition times) simulate() went through, over all calls.
+        self.step_count = 0
         self.nodes = nodes
 
         if not is_distributed:
@@ -43,29 +72,66 @@ class MultiNodeSimulation:
 
         self.graph = graph
         self.nodes_dict = {node.get_id(): node for node in nodes}
-        for edge in graph.edges:
-            node1, node2 = edge
-            latency_nanoseconds = graph[node1][node2]['latency_nanoseconds']
-            self.nodes_dict[node1].connect_node(self.nodes_dict[node2])
-            self.nodes_dict[node1].set_quanta_nanoseconds(latency_nanoseconds)
-            self.nodes_dict[node2].connect_node(self.nodes_dict[node1])
-            self.nodes_dict[node2].set_quanta_nanoseconds(latency_nanoseconds)
-
-
-        if has_global_quanta:
-            for node in self.nodes:
-                id = node.get_id()
-                min_latency_nano_seconds = min([self.graph[id][neighbor]['latency_nanoseconds'] for neighbor in self.graph.neighbors(id)])
-                node.set_quanta_nanoseconds(min_latency_nano_seconds)
+        node_ids = [node.get_id() for node in nodes]
+        if isinstance(graph, CompiledTopology):
+            self.topology = graph.reindexed(node_ids)
+        else:
+            self.topology = compile_graph(graph, node_ids)
+
+        # Node i of the topology is self.nodes[i], from here on the nodes are only reached through their index.
+        neighbor_lists, latency_lists = self.topology.rows()
+        for node, neighbors, latencies in zip(self.nodes, neighbor_lists, latency_lists):
+            for j in neighbors:
+                node.connect_node(self.nodes[j])
+            if not latencies:
+                continue
+            if has_global_quanta:
+                node.set_quanta_nanoseconds(min(latencies))
+            else:
+                # Rows keep the order of the edges, so this is the latency of the last edge of the node.
+                node.set_quanta_nanoseconds(latencies[-1])
+        for node_id, node_quanta_nanoseconds in (quanta_nanoseconds or {}).items():
+            self.nodes_dict[node_id].set_quanta_nanoseconds(node_quanta_nanoseconds)
+        if sync_cost_model is not None:
+            for node, cost in zip(self.nodes, sync_cost_model.get_costs(self.topology, has_global_barrier)):
+                node.set_synchronization_communication_overhead(cost)
         if not self.is_distributed:
             assert master_node is not None, "In a non-distributed simulation, a master node must be provided."
-            self.master_node = master_node
+        self.master_node = master_node if not is_distributed else None
 
         for node in self.nodes:
             node.initialize()
 
+        assert barrier_groups is None or not has_global_barrier, "Grouped barriers replace the local barriers, not the global one."
+        if barrier_groups == "communities":
+            self.barrier_groups = detect_communities(self.topology)
+        elif barrier_groups is not None:
+            self.barrier_groups = group_indices(self.topology, barrier_groups)
+        else:
+            self.barrier_groups = None
+        self.barrier_tracker = BarrierTracker(self.nodes, neighbor_lists, self.barrier_groups, latency_lists)
+        self.timeline = None
+        if record_timeline:
+            from tracing import TimelineRecorder
+
+            self.timeline = TimelineRecorder(self.nodes)
+        self.quanta_controller = AdaptiveQuantaController(self.nodes, latency_bounds(self.topology)) if adaptive_quanta else None
+
+        if engine != "lockstep":
+            from engines import ENGINES
+
+            assert engine in ENGINES, f"Unknown engine {engine}, expected one of {['lockstep', *ENGINES]}."
+        self.engine = engine
+        self.engine_options = engine_options or {}
+        assert not fast_forward or engine == "lockstep", "Fast forward is only supported by the lockstep engine."
+        self.fast_forward = fast_forward
+
+        self.result_cache = result_cache
+        # Whether the last simulate_for_* call was answered by the result cache.
+        self.last_run_cached = False
+
         self.verbose = verbose
-        self.setup_logger()
+        self.logger_is_set_up = False
         
         # if has_global_barrier:
             # TODO: Implement global barrier management
@@ -76,8 +142,19 @@ class MultiNodeSimulation:
 
         # raise NotImplementedError("Global barrier and global quanta simulation not implemented yet.")
 
+    def get_logger(self):
+        """The loguru logger, imported and set up on the first verbose log."""
+        from loguru import logger
+
+        if not self.logger_is_set_up:
+            self.logger_is_set_up = True
+            self.setup_logger()
+        return logger
+
     def setup_logger(self):
         # TODO probably need to move logger setup to a separate module
+        from loguru import logger
+
         # 1) remove the default handler
         logger.remove()
 
@@ -102,26 +179,97 @@ class MultiNodeSimulation:
         )
 
 
+    def checkpoint(self, path: str = None, compress: bool = True):
+        """Snapshot of the state of the simulation (see checkpoint.dumps_checkpoint), written to path if given.
+
+        Returns the snapshot bytes, or None when it was written to path.
+        """
+        from checkpoint import dumps_checkpoint, save_checkpoint
+
+        if path is not None:
+            save_checkpoint(self, path, compress)
+            return None
+        return dumps_checkpoint(self, compress)
+
+    @staticmethod
+    def restore(checkpoint: bytes | str) -> "MultiNodeSimulation":
+        """Simulation saved by checkpoint, from its bytes or its path. Continue it with simulate or a new goal."""
+        from checkpoint import loads_checkpoint, load_checkpoint
+
+        if isinstance(checkpoint, str):
+            return load_checkpoint(checkpoint)
+        return loads_checkpoint(checkpoint)
+
+    def fork(self) -> "MultiNodeSimulation":
+        """Independent copy of the simulation in its current state, to continue several variants from a shared prefix.
+
+        The copy can be changed before it continues, e.g. its has_global_barrier or the goals of its nodes.
+        """
+        from checkpoint import fork_simulation
+
+        return fork_simulation(self)
+
     def simulate_for_instructions(self, instructions: int):
         """Simulate the environment for a given number of instructions."""
         for node in self.nodes:
-            node.target_instructions_goal = instructions
+            node.set_goal(instructions=instructions)
 
-        return self.simulate()
+        return self.simulate_cached()
     
     def simulate_for_nanoseconds_in_target(self, time_nanoseconds: int):
         """Simulate the environment for a given number of nanoseconds."""
         for node in self.nodes:
-            node.target_time_nanoseconds_goal = time_nanoseconds
+            node.set_goal(time_nanoseconds=time_nanoseconds)
+
+        return self.simulate_cached()
 
-        return self.simulate()
+    def simulate_cached(self):
+        """Simulate, or take the result from the result cache when the same configuration already ran.
+
+        A hit sets the clocks and host time accumulators of the nodes (what analysis.host_time_attribution reads) to
+        the ones of the stored run, and leaves the nodes waiting on their barrier. Their noise sources are not advanced,
+        so a simulation answered by the cache should not be continued.
+        """
+        self.last_run_cached = False
+        if self.result_cache is None:
+            return self.simulate()
+
+        from cache import configuration_key
+
+        key = configuration_key(self)
+        entry = self.result_cache.get(key)
+        if entry is not None:
+            for node, values in zip(self.nodes, entry["nodes"]):
+                (node.current_host_time_nanoseconds, node.current_target_time_nanoseconds, node.target_instructions_executed,
+                 node.compute_host_time_nanoseconds, node.wait_host_time_nanoseconds, node.sync_host_time_nanoseconds) = values
+                node.MODE = "WAITING_ON_BARRIER"
+                node.execution_details = None
+            self.step_count += entry["step_count"]
+            self.last_run_cached = True
+            return entry["host_time_nanoseconds"]
+
+        step_count = self.step_count
+        host_time = self.simulate()
+        self.result_cache.put(key, {
+            "host_time_nanoseconds": host_time,
+            "step_count": self.step_count - step_count,
+            "nodes": [
+                (node.current_host_time_nanoseconds, node.current_target_time_nanoseconds, node.target_instructions_executed,
+                 node.compute_host_time_nanoseconds, node.wait_host_time_nanoseconds, node.sync_host_time_nanoseconds)
+                for node in self.nodes
+            ],
+        })
+        return host_time
 
     def schedule_nodes(self):
         if self.is_distributed:
             pass
         else:
-            # TODO : use master node must be used here
-            pass
+            self.master_node.schedule(self.nodes)
+
+    def needs_node_stepping(self):
+        """Check if the run depends on listeners changing the nodes (an active master, adaptive quanta), only the engines stepping the node objects (lockstep and event) model them."""
+        return self.quanta_controller is not None or (self.master_node is not None and self.master_node.is_active())
     def is_glbal_barrier_ready(self):
         """Check if the global barrier is ready."""
         return all(node.MODE == "SYNCHRONIZATION" or node.MODE == "WAITING_ON_BARRIER" for node in self.nodes)
@@ -129,8 +277,8 @@ class MultiNodeSimulation:
     def is_local_barrier_ready(self, node: SimulationNode):
         can_leave_barrier = True
 
-        for neighbor in self.graph.neighbors(node.get_id()):
-            neighbor_node = self.nodes_dict[neighbor]
+        for neighbor in self.topology.neighbors(self.topology.index[node.get_id()]):
+            neighbor_node = self.nodes[neighbor]
             if neighbor_node.MODE == "QUANTA_SIMULATION":
                 if neighbor_node.current_target_time_nanoseconds <= node.current_target_time_nanoseconds:
                     can_leave_barrier = False
@@ -140,15 +288,17 @@ class MultiNodeSimulation:
 
     def update_barriers(self):
         """Update whether or not a nod can leave its end of quanta barrier"""
+        # The barrier tracker gives the same answers as is_glbal_barrier_ready and is_local_barrier_ready, without
+        # scanning every node.
         if self.has_global_barrier:
             # If we have a global barrier, we check if all nodes have reached their quanta.
-            if self.is_glbal_barrier_ready():
+            if self.barrier_tracker.is_global_barrier_ready():
                 for node in self.nodes:
                     node.change_mode("SYNCHRONIZATION")
         else:
-            for node in self.nodes:
-                if self.is_local_barrier_ready(node) and node.MODE == "WAITING_ON_BARRIER" and not node.is_done():
-                    node.change_mode("SYNCHRONIZATION")
+            # With grouped barriers the tracker gives the members of the groups that can leave their barrier.
+            for i in self.barrier_tracker.pop_ready():
+                self.nodes[i].change_mode("SYNCHRONIZATION")
                     
                 
 
@@ -157,6 +307,7 @@ class MultiNodeSimulation:
     def print_simulation_state(self):
         """Print the current state of the simulation."""
         if self.verbose:
+            logger = self.get_logger()
             for node in self.nodes:
                 total_execution_time = "NA"
                 time_left = "NA"
@@ -172,17 +323,50 @@ class MultiNodeSimulation:
                     f"Execution detail time left: {time_left} ns, ")
 
 
-    def simulate(self):
+    def start_simulation(self):
+        """Prepare the listeners and barriers for a call to simulate or simulate_iter."""
         self.schedule_nodes()
+        self.barrier_tracker.rebuild()
+        # A previous call may have stopped with nodes waiting on a barrier they can leave now that their goal moved
+        # (a longer run, a restored checkpoint or a fork), on a fresh simulation no node is waiting yet.
+        self.update_barriers()
+
+    def simulate(self):
+        self.start_simulation()
+
+        if self.engine != "lockstep":
+            from engines import ENGINES
+
+            return ENGINES[self.engine](self, **self.engine_options).run()
+
+        for _ in self.run_lockstep():
+            pass
 
+        time = max([node.current_host_time_nanoseconds for node in self.nodes])
+        return time
+
+    def run_lockstep(self):
+        """Lock-step loop of simulate, yields after every step whether every node is done. The state of the nodes is consistent between two steps."""
+        # The master's queue and the quanta controller are not part of the node state the detector looks at.
+        steady_state_detector = None
+        if self.fast_forward and not self.needs_node_stepping():
+            from engines import SteadyStateDetector
+
+            steady_state_detector = SteadyStateDetector(self.nodes)
+
+        verbose = self.verbose
+        logger = self.get_logger() if verbose else None
         finished = False
         while not finished:
             finished = True
+            self.step_count += 1
             min_time_to_simulate = min([node.execution_details.get_time_left_ns() for node in self.nodes if (not node.MODE == "WAITING_ON_BARRIER")])
             
-            logger.debug("="*50)
-            self.print_simulation_state()
-            logger.debug(f"Simulating for {min_time_to_simulate} nanoseconds.")
+            # Logging stays out of the loop unless verbose, building the messages costs more than the step itself.
+            if verbose:
+                logger.debug("="*50)
+                self.print_simulation_state()
+                logger.debug(f"Simulating for {min_time_to_simulate} nanoseconds.")
             
             assert min_time_to_simulate > 0, "Nodes are not finished yet, but no time to simulate. This should not happen."
          
@@ -191,21 +375,83 @@ class MultiNodeSimulation:
                 if not node.is_done():
                     finished = False
 
-            logger.debug("after simulating")
-            self.print_simulation_state()
+            if verbose:
+                logger.debug("after simulating")
+                self.print_simulation_state()
 
             self.update_barriers()
             
-            logger.debug("after updating barriers")
-            self.print_simulation_state()
-            logger.debug("="*50)
+            if verbose:
+                logger.debug("after updating barriers")
+                self.print_simulation_state()
+                logger.debug("="*50)
+
+            if steady_state_detector is not None and not finished:
+                periods = steady_state_detector.observe()
+                if periods > 0:
+                    self.barrier_tracker.rebuild()
+                    if verbose:
+                        logger.debug(f"Steady state detected, skipped {periods} periods.")
+
+            yield finished
+
+    def get_progress(self):
+        """Compact summary of where the nodes are: host time, spread of the target times, instructions and barrier waits."""
+        nodes = self.nodes
+        target_times = [node.current_target_time_nanoseconds for node in nodes]
+        return {
+            "host_time_nanoseconds": max(node.current_host_time_nanoseconds for node in nodes),
+            "min_target_time_nanoseconds": min(target_times),
+            "max_target_time_nanoseconds": max(target_times),
+            "instructions": sum(node.target_instructions_executed for node in nodes),
+            "waiting_nodes": sum(node.MODE == "WAITING_ON_BARRIER" for node in nodes),
+            "done_nodes": sum(node.is_done() for node in nodes),
+        }
+
+    def simulate_iter(self, window_host_nanoseconds: int = None, instructions: int = None, time_nanoseconds: int = None):
+        """Simulate like simulate, yielding a summary of the progress (see get_progress) along the way.
+
+        By default a summary is yielded per barrier epoch, whenever the minimum target time moves (with a global barrier,
+        every time it is released). With window_host_nanoseconds, at most one summary is yielded per window of that
+        much host time. The last summary is yielded once every node is done. Each summary also has its "epoch" number
+        and the number of "steps" so far, nothing else is kept, so a long run only holds the current one.
+
+        The nodes are stepped like the lock-step engine whatever the engine, the results are the same. Stopping the
+        iteration early leaves the simulation between two steps: it can be checkpointed, forked or continued with simulate.
 
-           
-                
+        Args:
+            window_host_nanoseconds (int): Host time between two summaries, None for one summary per epoch.
+            instructions (int): Goal of every node in instructions, like simulate_for_instructions.
+            time_nanoseconds (int): Goal of every node in target time, like simulate_for_nanoseconds_in_target.
+        """
+        assert window_host_nanoseconds is None or window_host_nanoseconds > 0, "The window must be a positive host time."
+        if instructions is not None or time_nanoseconds is not None:
+            for node in self.nodes:
+                node.set_goal(instructions=instructions, time_nanoseconds=time_nanoseconds)
+        self.start_simulation()
+
+        epoch = 0
+        previous_min_target_time = min(node.current_target_time_nanoseconds for node in self.nodes)
+        if window_host_nanoseconds is not None:
+            host_time = max(node.current_host_time_nanoseconds for node in self.nodes)
+            window_end = (host_time // window_host_nanoseconds + 1) * window_host_nanoseconds
+        for finished in self.run_lockstep():
+            if window_host_nanoseconds is not None:
+                host_time = max(node.current_host_time_nanoseconds for node in self.nodes)
+                if host_time < window_end and not finished:
+                    continue
+                window_end = (host_time // window_host_nanoseconds + 1) * window_host_nanoseconds
+                progress = self.get_progress()
+            else:
+                progress = self.get_progress()
+                if progress["min_target_time_nanoseconds"] == previous_min_target_time and not finished:
+                    continue
+                previous_min_target_time = progress["min_target_time_nanoseconds"]
+            epoch += 1
+            progress["epoch"] = epoch
+            progress["steps"] = self.step_count
+            yield progress
 
-        
-        time = max([node.current_host_time_nanoseconds for node in self.nodes])
-        return time
                             
                     
                             
@@ -0,0 +1,78 @@
+from simulation_nodes import SimulationNode
+from topology import CompiledTopology
+
+
+def latency_bounds(topology: CompiledTopology) -> list[int]:
+    """Largest quanta of every node that stays within the latency of each of its edges, None for isolated nodes."""
+    return [min(latencies) if latencies else None for latencies in topology.rows()[1]]
+
+
+class AdaptiveQuantaController:
+    """Resizes the quanta of every node at run time from the host time it waited on its last barrier.
+
+    A node that barely waited (wait under low_wait_share of its last quanta host time) is not held back by its
+    neighbors and grows its quanta by growth, cutting the number of barriers. A node that waited long (over
+    high_wait_share) shrinks it by shrink, so it synchronizes at a finer grain with the neighbors it waits on. Quanta
+    stay between minimum_share and 1 + slack times the latency bound of the node (see latency_bounds).
+
+    The controller listens to change_mode like the BarrierTracker and changes the quanta when a node leaves its
+    barrier, between the end of a quanta and the start of the next one. Only the engines stepping the node objects
+    (lockstep and event) support it.
+    """
+
+    def __init__(self, nodes: list[SimulationNode], bounds: list[int], slack: float = 0.0, growth: float = 2.0,
+                 shrink: float = 0.5, low_wait_share: float = 0.05, high_wait_share: float = 0.25,
+                 minimum_share: float = 0.125):
+        """Initialize the controller and start listening to the nodes.
+
+        Args:
+            nodes (list[SimulationNode]): The nodes of the simulation, in simulation order.
+            bounds (list[int]): Latency bound of every node, see latency_bounds.
+            slack (float): How far above its bound a quanta may grow, as a share of the bound.
+            growth (float): Factor applied to the quanta of a node that did not wait.
+            shrink (float): Factor applied to the quanta of a node that waited long.
+            low_wait_share (float): Wait, as a share of the last quanta host time, under which the quanta grows.
+            high_wait_share (float): Wait, as a share of the last quanta host time, over which the quanta shrinks.
+            minimum_share (float): Smallest quanta, as a share of the bound.
+        """
+        assert growth >= 1 and 0 < shrink <= 1, "Quanta grow by a factor >= 1 and shrink by a factor <= 1."
+        self.nodes = nodes
+        self.index = {node.get_id(): i for i, node in enumerate(nodes)}
+        self.slack = slack
+        self.growth = growth
+        self.shrink = shrink
+        self.low_wait_share = low_wait_share
+        self.high_wait_share = high_wait_share
+        self.maximum_quanta = [node.get_quanta_nanoseconds() if bound is None else int(bound * (1 + slack)) for node, bound in zip(nodes, bounds)]
+        self.minimum_quanta = [max(1, int(maximum * minimum_share)) for maximum in self.maximum_quanta]
+
+        self.quanta_host_time = [0] * len(nodes)
+        self.barrier_start = [0] * len(nodes)
+        self.resizes = 0
+        for node in nodes:
+            node.add_mode_listener(self.on_mode_change)
+
+    def on_mode_change(self, node: SimulationNode, previous_mode: str):
+        """Mode listener, measure the quanta and the wait of the node and resize its next quanta."""
+        i = self.index[node.get_id()]
+        mode = node.MODE
+        if mode == "QUANTA_SIMULATION":
+            self.quanta_host_time[i] = node.execution_details.get_total_execution_time()
+        elif mode == "WAITING_ON_BARRIER":
+            self.barrier_start[i] = node.current_host_time_nanoseconds
+        elif previous_mode == "WAITING_ON_BARRIER":
+            wait_share = (node.current_host_time_nanoseconds - self.barrier_start[i]) / max(self.quanta_host_time[i], 1)
+            quanta = node.get_quanta_nanoseconds()
+            if wait_share < self.low_wait_share:
+                resized = min(int(quanta * self.growth), self.maximum_quanta[i])
+            elif wait_share > self.high_wait_share:
+                resized = max(int(quanta * self.shrink), self.minimum_quanta[i])
+            else:
+                resized = quanta
+            if resized != quanta:
+                node.set_quanta_nanoseconds(resized)
+                self.resizes += 1
+
+    def get_quanta_nanoseconds(self):
+        """Current quanta of every node, by node ID."""
+        return {node.get_id(): node.get_quanta_nanoseconds() for node in self.nodes}
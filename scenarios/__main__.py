@@ -0,0 +1,42 @@
+"""Run scenario files, one result line per file:
+
+    python -m scenarios scenarios/files/three_nodes_with_noise.toml
+    python -m scenarios --json --engine event a.toml b.yaml
+
+Only the standard library is imported until a scenario runs, networkx and loguru only if the scenario needs them.
+"""
+import argparse
+import sys
+
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(description="Run simulations described in TOML or YAML scenario files.")
+    parser.add_argument("paths", nargs="+", help="Scenario files.")
+    parser.add_argument("--engine", help="Engine overriding the one of the scenarios.")
+    parser.add_argument("--cache", help="SQLite file of a result cache to look the runs up in (see cache.ResultCache).")
+    parser.add_argument("--json", action="store_true", help="Print every result as a JSON line.")
+    arguments = parser.parse_args(argv)
+
+    from scenarios.files import read_scenario, run_scenario
+
+    options = {}
+    if arguments.engine:
+        options["engine"] = arguments.engine
+    if arguments.cache:
+        from cache import ResultCache
+
+        options["result_cache"] = ResultCache(arguments.cache)
+
+    for path in arguments.paths:
+        result = run_scenario(read_scenario(path), **options)
+        if arguments.json:
+            import json
+
+            print(json.dumps({"scenario": path, **result}))
+        else:
+            print(f"{path}: {result['host_time_nanoseconds'] * 1e-9} seconds of host time, {result['steps']} steps over {result['nodes']} nodes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,38 @@
+from multi_node import MultiNodeSimulation
+from simulation_nodes import SimpleQemuSimulationNode, MasterNode
+import topology
+
+
+def get_simulation(node_count: int, message_processing_nanoseconds: int = 0, release_batch_size: int = 1,
+                   is_distributed: bool = False, has_global_barrier: bool = True, engine: str = "event"):
+    """Mesh of identical nodes, coordinated by a master (is_distributed=False) or by the nodes themselves."""
+    rows = max(1, int(node_count ** 0.5))
+    graph = topology.mesh_2d(rows, max(1, node_count // rows), 1000)
+    nodes = [SimpleQemuSimulationNode(simulation_speed_ips=5e8, id=node_id, manages_quanta=False) for node_id in graph.node_ids]
+    return MultiNodeSimulation(
+        has_global_barrier=has_global_barrier,
+        is_distributed=is_distributed,
+        has_global_quanta=True,
+        nodes=nodes,
+        graph=graph,
+        master_node=None if is_distributed else MasterNode(message_processing_nanoseconds, release_batch_size),
+        engine=engine,
+    )
+
+
+if __name__ == "__main__":
+    target_time_ns = int(1e6)
+    for node_count in (4, 16, 64, 256):
+        simulation = get_simulation(node_count, is_distributed=True)
+        distributed = simulation.simulate_for_nanoseconds_in_target(target_time_ns)
+        print(f"{node_count} nodes, distributed: {distributed * 1e-9} seconds")
+        for message_processing_ns in (100, 1000):
+            for release_batch_size in (1, 16):
+                simulation = get_simulation(node_count, message_processing_ns, release_batch_size)
+                time = simulation.simulate_for_nanoseconds_in_target(target_time_ns)
+                statistics = simulation.master_node.get_statistics(time)
+                print(
+                    f"{node_count} nodes, master {message_processing_ns} ns/message, batches of {release_batch_size}: "
+                    f"{time * 1e-9} seconds ({time / distributed:.2f}x), master utilization {statistics['utilization']:.0%}, "
+                    f"mean release delay {statistics['mean_release_delay_nanoseconds']:.0f} ns"
+                )
@@ -0,0 +1,81 @@
+import sys
+
+from analysis import host_time_attribution
+from multi_node import MultiNodeSimulation
+from simulation_nodes import SimpleQemuSimulationNode, SimpleQemuSimulationNodeWithNoiseModel, MasterNode, UniformNoise, spawn_seeds
+import topology
+
+ENGINES = ("lockstep", "event", "vectorized", "parallel")
+
+
+def get_resynchronizing_simulation(engine: str, seed: int = 3):
+    """Two noisy nodes behind a global barrier, the second with a barrier longer than some quanta of the first.
+
+    When the first node ends its barrier and its next quanta before the second ends its barrier, no node is in quanta
+    and the global barrier releases both again: the second starts its synchronization over, and the time it spent in
+    the interrupted one is still sync time.
+    """
+    graph = topology.line(2, 1000)
+    nodes = [
+        SimpleQemuSimulationNodeWithNoiseModel(
+            noise_model=UniformNoise(-0.5, 0.5, seed=node_seed), simulation_speed_ips=5e9, id=node_id, manages_quanta=False,
+        )
+        for node_id, node_seed in zip(graph.node_ids, spawn_seeds(seed, graph.get_node_count()))
+    ]
+    nodes[1].set_synchronization_communication_overhead(1500)
+    return MultiNodeSimulation(
+        has_global_barrier=True,
+        is_distributed=False,
+        has_global_quanta=True,
+        nodes=nodes,
+        graph=graph,
+        master_node=MasterNode(),
+        engine=engine,
+    )
+
+
+def get_deterministic_simulation(engine: str, fast_forward: bool = False):
+    """Deterministic nodes on a small mesh with local barriers, each node with its own barrier length.
+
+    The joint state repeats, so with fast_forward the lock-step loop skips whole periods and has to move the host time
+    accumulators ahead by what they gained over a period.
+    """
+    graph = topology.mesh_2d(3, 3, 1000)
+    nodes = [SimpleQemuSimulationNode(simulation_speed_ips=5e8, id=node_id, manages_quanta=False) for node_id in graph.node_ids]
+    for i, node in enumerate(nodes):
+        node.set_synchronization_communication_overhead(i * 250)
+    return MultiNodeSimulation(
+        has_global_barrier=False,
+        is_distributed=False,
+        has_global_quanta=True,
+        nodes=nodes,
+        graph=graph,
+        master_node=MasterNode(),
+        engine=engine,
+        fast_forward=fast_forward,
+    )
+
+
+def get_results(simulation: MultiNodeSimulation, target_time_ns: int):
+    """Host time of a run and the host time accumulators of every node, what the engines must agree on."""
+    host_time = simulation.simulate_for_nanoseconds_in_target(target_time_ns)
+    return host_time, host_time_attribution(simulation)
+
+
+if __name__ == "__main__":
+    target_time_ns = 200_000
+    mismatches = 0
+    expected = get_results(get_resynchronizing_simulation("lockstep"), target_time_ns)
+    for engine in ENGINES[1:]:
+        results = get_results(get_resynchronizing_simulation(engine), target_time_ns)
+        mismatches += results != expected
+        print(f"Global barrier released again, {engine}: {'same' if results == expected else 'different'} host time and accumulators as lockstep")
+
+    expected = get_results(get_deterministic_simulation("lockstep"), target_time_ns)
+    for engine, fast_forward in zip(ENGINES, (True, False, False, False)):
+        simulation = get_deterministic_simulation(engine, fast_forward)
+        results = get_results(simulation, target_time_ns)
+        mismatches += results != expected
+        name = f"{engine} with fast forward" if fast_forward else engine
+        print(f"Deterministic mesh, {name}: {'same' if results == expected else 'different'} host time and accumulators as lockstep, {simulation.step_count} steps")
+    sys.exit(1 if mismatches else 0)
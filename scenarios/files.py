@@ -0,0 +1,113 @@
+from typing import Any, TYPE_CHECKING
+import os
+import tomllib
+
+if TYPE_CHECKING:
+    from multi_node import MultiNodeSimulation
+
+# Generators of topology a scenario can use, see topology.generators.
+TOPOLOGY_GENERATORS = ("line", "ring", "mesh_2d", "fat_tree", "random_regular", "racks")
+
+
+def read_scenario(path: str) -> dict[str, Any]:
+    """Read a TOML scenario file, or a YAML one (.yaml / .yml, needs PyYAML)."""
+    if os.path.splitext(path)[1] in (".yaml", ".yml"):
+        import yaml
+
+        with open(path) as scenario_file:
+            return yaml.safe_load(scenario_file)
+    with open(path, "rb") as scenario_file:
+        return tomllib.load(scenario_file)
+
+
+def build_topology(scenario: dict[str, Any]):
+    """Topology of a scenario: a [topology] generator or file, or a list of [[edges]] between the [[nodes]]."""
+    import topology
+
+    spec = dict(scenario.get("topology", {}))
+    if "generator" in spec:
+        generator = spec.pop("generator")
+        assert generator in TOPOLOGY_GENERATORS, f"Unknown topology generator {generator}, expected one of {TOPOLOGY_GENERATORS}."
+        return getattr(topology, generator)(**spec)
+    if "edge_list" in spec:
+        return topology.load_edge_list(spec["edge_list"])
+    if "csr" in spec:
+        return topology.load_csr(spec["csr"])
+
+    from topology.csr import from_edges
+
+    node_ids = [node["id"] for node in scenario.get("nodes", [])]
+    edges = [(*edge["nodes"], edge["latency_nanoseconds"]) for edge in scenario.get("edges", [])]
+    return from_edges(node_ids, edges)
+
+
+def build_noise_model(spec: dict[str, Any], seed):
+    """Noise model of a node from its noise table, e.g. {model = "UniformNoise", low = -0.3, high = 0.3}, drawing from seed."""
+    import simulation_nodes
+
+    spec = {**spec, "seed": seed}
+    model = getattr(simulation_nodes, spec.pop("model"), None)
+    assert isinstance(model, type) and issubclass(model, simulation_nodes.NoiseModel), f"Unknown noise model {model}."
+    return model(**spec)
+
+
+def build_nodes(scenario: dict[str, Any], node_ids: list[str]):
+    """Nodes of a scenario, one per node of the topology.
+
+    Every node gets the [node_defaults] table, overridden by its entry in [[nodes]] if it has one. "type" names a node
+    class of simulation_nodes, "noise" a noise model, the other keys are arguments of the node class. A noise seed set
+    in [node_defaults] is split with spawn_seeds so that every node draws its own noise.
+    """
+    import simulation_nodes
+
+    defaults = {"type": "SimpleQemuSimulationNode", "manages_quanta": False, **scenario.get("node_defaults", {})}
+    overrides = {node["id"]: node for node in scenario.get("nodes", [])}
+    missing = set(overrides) - set(node_ids)
+    assert not missing, f"Nodes {sorted(missing)} are not in the topology."
+    default_noise = defaults.get("noise")
+    seeds = simulation_nodes.spawn_seeds(default_noise.get("seed"), len(node_ids)) if default_noise else [None] * len(node_ids)
+
+    nodes = []
+    for node_id, seed in zip(node_ids, seeds):
+        spec = {**defaults, **overrides.get(node_id, {}), "id": node_id}
+        node_class = getattr(simulation_nodes, spec.pop("type"), None)
+        assert isinstance(node_class, type) and issubclass(node_class, simulation_nodes.SimulationNode), f"Unknown node type {node_class}."
+        noise = spec.pop("noise", None)
+        if noise is not None:
+            spec["noise_model"] = build_noise_model(noise, seed if noise is default_noise else noise.get("seed"))
+        nodes.append(node_class(**spec))
+    return nodes
+
+
+def build_simulation(scenario: dict[str, Any], **options) -> "MultiNodeSimulation":
+    """MultiNodeSimulation of a scenario. The [simulation] table holds its arguments, [master] those of its MasterNode.
+
+    Args:
+        scenario (dict): The scenario, as read by read_scenario.
+        options: Arguments of MultiNodeSimulation overriding the ones of the scenario, e.g. engine.
+    """
+    from multi_node import MultiNodeSimulation
+    from simulation_nodes import MasterNode
+
+    arguments = {"has_global_barrier": True, "is_distributed": False, "has_global_quanta": True, **scenario.get("simulation", {}), **options}
+    graph = build_topology(scenario)
+    nodes = build_nodes(scenario, list(graph.node_ids))
+    master_node = None if arguments["is_distributed"] else MasterNode(**scenario.get("master", {}))
+    return MultiNodeSimulation(nodes=nodes, graph=graph, master_node=master_node, **arguments)
+
+
+def run_scenario(scenario: dict[str, Any], **options) -> dict[str, Any]:
+    """Build and run a scenario until the goal of its [goal] table (instructions or target_time_nanoseconds)."""
+    goal = scenario.get("goal", {})
+    assert ("instructions" in goal) != ("target_time_nanoseconds" in goal), "The goal is either instructions or target_time_nanoseconds."
+    simulation = build_simulation(scenario, **options)
+    if "instructions" in goal:
+        host_time = simulation.simulate_for_instructions(int(goal["instructions"]))
+    else:
+        host_time = simulation.simulate_for_nanoseconds_in_target(int(goal["target_time_nanoseconds"]))
+    return {
+        "host_time_nanoseconds": host_time,
+        "steps": simulation.step_count,
+        "nodes": len(simulation.nodes),
+        "cached": simulation.last_run_cached,
+    }
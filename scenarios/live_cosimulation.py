@@ -0,0 +1,33 @@
+from cosim import SubprocessEndpoint, run_cosimulation, standin_command
+from multi_node import MultiNodeSimulation
+from simulation_nodes import SimpleQemuSimulationNode, MasterNode
+import topology
+
+
+def get_simulation(node_count: int, has_global_barrier: bool = True):
+    """Ring of identical nodes, each backed by a stand-in simulator process in the live run."""
+    graph = topology.ring(node_count, 100_000)
+    nodes = [SimpleQemuSimulationNode(simulation_speed_ips=5e8, id=node_id, manages_quanta=False) for node_id in graph.node_ids]
+    return MultiNodeSimulation(
+        has_global_barrier=has_global_barrier,
+        is_distributed=False,
+        has_global_quanta=True,
+        nodes=nodes,
+        graph=graph,
+        master_node=MasterNode(),
+    )
+
+
+if __name__ == "__main__":
+    target_time_ns = int(2e6)
+    for has_global_barrier in (True, False):
+        for node_count in (4, 16):
+            simulation = get_simulation(node_count, has_global_barrier)
+            endpoints = [SubprocessEndpoint(standin_command()) for _ in simulation.nodes]
+            report = run_cosimulation(simulation, endpoints, time_nanoseconds=target_time_ns)
+            print(
+                f"global barrier: {has_global_barrier}, {node_count} stand-in simulators: "
+                f"{report['host_time_nanoseconds'] * 1e-9:.4f} seconds (model {report['predicted_host_time_nanoseconds'] * 1e-9:.4f}), "
+                f"{report['quanta']} quanta in {report['ticks']} ticks, coordination latency "
+                f"{report['coordination_latency_nanoseconds']:.0f} ns (model {report['predicted_coordination_latency_nanoseconds']:.0f} ns)"
+            )
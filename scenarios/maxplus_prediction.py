@@ -0,0 +1,62 @@
+import time
+
+import numpy as np
+
+from analysis import MaxPlusSystem, validate_prediction
+from multi_node import MultiNodeSimulation
+from simulation_nodes import SimpleQemuSimulationNode, SimpleQemuSimulationNodeWithNoiseModel, MasterNode, UniformNoise, spawn_seeds
+import topology
+
+
+def get_factory(graph: topology.CompiledTopology, speeds: list[float], has_global_barrier: bool, noise: float = None, seed: int = 0):
+    """Factory of simulations of the graph, node i runs at speeds[i % len(speeds)] with uniform(-noise, noise) noise if given."""
+    def factory():
+        nodes = []
+        for i, (node_id, node_seed) in enumerate(zip(graph.node_ids, spawn_seeds(seed, graph.get_node_count()))):
+            speed = speeds[i % len(speeds)]
+            if noise is None:
+                nodes.append(SimpleQemuSimulationNode(simulation_speed_ips=speed, id=node_id, manages_quanta=False))
+            else:
+                nodes.append(SimpleQemuSimulationNodeWithNoiseModel(
+                    noise_model=UniformNoise(-noise, noise, seed=node_seed), simulation_speed_ips=speed, id=node_id, manages_quanta=False,
+                ))
+        return MultiNodeSimulation(
+            has_global_barrier=has_global_barrier,
+            is_distributed=False,
+            has_global_quanta=True,
+            nodes=nodes,
+            graph=graph,
+            master_node=MasterNode(),
+            engine="event",
+        )
+    return factory
+
+
+if __name__ == "__main__":
+    target_time_ns = int(1e6)
+    graphs = {"line of 8": topology.line(8), "4x4 mesh": topology.mesh_2d(4, 4), "fat tree k=4": topology.fat_tree(4)}
+    for name, graph in graphs.items():
+        for speeds in ([5e8], [5e8, 4e8, 6e8]):
+            for has_global_barrier in (True, False):
+                for noise in (None, 0.1):
+                    result = validate_prediction(get_factory(graph, speeds, has_global_barrier, noise), target_time_nanoseconds=target_time_ns)
+                    print(
+                        f"{name}, {len(speeds)} speeds, global barrier: {has_global_barrier}, noise: {noise}: "
+                        f"predicted {result['predicted_host_time_nanoseconds'] * 1e-9} seconds in {result['prediction_seconds'] * 1e3:.1f} ms, "
+                        f"simulated {result['simulated_host_time_nanoseconds'] * 1e-9} seconds in {result['simulation_seconds'] * 1e3:.0f} ms "
+                        f"({result['relative_error']:+.2%}{', lower bound' if result['is_lower_bound'] else ''})"
+                    )
+
+    # Large topologies skip the node objects and build the system from arrays.
+    graph = topology.mesh_2d(316, 316)
+    rng = np.random.default_rng(0)
+    compute = (2000 * (1 + rng.uniform(-0.3, 0.3, graph.get_node_count()))).astype(np.int64)
+    barrier = np.full(graph.get_node_count(), 1000)
+    for has_global_barrier in (True, False):
+        start = time.perf_counter()
+        prediction = MaxPlusSystem(graph, compute, barrier, has_global_barrier).predict(np.full(graph.get_node_count(), int(1e6)))
+        print(
+            f"{graph.get_node_count()} nodes, global barrier: {has_global_barrier}: 1e6 quanta predicted at "
+            f"{prediction.host_time_nanoseconds * 1e-9} seconds, cycle time {prediction.cycle_time_nanoseconds} ns, "
+            f"in {time.perf_counter() - start:.2f} seconds"
+        )
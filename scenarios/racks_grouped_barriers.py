@@ -0,0 +1,46 @@
+from multi_node import MultiNodeSimulation
+from simulation_nodes import SimpleQemuSimulationNodeWithNoiseModel, MasterNode, UniformNoise, spawn_seeds
+import topology
+
+
+def get_simulation(rack_count: int, rack_size: int, mode: str, uplink_latency_nanoseconds: int = 10000, seed: int = 0):
+    """Racks of fully connected noisy nodes linked by slow uplinks, synchronized with a global, local or grouped barrier.
+
+    mode is "global", "local", "racks" (one group per rack) or "communities" (groups found from the graph).
+    """
+    graph = topology.racks(rack_count, rack_size, 1000, uplink_latency_nanoseconds)
+    nodes = [
+        SimpleQemuSimulationNodeWithNoiseModel(
+            noise_model=UniformNoise(-0.3, 0.3, seed=node_seed), simulation_speed_ips=5e8, id=node_id, manages_quanta=False,
+        )
+        for node_id, node_seed in zip(graph.node_ids, spawn_seeds(seed, graph.get_node_count()))
+    ]
+    if mode == "racks":
+        barrier_groups = {node_id: i // rack_size for i, node_id in enumerate(graph.node_ids)}
+    elif mode == "communities":
+        barrier_groups = "communities"
+    else:
+        barrier_groups = None
+    return MultiNodeSimulation(
+        has_global_barrier=mode == "global",
+        is_distributed=False,
+        has_global_quanta=True,
+        nodes=nodes,
+        graph=graph,
+        master_node=MasterNode(),
+        engine="event",
+        barrier_groups=barrier_groups,
+    )
+
+
+if __name__ == "__main__":
+    target_time_ns = int(1e6)
+    for rack_count, rack_size in ((4, 8), (8, 8), (16, 8)):
+        times = {}
+        for mode in ("global", "local", "racks", "communities"):
+            simulation = get_simulation(rack_count, rack_size, mode)
+            times[mode] = simulation.simulate_for_nanoseconds_in_target(target_time_ns)
+            print(
+                f"{rack_count} racks of {rack_size} nodes, {mode} barriers: {times[mode] * 1e-9} seconds "
+                f"({times[mode] / times['global']:.2f}x the global barrier), {simulation.step_count} steps"
+            )
@@ -0,0 +1,32 @@
+import numpy as np
+
+from analysis import parameter_grid, run_sweep
+from scenarios.three_nodes_with_noise import get_simulation
+
+
+if __name__ == "__main__":
+    target_time_ns = int(1e7)
+    # Every point replays the same measured-like noise, so the points only differ by their parameters.
+    rng = np.random.default_rng(0)
+    noise = {f"noise{i}": rng.uniform(-0.3, 0.3, size=100_000) for i in (1, 2, 3)}
+    grid = parameter_grid(
+        has_global_barrier=[True, False],
+        latency_nanoseconds=[500, 1000, 2000],
+        simulation_speed_ips=[2.5e8, 5e8, 1e9],
+        engine=["event"],
+    )
+
+    rows = run_sweep(
+        get_simulation,
+        grid,
+        target_time_nanoseconds=target_time_ns,
+        # The noise arrays are copied to shared memory once instead of being pickled for every point.
+        shared=noise,
+        on_row=lambda row: print(f"done {row['index'] + 1}/{len(grid)}"),
+    )
+
+    for row in rows:
+        print(
+            f"global barrier: {row['has_global_barrier']}, latency: {row['latency_nanoseconds']} ns, "
+            f"speed: {row['simulation_speed_ips']:.2e} ips -> {row['host_time_nanoseconds']*1e-9} seconds"
+        )
@@ -0,0 +1,51 @@
+from analysis import host_time_attribution
+from multi_node import MultiNodeSimulation
+from simulation_nodes import SimpleQemuSimulationNode, MasterNode
+import topology
+
+
+MODELS = {
+    "flat": topology.FlatSyncCost(),
+    "linear": topology.LinearSyncCost(),
+    "tree": topology.TreeSyncCost(arity=4),
+    "dissemination": topology.DisseminationSyncCost(),
+}
+
+
+def get_simulation(k: int, sync_cost_model: topology.SyncCostModel = None, has_global_barrier: bool = True):
+    """Fat tree of parameter k (k^3/4 hosts plus switches) with identical nodes and the given barrier cost model.
+
+    The default model is hierarchical, with the racks and pods of the fat tree.
+    """
+    graph = topology.fat_tree(k, 1000)
+    if sync_cost_model is None:
+        # The racks and pods of this fat tree.
+        racks, pods = topology.fat_tree_racks(k)
+        sync_cost_model = topology.HierarchicalSyncCost(racks=racks, pods=pods)
+    nodes = [SimpleQemuSimulationNode(simulation_speed_ips=5e8, id=node_id, manages_quanta=False) for node_id in graph.node_ids]
+    return MultiNodeSimulation(
+        has_global_barrier=has_global_barrier,
+        is_distributed=False,
+        has_global_quanta=True,
+        nodes=nodes,
+        graph=graph,
+        master_node=MasterNode(),
+        engine="vectorized",
+        sync_cost_model=sync_cost_model,
+    )
+
+
+if __name__ == "__main__":
+    target_time_ns = int(1e5)
+    for has_global_barrier in (True, False):
+        for k in (4, 8, 16):
+            for name, model in (*MODELS.items(), ("hierarchical", None)):
+                simulation = get_simulation(k, model, has_global_barrier)
+                time = simulation.simulate_for_nanoseconds_in_target(target_time_ns)
+                rows = host_time_attribution(simulation)
+                sync_share = sum(row["sync_share"] for row in rows) / len(rows)
+                cost = max(node.get_synchronization_communication_overhead() for node in simulation.nodes)
+                print(
+                    f"global barrier: {has_global_barrier}, {len(simulation.nodes)} nodes, {name}: "
+                    f"barrier communication up to {cost} ns, {time * 1e-9} seconds, {sync_share:.0%} of host time synchronizing"
+                )
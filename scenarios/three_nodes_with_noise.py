@@ -1,64 +1,73 @@
-from simulation_nodes import SimpleQemuSimulationNodeWithNoiseWithPreDetermainedNoise, MasterNode
+from simulation_nodes import SimpleQemuSimulationNodeWithNoiseWithPreDetermainedNoise, SimpleQemuSimulationNodeWithNoiseModel, MasterNode, UniformNoise, spawn_seeds
 from multi_node import MultiNodeSimulation 
 from networkx import Graph
 
-import random
-size = 10_0000
-array1_noise = [random.uniform(-0.3, 0.3) for _ in range(size)] 
-array2_noise = [random.uniform(-0.3, 0.3) for _ in range(size)] 
-array3_noise = [random.uniform(-0.3, 0.3) for _ in range(size)] 
 
-def get_simulation(has_global_barrier: bool = True):
+def get_simulation(has_global_barrier: bool = True,
+                   has_global_quanta: bool = True,
+                   simulation_speed_ips: float = 5e8,
+                   latency_nanoseconds: int = 1000,
+                   seed: int = None,
+                   noise1=None,
+                   noise2=None,
+                   noise3=None,
+                   engine: str = "lockstep"):
+    """Three nodes in a line, each with its own uniform(-0.3, 0.3) noise.
 
-    node1 = SimpleQemuSimulationNodeWithNoiseWithPreDetermainedNoise(
-        noise_array=array1_noise,
-        simulation_speed_ips=5e8,
-        id= "Node1",
-        manages_quanta=False,
-    )
-
-    node2 = SimpleQemuSimulationNodeWithNoiseWithPreDetermainedNoise(
-        noise_array=array2_noise,
-        simulation_speed_ips=5e8,
-        id= "Node2",
-        manages_quanta=False,
-    )
-    
-    node3 = SimpleQemuSimulationNodeWithNoiseWithPreDetermainedNoise(
-        noise_array=array3_noise,
-        simulation_speed_ips=5e8,
-        id= "Node3",
-        manages_quanta=False,
-    )
+    The noise of the nodes is drawn in blocks from generators derived from seed. If noise1, noise2 and noise3 are
+    given, the nodes replay those arrays instead.
+    """
+    noise_arrays = (noise1, noise2, noise3)
+    node_seeds = spawn_seeds(seed, len(noise_arrays))
+    nodes = []
+    for i, (noise_array, node_seed) in enumerate(zip(noise_arrays, node_seeds)):
+        if noise_array is not None:
+            node = SimpleQemuSimulationNodeWithNoiseWithPreDetermainedNoise(
+                noise_array=noise_array,
+                simulation_speed_ips=simulation_speed_ips,
+                id=f"Node{i + 1}",
+                manages_quanta=False,
+            )
+        else:
+            node = SimpleQemuSimulationNodeWithNoiseModel(
+                noise_model=UniformNoise(-0.3, 0.3, seed=node_seed),
+                simulation_speed_ips=simulation_speed_ips,
+                id=f"Node{i + 1}",
+                manages_quanta=False,
+            )
+        nodes.append(node)
+    node1, node2, node3 = nodes
 
     graph = Graph()
-    graph.add_edge(node1.get_id(), node2.get_id(), latency_nanoseconds=int(1000))
-    graph.add_edge(node2.get_id(), node3.get_id(), latency_nanoseconds=int(1000))
+    graph.add_edge(node1.get_id(), node2.get_id(), latency_nanoseconds=int(latency_nanoseconds))
+    graph.add_edge(node2.get_id(), node3.get_id(), latency_nanoseconds=int(latency_nanoseconds))
 
     master_node = MasterNode()  # No master node in this scenario
 
     multi_node_simulation = MultiNodeSimulation(
         has_global_barrier= has_global_barrier,
         is_distributed=False,
-        has_global_quanta=True,
+        has_global_quanta=has_global_quanta,
         nodes=[node1, node2, node3],
         graph=graph,
         master_node=master_node,
         verbose=False,
+        engine=engine,
     )
 
     return multi_node_simulation
 
 
-target_time_ns = int(1e9)
-print("global barrier enabled:")
-time = get_simulation().simulate_for_nanoseconds_in_target(target_time_ns)
-print(f"Simulation time: {time*1e-9} seconds for {target_time_ns} nanoseconds in target time.")
+if __name__ == "__main__":
+    target_time_ns = int(1e9)
+    print("global barrier enabled:")
+    time = get_simulation(seed=0).simulate_for_nanoseconds_in_target(target_time_ns)
+    print(f"Simulation time: {time*1e-9} seconds for {target_time_ns} nanoseconds in target time.")
 
-print("*"*50)
-print("*"*50)
-print("*"*50)
+    print("*"*50)
+    print("*"*50)
+    print("*"*50)
 
-print("global barrier disabled:")
-time = get_simulation(has_global_barrier=False).simulate_for_nanoseconds_in_target(target_time_ns)
-print(f"Simulation time: {time*1e-9} seconds for {target_time_ns} nanoseconds in target time.")
\ No newline at end of file
+    print("global barrier disabled:")
+    time = get_simulation(has_global_barrier=False, seed=0).simulate_for_nanoseconds_in_target(target_time_ns)
+    print(f"Simulation time: {time*1e-9} seconds for {target_time_ns} nanoseconds in target time.")
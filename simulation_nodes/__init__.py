@@ -1,10 +1,25 @@
-from .node import SimulationNode, MasterNode
-from .qemu import SimpleQemuSimulationNode, SimpleQemuSimulationNodeWithNoise, SimpleQemuSimulationNodeWithNoiseWithPreDetermainedNoise
+from .node import SimulationNode
+from .master import MasterNode
+from .qemu import SimpleQemuSimulationNode, SimpleQemuSimulationNodeWithNoise, SimpleQemuSimulationNodeWithNoiseWithPreDetermainedNoise, SimpleQemuSimulationNodeWithNoiseModel, SimpleQemuSimulationNodeWithTrace
+from .noise import NoiseModel, UniformNoise, NormalNoise, LogNormalNoise, EmpiricalNoise, AR1Noise, spawn_seeds
+from .trace import load_trace, write_trace, convert_csv_trace
 
 __all__ = [
     "SimulationNode",
     "MasterNode",
     "SimpleQemuSimulationNode",
     "SimpleQemuSimulationNodeWithNoise",
-    "SimpleQemuSimulationNodeWithNoiseWithPreDetermainedNoise"
+    "SimpleQemuSimulationNodeWithNoiseWithPreDetermainedNoise",
+    "SimpleQemuSimulationNodeWithNoiseModel",
+    "SimpleQemuSimulationNodeWithTrace",
+    "NoiseModel",
+    "UniformNoise",
+    "NormalNoise",
+    "LogNormalNoise",
+    "EmpiricalNoise",
+    "AR1Noise",
+    "spawn_seeds",
+    "load_trace",
+    "write_trace",
+    "convert_csv_trace",
 ]
\ No newline at end of file
@@ -0,0 +1,103 @@
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .node import SimulationNode
+
+
+class MasterNode:
+    """Coordinator of the barriers in a non-distributed simulation, with a limited message throughput.
+
+    Every node that reaches its barrier sends an arrival message to the master, and the master sends release messages
+    to the nodes that can leave it. The master handles one message at a time, each taking message_processing_nanoseconds
+    of host time, in the order they arrive. Nodes released at the same host time are sent their release in batches of
+    release_batch_size nodes, one message per batch. A node only starts synchronizing when its release has been sent,
+    the time it waited for the master is added to the communication overhead of its BarrierExecution.
+
+    The master follows the nodes through their mode changes. With the default message_processing_nanoseconds=0 it does
+    not listen at all and the simulation is the same as without a master.
+    """
+
+    def __init__(self, message_processing_nanoseconds: int = 0, release_batch_size: int = 1):
+        """Initialize the master.
+
+        Args:
+            message_processing_nanoseconds (int): Host time the master spends on each message.
+            release_batch_size (int): Number of nodes released by one release message.
+        """
+        assert message_processing_nanoseconds >= 0, "Message processing time can not be negative."
+        assert release_batch_size > 0, "A release message releases at least one node."
+        self.message_processing_nanoseconds = message_processing_nanoseconds
+        self.release_batch_size = release_batch_size
+        self.nodes: list["SimulationNode"] = None
+
+        # Host time at which the master is done with every message it received.
+        self.busy_until_nanoseconds = 0
+        # Release batch that is still open: host time it was opened at, nodes in it, host time it is sent at.
+        self.batch_host_time_nanoseconds = -1
+        self.batch_size = 0
+        self.batch_sent_nanoseconds = 0
+
+        self.arrival_messages = 0
+        self.release_messages = 0
+        self.releases = 0
+        self.busy_nanoseconds = 0
+        self.release_delay_nanoseconds = 0
+        self.max_release_delay_nanoseconds = 0
+
+    def is_active(self):
+        """Check if the master adds any overhead, engines that do not step the node objects can not model it."""
+        return self.message_processing_nanoseconds > 0
+
+    def schedule(self, nodes: list["SimulationNode"]):
+        """Start coordinating the barriers of the nodes, called at the start of every MultiNodeSimulation.simulate."""
+        if self.nodes is nodes or not self.is_active():
+            return
+        assert self.nodes is None, "A master coordinates a single simulation."
+        self.nodes = nodes
+        for node in nodes:
+            node.add_mode_listener(self.on_mode_change)
+
+    def process_message(self, host_time_nanoseconds: int):
+        """Queue a message received at host_time_nanoseconds, return the host time at which it is processed."""
+        start = max(self.busy_until_nanoseconds, host_time_nanoseconds)
+        self.busy_until_nanoseconds = start + self.message_processing_nanoseconds
+        self.busy_nanoseconds += self.message_processing_nanoseconds
+        return self.busy_until_nanoseconds
+
+    def on_mode_change(self, node: "SimulationNode", previous_mode: str):
+        """Mode listener, queue the arrivals and delay the releases."""
+        host_time = node.current_host_time_nanoseconds
+        if node.MODE == "WAITING_ON_BARRIER" and previous_mode == "QUANTA_SIMULATION":
+            self.arrival_messages += 1
+            self.process_message(host_time)
+
+        elif node.MODE == "SYNCHRONIZATION":
+            # A global barrier also releases the nodes still synchronizing, they restart with a new release.
+            if self.batch_host_time_nanoseconds != host_time or self.batch_size == self.release_batch_size:
+                self.release_messages += 1
+                self.batch_host_time_nanoseconds = host_time
+                self.batch_size = 0
+                self.batch_sent_nanoseconds = self.process_message(host_time)
+            self.batch_size += 1
+            self.releases += 1
+
+            delay = self.batch_sent_nanoseconds - host_time
+            node.execution_details.communication_overhead_ns += delay
+            self.release_delay_nanoseconds += delay
+            self.max_release_delay_nanoseconds = max(self.max_release_delay_nanoseconds, delay)
+
+    def get_utilization(self, host_time_nanoseconds: int):
+        """Share of host_time_nanoseconds the master spent processing messages."""
+        return self.busy_nanoseconds / host_time_nanoseconds if host_time_nanoseconds else 0.0
+
+    def get_statistics(self, host_time_nanoseconds: int):
+        """Message counts, utilization and release delays (per released node) of the master over a run that took host_time_nanoseconds."""
+        return {
+            "arrival_messages": self.arrival_messages,
+            "release_messages": self.release_messages,
+            "busy_nanoseconds": self.busy_nanoseconds,
+            "utilization": self.get_utilization(host_time_nanoseconds),
+            "release_delay_nanoseconds": self.release_delay_nanoseconds,
+            "mean_release_delay_nanoseconds": self.release_delay_nanoseconds / self.releases if self.releases else 0.0,
+            "max_release_delay_nanoseconds": self.max_release_delay_nanoseconds,
+        }
@@ -1,9 +1,10 @@
-from typing import Self, Literal
+from typing import Self, Literal, Callable
 import math
 
 class ExecutionDetails:
     """Base class for execution details of a simulation node for a each mode."""
-    time_executed_ns: int = 0
+    __slots__ = ("time_executed_ns",)
+    time_executed_ns: int
 
     def __init__(self):
         """Initialize the execution details."""
@@ -18,6 +19,7 @@ class ExecutionDetails:
 
 class QuantaExecution(ExecutionDetails):
     """Data class to hold the execution information of a quanta."""
+    __slots__ = ("host_length_to_execute_ns", "instructions_executed")
     host_length_to_execute_ns: int
     instructions_executed: int
 
@@ -34,6 +36,7 @@ class QuantaExecution(ExecutionDetails):
 
 class BarrierExecution(ExecutionDetails):
     """Data class to hold the execution information of a barrier."""
+    __slots__ = ("communication_overhead_ns", "synchronization_overhead_ns")
     communication_overhead_ns: int
     synchronization_overhead_ns: int
 
@@ -50,6 +53,18 @@ class BarrierExecution(ExecutionDetails):
 
 
 class SimulationNode:
+    # Subclasses add their own attributes to __slots__ (an empty tuple if they have none), a subclass without
+    # __slots__ still works but gets a __dict__ back.
+    __slots__ = (
+        "name", "_simulation_speed_ips", "quanta_nanoseconds",
+        "current_host_time_nanoseconds", "current_target_time_nanoseconds", "target_instructions_executed",
+        "target_instructions_goal", "target_time_nanoseconds_goal",
+        "compute_host_time_nanoseconds", "wait_host_time_nanoseconds", "sync_host_time_nanoseconds",
+        "synchronization_communication_overhead_nanoseconds",
+        "_machine_cycle_per_nano_second", "_machine_instruction_per_cycle",
+        "manages_quanta", "connected_nodes", "MODE", "execution_details", "mode_listeners", "has_been_initialized",
+        "quanta_execution", "barrier_execution", "quanta_host_nanoseconds", "instructions_per_quanta",
+    )
 
     def get_simulation_speed_ips(self):
         """Get the simulation speed in instructions per second."""
@@ -67,14 +82,50 @@ class SimulationNode:
         """Get the number of machine instructions per nanosecond."""
         return self.get_machine_cycle_per_nano_second() * self.get_machine_instruction_per_cycle()
     
+    def clear_conversions(self):
+        """Forget the cached host time and instructions of a quanta, they are computed again on the next quanta."""
+        self.quanta_host_nanoseconds = None
+        self.instructions_per_quanta = None
+
+    @property
+    def simulation_speed_ips(self):
+        return self._simulation_speed_ips
+
+    @simulation_speed_ips.setter
+    def simulation_speed_ips(self, simulation_speed_ips):
+        self._simulation_speed_ips = simulation_speed_ips
+        self.clear_conversions()
+
+    @property
+    def machine_cycle_per_nano_second(self):
+        return self._machine_cycle_per_nano_second
+
+    @machine_cycle_per_nano_second.setter
+    def machine_cycle_per_nano_second(self, machine_cycle_per_nano_second):
+        self._machine_cycle_per_nano_second = machine_cycle_per_nano_second
+        self.clear_conversions()
+
+    @property
+    def machine_instruction_per_cycle(self):
+        return self._machine_instruction_per_cycle
+
+    @machine_instruction_per_cycle.setter
+    def machine_instruction_per_cycle(self, machine_instruction_per_cycle):
+        self._machine_instruction_per_cycle = machine_instruction_per_cycle
+        self.clear_conversions()
+
     def get_quanta_nanoseconds(self):
         """Get the duration of a quanta in nanoseconds."""
         assert self.quanta_nanoseconds > 0, "Quanta nanoseconds must be set before getting it."
         return self.quanta_nanoseconds
 
     def get_instructions_per_quanta(self):
-        """Get the number of instructions per quanta."""
-        return self.get_machine_instruction_per_nano_second() * self.get_quanta_nanoseconds()
+        """Get the number of instructions per quanta, cached until the quanta or the speed of the node changes."""
+        instructions_per_quanta = self.instructions_per_quanta
+        if instructions_per_quanta is None:
+            instructions_per_quanta = self.get_machine_instruction_per_nano_second() * self.get_quanta_nanoseconds()
+            self.instructions_per_quanta = instructions_per_quanta
+        return instructions_per_quanta
         
 
     def target_nano_to_host_nano(self):
@@ -85,8 +136,37 @@ class SimulationNode:
         return math.ceil(host_second_to_simulate_target_nano * 1e9) # Convert to nanoseconds
 
     def target_quanta_nanoseconds_to_host_nanoseconds(self):
-        """Calculate the nanoseconds to simulate one quanta, based on host time."""
-        return self.target_nano_to_host_nano() * self.get_quanta_nanoseconds()
+        """Calculate the nanoseconds to simulate one quanta, based on host time, cached until the quanta or the speed of the node changes."""
+        quanta_host_nanoseconds = self.quanta_host_nanoseconds
+        if quanta_host_nanoseconds is None:
+            quanta_host_nanoseconds = self.target_nano_to_host_nano() * self.get_quanta_nanoseconds()
+            self.quanta_host_nanoseconds = quanta_host_nanoseconds
+        return quanta_host_nanoseconds
+
+    def sample_quanta_noise(self, rng, shape: tuple[int, ...], previous=None):
+        """Draw independent noise factors for the quanta of other runs of this node, from a numpy.random.Generator.
+
+        A quanta then takes int(SimulationNode.target_quanta_nanoseconds_to_host_nanoseconds(self) * (1 + factor)) host
+        nanoseconds, like the noise nodes compute it. The last axis of shape is consecutive quanta of a run, previous
+        the last factor drawn for each run (see NoiseModel.sample). None for nodes without noise.
+        """
+        return None
+
+    def has_constant_quanta_host_time(self):
+        """Check if every quanta takes the same host time, i.e. target_quanta_nanoseconds_to_host_nanoseconds is not overridden (like the noise nodes do)."""
+        return type(self).target_quanta_nanoseconds_to_host_nanoseconds is SimulationNode.target_quanta_nanoseconds_to_host_nanoseconds
+
+    def uses_shared_random_state(self):
+        """Check if the node draws its noise from the global random state, so its quanta depend on the order in which all nodes draw."""
+        return False
+
+    def get_noise_state(self):
+        """Picklable position of the node in its own noise (see set_noise_state), None for nodes without noise."""
+        return None
+
+    def set_noise_state(self, state):
+        """Move the node to a position in its noise from get_noise_state, e.g. one a worker process advanced to."""
+        assert state is None, f"Node {self.get_id()} has no noise state."
 
     def get_id(self):
         """Get the ID of the simulation node."""
@@ -94,7 +174,12 @@ class SimulationNode:
     
     def get_synchronization_communication_overhead(self):
         """Get the synchronization communication overhead in nanoseconds."""
-        return 0
+        return self.synchronization_communication_overhead_nanoseconds
+
+    def set_synchronization_communication_overhead(self, nanoseconds: int):
+        """Set the synchronization communication overhead in nanoseconds, e.g. from a topology.SyncCostModel."""
+        assert nanoseconds >= 0, "Communication overhead can not be negative."
+        self.synchronization_communication_overhead_nanoseconds = nanoseconds
     
     def connect_node(self, node: Self):
         """Connect this node to another simulation node."""
@@ -107,6 +192,13 @@ class SimulationNode:
             """Set the quanta duration in nanoseconds."""
             assert quanta_nanoseconds > 0, "Quanta nanoseconds must be greater than zero."
             self.quanta_nanoseconds = quanta_nanoseconds
+            self.clear_conversions()
+
+    def set_goal(self, instructions: int = None, time_nanoseconds: int = None):
+        """Set the goal of the node to a number of instructions or a target time, clearing the other one."""
+        assert (instructions is None) != (time_nanoseconds is None), "Exactly one of instructions and time_nanoseconds must be given."
+        self.target_instructions_goal = -1 if instructions is None else instructions
+        self.target_time_nanoseconds_goal = -1 if time_nanoseconds is None else time_nanoseconds
 
     def is_done(self):
         """Check if the simulation node has reached its goal."""
@@ -129,13 +221,19 @@ class SimulationNode:
             simulation_speed_ips (int): The speed of the simulation in instructions per second.
         """
         self.name = id
-        self.simulation_speed_ips = simulation_speed_ips
         self.quanta_nanoseconds = -1
+        self.simulation_speed_ips = simulation_speed_ips
         self.current_host_time_nanoseconds = 0
         self.current_target_time_nanoseconds = 0
         self.target_instructions_executed = 0
         self.target_instructions_goal = -1
         self.target_time_nanoseconds_goal = -1
+        # Host time spent in each mode, they add up to current_host_time_nanoseconds.
+        self.compute_host_time_nanoseconds = 0
+        self.wait_host_time_nanoseconds = 0
+        self.sync_host_time_nanoseconds = 0
+        # Network part of every barrier, set by the simulation's sync cost model.
+        self.synchronization_communication_overhead_nanoseconds = 0
 
         self.machine_cycle_per_nano_second = 5 # Default value, can be overridden by subclasses, 2 GhZ
         self.machine_instruction_per_cycle = 2
@@ -144,6 +242,10 @@ class SimulationNode:
 
         self.MODE: Literal['QUANTA_SIMULATION', 'WAITING_ON_BARRIER', 'SYNCHRONIZATION'] = 'QUANTA_SIMULATION'
         self.execution_details: ExecutionDetails = None
+        self.mode_listeners: list[Callable[[Self, str], None]] = []
+        # The records of the current quanta and barrier, reset in place by change_mode rather than allocated each time.
+        self.quanta_execution = QuantaExecution(0, 0)
+        self.barrier_execution = BarrierExecution(0, 0)
 
 
         # Because of none global quanta, we need to calculate the next quanta information after initialization.
@@ -159,23 +261,33 @@ class SimulationNode:
         # self.calculate_next_quanta_information()
         self.has_been_initialized = True
 
+    def add_mode_listener(self, listener: Callable[[Self, str], None]):
+        """Call listener(node, previous_mode) after every change_mode."""
+        self.mode_listeners.append(listener)
+
     def change_mode(self, MODE: Literal['QUANTA_SIMULATION', 'WAITING_ON_BARRIER', 'SYNCHRONIZATION']):
         
+        previous_mode = self.MODE
         self.MODE = MODE
         if self.MODE == 'QUANTA_SIMULATION':
-            self.execution_details = QuantaExecution(
-                host_length_to_execute_ns=self.target_quanta_nanoseconds_to_host_nanoseconds(),
-                instructions_executed=self.get_instructions_per_quanta()
-            )
+            execution_details = self.quanta_execution
+            execution_details.host_length_to_execute_ns = self.target_quanta_nanoseconds_to_host_nanoseconds()
+            execution_details.instructions_executed = self.get_instructions_per_quanta()
+            execution_details.time_executed_ns = 0
+            self.execution_details = execution_details
 
         elif self.MODE == 'WAITING_ON_BARRIER':
             self.execution_details = None
 
         elif self.MODE == 'SYNCHRONIZATION':
-            self.execution_details = BarrierExecution(
-                communication_overhead_ns=self.get_synchronization_communication_overhead(),
-                synchronization_overhead_ns=self.get_synchronization_overhead_in_nanoseconds()
-            )
+            execution_details = self.barrier_execution
+            execution_details.communication_overhead_ns = self.get_synchronization_communication_overhead()
+            execution_details.synchronization_overhead_ns = self.get_synchronization_overhead_in_nanoseconds()
+            execution_details.time_executed_ns = 0
+            self.execution_details = execution_details
+
+        for listener in self.mode_listeners:
+            listener(self, previous_mode)
         
         
     
@@ -227,13 +339,13 @@ class SimulationNode:
         self.current_host_time_nanoseconds += amount_time_to_simulate_ns
         
         if self.MODE == 'SYNCHRONIZATION':
+            self.sync_host_time_nanoseconds += amount_time_to_simulate_ns
             self.continue_sync()
 
         elif self.MODE == 'QUANTA_SIMULATION':
+            self.compute_host_time_nanoseconds += amount_time_to_simulate_ns
             self.continue_quanta_simulation()
         
-        # Else it's just waisted time like real life
-
-
-class MasterNode:
-    pass
\ No newline at end of file
+        else:
+            # Else it's just waisted time like real life
+            self.wait_host_time_nanoseconds += amount_time_to_simulate_ns
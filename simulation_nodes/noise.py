@@ -0,0 +1,173 @@
+from typing import TYPE_CHECKING
+
+# numpy is imported where the noise is drawn, so that simulations of nodes without noise start without it (see
+# scenarios.__main__).
+if TYPE_CHECKING:
+    import numpy as np
+
+
+def spawn_seeds(seed, count: int):
+    """Derive count independent seeds from one seed, e.g. one per node of a scenario."""
+    import numpy as np
+
+    return np.random.SeedSequence(seed).spawn(count)
+
+
+class NoiseModel:
+    """Source of the noise factors of a node, a quanta takes (1 + factor) times its host time without noise.
+
+    Factors are drawn from the model's own numpy.random.Generator in blocks of up to block_size and handed out one at a
+    time with next(), a new block is only drawn once the previous one is used up. The same seed gives the same factors.
+    Subclasses implement sample(), which is also used by the ensembles to draw many independent runs at once.
+    """
+
+    def __init__(self, seed=None, block_size: int = 4096):
+        """Initialize the noise model.
+
+        Args:
+            seed: Anything numpy.random.default_rng accepts (an int, a SeedSequence from spawn_seeds, a Generator). A fresh random seed if None.
+            block_size (int): Largest number of factors drawn at a time.
+        """
+        import numpy as np
+
+        assert block_size > 0, "Block size must be greater than zero."
+        self.rng = np.random.default_rng(seed)
+        self.block_size = block_size
+        # Blocks start small and double up to block_size, so that many short lived nodes do not hold full blocks.
+        self.next_block_size = min(64, block_size)
+        self.factors = iter(())
+        self.last = None
+
+    def __getstate__(self):
+        """Pickle the factors left in the current block instead of the iterator over it, see checkpoint."""
+        import numpy as np
+
+        state = self.__dict__.copy()
+        factors = np.fromiter(self.factors, dtype=np.float64)
+        self.factors = iter(memoryview(factors))
+        state["factors"] = factors
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.factors = iter(memoryview(state["factors"]))
+
+    def sample(self, rng: "np.random.Generator", shape: tuple[int, ...], previous=None) -> "np.ndarray":
+        """Draw factors of the given shape from rng.
+
+        The leading axes are independent runs, the last axis is consecutive quanta of a run. previous holds the last
+        factor of each run (shape[:-1]) for models whose factors depend on the previous ones, None to start fresh.
+        """
+        raise NotImplementedError("This method should be implemented in subclasses.")
+
+    def next(self) -> float:
+        """Get the factor of the next quanta."""
+        for factor in self.factors:
+            return factor
+        import numpy as np
+
+        block = np.ascontiguousarray(self.sample(self.rng, (self.next_block_size,), previous=self.last), dtype=np.float64)
+        self.next_block_size = min(2 * self.next_block_size, self.block_size)
+        self.last = block[-1]
+        # Iterating a memoryview gives Python floats, as cheap as a list of them but without the per float objects.
+        self.factors = iter(memoryview(block))
+        return next(self.factors)
+
+
+class UniformNoise(NoiseModel):
+    """Factors drawn uniformly between low and high."""
+
+    def __init__(self, low: float = -0.05, high: float = 0.1, **kwargs):
+        """Initialize the model, the defaults match SimpleQemuSimulationNodeWithNoise."""
+        super().__init__(**kwargs)
+        self.low = low
+        self.high = high
+
+    def sample(self, rng, shape, previous=None):
+        return rng.uniform(self.low, self.high, size=shape)
+
+
+class NormalNoise(NoiseModel):
+    """Normally distributed factors, clipped so that a quanta never takes less than min_multiplier of its time."""
+
+    def __init__(self, mean: float = 0.0, std: float = 0.05, min_multiplier: float = 0.01, **kwargs):
+        super().__init__(**kwargs)
+        self.mean = mean
+        self.std = std
+        self.min_multiplier = min_multiplier
+
+    def sample(self, rng, shape, previous=None):
+        import numpy as np
+
+        return np.maximum(rng.normal(self.mean, self.std, size=shape), self.min_multiplier - 1)
+
+
+class LogNormalNoise(NoiseModel):
+    """Factors for which 1 + factor is log-normal, i.e. exp(N(mu, sigma)) - 1. Slowdowns have a long tail."""
+
+    def __init__(self, mu: float = 0.0, sigma: float = 0.05, **kwargs):
+        super().__init__(**kwargs)
+        self.mu = mu
+        self.sigma = sigma
+
+    def sample(self, rng, shape, previous=None):
+        return rng.lognormal(self.mu, self.sigma, size=shape) - 1
+
+
+class EmpiricalNoise(NoiseModel):
+    """Factors resampled with replacement from measured ones (bootstrap)."""
+
+    def __init__(self, values, **kwargs):
+        """Initialize the model from a sequence of measured factors."""
+        import numpy as np
+
+        super().__init__(**kwargs)
+        self.values = np.asarray(values, dtype=np.float64)
+        assert len(self.values) > 0, "Empirical noise needs at least one value."
+
+    def sample(self, rng, shape, previous=None):
+        return self.values[rng.integers(len(self.values), size=shape)]
+
+
+class AR1Noise(NoiseModel):
+    """Autocorrelated factors, factor_t = mean + phi * (factor_t-1 - mean) + N(0, sigma).
+
+    Consecutive quanta of a node are then slow or fast together, like a host under changing load. Fresh runs start
+    from the stationary distribution, std sigma / sqrt(1 - phi^2) around the mean.
+    """
+
+    # Length of the chunks the recursion is unrolled over, see sample.
+    CHUNK = 64
+
+    def __init__(self, phi: float = 0.9, sigma: float = 0.02, mean: float = 0.0, **kwargs):
+        import numpy as np
+
+        super().__init__(**kwargs)
+        assert -1 < phi < 1, "phi must be in (-1, 1) for the noise to be stationary."
+        self.phi = phi
+        self.sigma = sigma
+        self.mean = mean
+        # response[t, k] = phi^(t - k) for k <= t: within a chunk, the effect of the innovation k on factor t.
+        steps = np.arange(self.CHUNK)
+        exponents = steps[:, np.newaxis] - steps[np.newaxis, :]
+        self.response = np.where(exponents >= 0, phi ** np.maximum(exponents, 0), 0.0)
+        # Effect of the factor before the chunk on each factor of the chunk.
+        self.carry_response = phi ** (steps + 1)
+
+    def sample(self, rng, shape, previous=None):
+        import numpy as np
+
+        *runs, length = shape
+        if previous is None:
+            previous = self.mean + rng.normal(0, self.sigma / np.sqrt(1 - self.phi ** 2), size=runs)
+        carry = np.broadcast_to(np.asarray(previous, dtype=np.float64) - self.mean, runs)
+
+        # Instead of a Python loop over every factor, the recursion is a matrix product within each chunk plus one
+        # step per chunk to carry the last factor over.
+        chunk_count = -(-length // self.CHUNK)
+        innovations = rng.normal(0, self.sigma, size=(*runs, chunk_count, self.CHUNK))
+        deviations = innovations @ self.response.T
+        for c in range(chunk_count):
+            deviations[..., c, :] += self.carry_response * carry[..., np.newaxis]
+            carry = deviations[..., c, -1]
+        return self.mean + deviations.reshape(*runs, chunk_count * self.CHUNK)[..., :length]
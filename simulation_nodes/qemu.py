@@ -1,9 +1,15 @@
 from .node import SimulationNode
+from .trace import load_trace
+from typing import Literal, TYPE_CHECKING
 import random
 
+if TYPE_CHECKING:
+    from .noise import NoiseModel
+
 
 class SimpleQemuSimulationNode(SimulationNode):
-    
+    __slots__ = ()
+
     def get_synchronization_overhead_in_nanoseconds(self):
         """Get the synchronization overhead in nanoseconds."""
         # For QEMU, we assume a fixed overhead for synchronization
@@ -11,7 +17,8 @@ class SimpleQemuSimulationNode(SimulationNode):
 
 
 class SimpleQemuSimulationNodeWithNoise(SimpleQemuSimulationNode):
-    
+    __slots__ = ()
+
     def target_quanta_nanoseconds_to_host_nanoseconds(self):
         """Calculate the nanoseconds to simulate one quanta, based on host time, with noise."""
         # Adding a random noise factor to the simulation speed
@@ -20,7 +27,16 @@ class SimpleQemuSimulationNodeWithNoise(SimpleQemuSimulationNode):
         without_noise = super().target_quanta_nanoseconds_to_host_nanoseconds()
         return int(without_noise * (1 + noise_factor))  # Add noise to the base time
 
+    def sample_quanta_noise(self, rng, shape: tuple[int, ...], previous=None):
+        """Draw independent noise factors from the same distribution as target_quanta_nanoseconds_to_host_nanoseconds."""
+        return rng.uniform(-0.05, 0.1, size=shape)
+
+    def uses_shared_random_state(self):
+        """The noise comes from the random module."""
+        return True
+
 class SimpleQemuSimulationNodeWithNoiseWithPreDetermainedNoise(SimpleQemuSimulationNode):
+    __slots__ = ("noise_array", "noise_index")
 
     def __init__(self, *args, noise_array: list[float], **kwargs):
         """Initialize the node with a predetermined noise array."""
@@ -39,7 +55,128 @@ class SimpleQemuSimulationNodeWithNoiseWithPreDetermainedNoise(SimpleQemuSimulat
             self.noise_index = 0
         return int(without_noise * (1 + noise_factor))  # Add noise to the base time
 
+    def get_noise_state(self):
+        """Position in the noise array."""
+        return self.noise_index
+
+    def set_noise_state(self, state):
+        self.noise_index = state
+
+    def sample_quanta_noise(self, rng, shape: tuple[int, ...], previous=None):
+        """Draw noise factors by resampling the noise array with replacement (bootstrap)."""
+        return rng.choice(self.noise_array, size=shape)
+
+class SimpleQemuSimulationNodeWithNoiseModel(SimpleQemuSimulationNode):
+    __slots__ = ("noise_model",)
+
+    def __init__(self, *args, noise_model: "NoiseModel", **kwargs):
+        """Initialize the node with the noise model its quanta draw their noise from, see simulation_nodes.noise."""
+        super().__init__(*args, **kwargs)
+        self.noise_model = noise_model
+
+    def target_quanta_nanoseconds_to_host_nanoseconds(self):
+        """Calculate the nanoseconds to simulate one quanta, based on host time, with noise."""
+        without_noise = super().target_quanta_nanoseconds_to_host_nanoseconds()
+        return int(without_noise * (1 + self.noise_model.next()))  # Add noise to the base time
 
+    def get_noise_state(self):
+        """The noise model, its generator and the factors left in its block pickle with it."""
+        return self.noise_model
 
+    def set_noise_state(self, state):
+        self.noise_model = state
+
+    def sample_quanta_noise(self, rng, shape: tuple[int, ...], previous=None):
+        """Draw noise factors from the noise model of the node."""
+        return self.noise_model.sample(rng, shape, previous=previous)
+
+
+class SimpleQemuSimulationNodeWithTrace(SimpleQemuSimulationNode):
+    __slots__ = ("trace_path", "trace", "at_end", "trace_index", "trace_quanta_nanoseconds", "block_size", "block_start", "block", "block_index")
+
+    def __init__(self,
+                 *args,
+                 trace_path: str,
+                 at_end: Literal['wrap', 'stop'] = 'wrap',
+                 start_index: int = 0,
+                 trace_quanta_nanoseconds: int = None,
+                 block_size: int = 1 << 16,
+                 **kwargs):
+        """Initialize the node with a recorded trace of per quanta host durations, see simulation_nodes.trace.
+
+        Args:
+            trace_path (str): Binary trace file, memory mapped and read block_size samples at a time.
+            at_end (str): "wrap" starts the trace over once it is used up (like noise_array), "stop" raises an error.
+            start_index (int): First sample to replay, lets several nodes replay different parts of one trace.
+            trace_quanta_nanoseconds (int): Quanta length the trace was recorded with. If given, durations are scaled to the quanta of this node, else they are used as is.
+            block_size (int): Number of samples read from the trace at a time.
+        """
+        super().__init__(*args, **kwargs)
+        assert at_end in ('wrap', 'stop'), f"Unknown at_end {at_end}, expected 'wrap' or 'stop'."
+        self.trace_path = trace_path
+        self.trace = load_trace(trace_path)
+        assert len(self.trace) > 0, f"Trace {trace_path} is empty."
+        assert 0 <= start_index < len(self.trace), "The start index must be within the trace."
+        self.at_end = at_end
+        self.trace_index = start_index
+        self.trace_quanta_nanoseconds = trace_quanta_nanoseconds
+        self.block_size = block_size
+        # The current block is trace[block_start:trace_index], block_index is the next duration to use in it.
+        self.block_start = start_index
+        self.block = memoryview(b"")
+        self.block_index = 0
+
+    def __getstate__(self):
+        """Pickle the trace path and the position in the trace instead of the memory map and block, see checkpoint."""
+        state, slots = super().__getstate__()
+        del slots["trace"]
+        del slots["block"]
+        return state, slots
+
+    def __setstate__(self, state):
+        state, slots = state
+        for name, value in {**(state or {}), **slots}.items():
+            setattr(self, name, value)
+        self.trace = load_trace(self.trace_path)
+        self.block = memoryview(self.trace[self.block_start:self.trace_index])
+
+    def get_noise_state(self):
+        """Position in the trace and in the current block."""
+        return self.trace_index, self.block_start, self.block_index
+
+    def set_noise_state(self, state):
+        self.trace_index, self.block_start, self.block_index = state
+        self.block = memoryview(self.trace[self.block_start:self.trace_index])
+
+    def next_trace_duration(self):
+        """Get the next recorded duration, reading the next block of the trace when needed."""
+        if self.block_index < len(self.block):
+            duration = self.block[self.block_index]
+            self.block_index += 1
+            return duration
+        if self.trace_index >= len(self.trace):
+            assert self.at_end == 'wrap', f"Node {self.get_id()} used up its trace of {len(self.trace)} quanta."
+            self.trace_index = 0
+        self.block_start = self.trace_index
+        self.block = memoryview(self.trace[self.trace_index:self.trace_index + self.block_size])
+        self.trace_index += len(self.block)
+        self.block_index = 1
+        return self.block[0]
+
+    def target_quanta_nanoseconds_to_host_nanoseconds(self):
+        """Get the host time of the next quanta from the trace."""
+        duration = self.next_trace_duration()
+        if self.trace_quanta_nanoseconds is None:
+            return duration
+        return int(duration * self.get_quanta_nanoseconds() / self.trace_quanta_nanoseconds)
 
+    def sample_quanta_noise(self, rng, shape: tuple[int, ...], previous=None):
+        """Draw noise factors by resampling the trace with replacement, relative to the host time without noise."""
+        import numpy as np
 
+        durations = self.trace[np.sort(rng.integers(len(self.trace), size=int(np.prod(shape))))]
+        rng.shuffle(durations)
+        if self.trace_quanta_nanoseconds is not None:
+            durations = durations * self.get_quanta_nanoseconds() / self.trace_quanta_nanoseconds
+        without_noise = SimulationNode.target_quanta_nanoseconds_to_host_nanoseconds(self)
+        return (durations / without_noise - 1).reshape(shape)
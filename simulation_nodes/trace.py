@@ -0,0 +1,78 @@
+from array import array
+import struct
+
+# Binary trace file: header with the number of samples, then one little endian int64 host duration in nanoseconds per
+# recorded quanta.
+TRACE_MAGIC = b"MNSTRC01"
+TRACE_HEADER = struct.Struct("<8sq")
+
+
+def load_trace(path: str):
+    """Memory map the durations of a binary trace file, nothing is read until it is indexed."""
+    import numpy as np
+
+    with open(path, "rb") as trace_file:
+        magic, sample_count = TRACE_HEADER.unpack(trace_file.read(TRACE_HEADER.size))
+    assert magic == TRACE_MAGIC, f"{path} is not a quanta trace file."
+    return np.memmap(path, dtype="<i8", mode="r", offset=TRACE_HEADER.size, shape=(sample_count,))
+
+
+def write_trace(path: str, durations_nanoseconds):
+    """Write host durations in nanoseconds to a binary trace file."""
+    import numpy as np
+
+    durations = np.ascontiguousarray(durations_nanoseconds, dtype="<i8")
+    with open(path, "wb") as trace_file:
+        trace_file.write(TRACE_HEADER.pack(TRACE_MAGIC, len(durations)))
+        durations.tofile(trace_file)
+
+
+def convert_csv_trace(csv_path: str, trace_path: str, column: str | int = 0, scale: float = 1.0, chunk_size: int = 1 << 20):
+    """Convert a CSV trace to the binary format, streaming so that traces larger than memory can be converted.
+
+    Args:
+        csv_path (str): CSV file with one recorded quanta per row.
+        trace_path (str): Binary trace file to write.
+        column (str | int): Name of the column with the durations if the CSV has a header, else its index.
+        scale (float): Multiplier to get nanoseconds, e.g. 1000 for durations in microseconds.
+        chunk_size (int): Number of rows converted at a time.
+
+    Returns the number of samples written.
+    """
+    import csv
+
+    sample_count = 0
+    with open(csv_path, newline="") as csv_file, open(trace_path, "wb") as trace_file:
+        # The sample count is only known at the end, the header is written again then.
+        trace_file.write(TRACE_HEADER.pack(TRACE_MAGIC, 0))
+        reader = csv.reader(csv_file)
+        if isinstance(column, str):
+            column = next(reader).index(column)
+        chunk = array("q")
+        for row in reader:
+            if not row or row[0].startswith("#"):
+                continue
+            chunk.append(round(float(row[column]) * scale))
+            if len(chunk) >= chunk_size:
+                chunk.tofile(trace_file)
+                sample_count += len(chunk)
+                chunk = array("q")
+        chunk.tofile(trace_file)
+        sample_count += len(chunk)
+        trace_file.seek(0)
+        trace_file.write(TRACE_HEADER.pack(TRACE_MAGIC, sample_count))
+    return sample_count
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Convert a CSV trace of per quanta host durations to the binary trace format.")
+    parser.add_argument("csv_path")
+    parser.add_argument("trace_path")
+    parser.add_argument("--column", default="0", help="Column name, or index if the CSV has no header.")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplier to get nanoseconds.")
+    arguments = parser.parse_args()
+    column = int(arguments.column) if arguments.column.isdigit() else arguments.column
+    count = convert_csv_trace(arguments.csv_path, arguments.trace_path, column=column, scale=arguments.scale)
+    print(f"Wrote {count} samples to {arguments.trace_path}.")
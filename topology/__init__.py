@@ -0,0 +1,31 @@
+from .csr import CompiledTopology, compile_graph, load_edge_list, load_csr, save_csr
+from .generators import line, ring, mesh_2d, fat_tree, fat_tree_racks, random_regular, racks, random_latencies
+from .sync_costs import (
+    SyncCostModel, FlatSyncCost, LinearSyncCost, TreeSyncCost, DisseminationSyncCost, HierarchicalSyncCost, estimate_diameter,
+)
+from .groups import group_indices, detect_communities
+
+__all__ = [
+    "CompiledTopology",
+    "compile_graph",
+    "load_edge_list",
+    "load_csr",
+    "save_csr",
+    "line",
+    "ring",
+    "mesh_2d",
+    "fat_tree",
+    "fat_tree_racks",
+    "random_regular",
+    "racks",
+    "random_latencies",
+    "SyncCostModel",
+    "FlatSyncCost",
+    "LinearSyncCost",
+    "TreeSyncCost",
+    "DisseminationSyncCost",
+    "HierarchicalSyncCost",
+    "estimate_diameter",
+    "group_indices",
+    "detect_communities",
+]
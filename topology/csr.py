@@ -0,0 +1,171 @@
+from array import array
+from typing import Iterable, TYPE_CHECKING
+import struct
+
+if TYPE_CHECKING:
+    import networkx as nx
+
+# Binary CSR file: header, then offsets, neighbor indices and latencies as little endian int64, then the node IDs as
+# newline separated UTF-8.
+CSR_MAGIC = b"MNSCSR01"
+CSR_HEADER = struct.Struct("<8sqqq")
+
+
+class CompiledTopology:
+    """Graph of the simulation compiled to integer node indices and CSR arrays.
+
+    The neighbors of node i are neighbor_indices[neighbor_offsets[i]:neighbor_offsets[i + 1]], the latency of each of
+    those edges is at the same position in edge_latencies_nanoseconds. Every undirected edge is stored once in each
+    direction. Within a row the edges are in the order they were added, for a networkx graph the order of graph.edges.
+    The arrays are either array('q') or (for topologies loaded from a CSR file) read only numpy memmaps.
+    """
+
+    def __init__(self, node_ids: list[str], neighbor_offsets, neighbor_indices, edge_latencies_nanoseconds):
+        """Initialize the topology from its arrays, see compile_graph and the load functions to build one."""
+        assert len(neighbor_offsets) == len(node_ids) + 1, "There must be one offset per node, plus one."
+        assert len(neighbor_indices) == len(edge_latencies_nanoseconds), "Every neighbor entry needs a latency."
+        self.node_ids = node_ids
+        self.index = {node_id: i for i, node_id in enumerate(node_ids)}
+        assert len(self.index) == len(node_ids), "Node IDs must be unique."
+        self.neighbor_offsets = neighbor_offsets
+        self.neighbor_indices = neighbor_indices
+        self.edge_latencies_nanoseconds = edge_latencies_nanoseconds
+
+    def get_node_count(self):
+        """Get the number of nodes."""
+        return len(self.node_ids)
+
+    def get_edge_count(self):
+        """Get the number of undirected edges."""
+        return len(self.neighbor_indices) // 2
+
+    def neighbors(self, i: int):
+        """Get the neighbor indices of node i."""
+        return self.neighbor_indices[self.neighbor_offsets[i]:self.neighbor_offsets[i + 1]]
+
+    def latencies(self, i: int):
+        """Get the latencies of the edges of node i, in the same order as neighbors(i)."""
+        return self.edge_latencies_nanoseconds[self.neighbor_offsets[i]:self.neighbor_offsets[i + 1]]
+
+    def as_lists(self):
+        """Get (offsets, neighbor indices, latencies) as Python lists, iterating them is much faster than numpy arrays."""
+        arrays = (self.neighbor_offsets, self.neighbor_indices, self.edge_latencies_nanoseconds)
+        return tuple(values.tolist() for values in arrays)
+
+    def rows(self):
+        """Get, for every node, the list of its neighbor indices and the list of the matching latencies."""
+        offsets, indices, latencies = self.as_lists()
+        return (
+            [indices[offsets[i]:offsets[i + 1]] for i in range(len(self.node_ids))],
+            [latencies[offsets[i]:offsets[i + 1]] for i in range(len(self.node_ids))],
+        )
+
+    def reindexed(self, node_ids: list[str]):
+        """Get the same topology with node i being node_ids[i], keeping the order of the edges within each row."""
+        if list(node_ids) == list(self.node_ids):
+            return self
+        missing = set(self.node_ids) - set(node_ids)
+        assert not missing, f"Nodes {sorted(missing)} are in the topology but not in the simulation."
+        new_index = {node_id: i for i, node_id in enumerate(node_ids)}
+        old_to_new = [new_index[node_id] for node_id in self.node_ids]
+        neighbor_rows, latency_rows = self.rows()
+        rows = []
+        for node_id in node_ids:
+            i = self.index.get(node_id)
+            if i is None:
+                rows.append(([], []))
+            else:
+                rows.append(([old_to_new[j] for j in neighbor_rows[i]], latency_rows[i]))
+        return from_rows(list(node_ids), rows)
+
+
+def from_rows(node_ids: list[str], rows: list[tuple[list[int], list[int]]]):
+    """Build a topology from (neighbor indices, latencies) rows, one per node."""
+    offsets = array("q", [0])
+    indices = array("q")
+    latencies = array("q")
+    for row_indices, row_latencies in rows:
+        indices.extend(row_indices)
+        latencies.extend(row_latencies)
+        offsets.append(len(indices))
+    return CompiledTopology(node_ids, offsets, indices, latencies)
+
+
+def from_edges(node_ids: list[str], edges: Iterable[tuple[str, str, int]]):
+    """Build a topology from (node1, node2, latency) edges, rows keep the order of the edges."""
+    index = {node_id: i for i, node_id in enumerate(node_ids)}
+    rows = [([], []) for _ in node_ids]
+    for node1, node2, latency_nanoseconds in edges:
+        assert float(latency_nanoseconds).is_integer(), f"Latency of edge {node1} - {node2} must be a whole number of nanoseconds."
+        i, j = index[node1], index[node2]
+        rows[i][0].append(j)
+        rows[i][1].append(int(latency_nanoseconds))
+        rows[j][0].append(i)
+        rows[j][1].append(int(latency_nanoseconds))
+    return from_rows(list(node_ids), rows)
+
+
+def compile_graph(graph: "nx.Graph", node_ids: list[str] = None):
+    """Compile a networkx graph whose edges have a 'latency_nanoseconds' attribute.
+
+    Args:
+        graph (nx.Graph): The graph to compile.
+        node_ids (list[str]): Order of the node indices, the order of graph.nodes by default.
+    """
+    if node_ids is None:
+        node_ids = list(graph.nodes)
+    missing = set(graph.nodes) - set(node_ids)
+    assert not missing, f"Nodes {sorted(missing)} are in the graph but not in the simulation."
+    return from_edges(node_ids, ((node1, node2, data['latency_nanoseconds']) for node1, node2, data in graph.edges(data=True)))
+
+
+def load_edge_list(path: str, node_ids: list[str] = None):
+    """Load a topology from a text file with one "node1 node2 latency_nanoseconds" edge per line.
+
+    Empty lines and lines starting with '#' are skipped. Node indices follow node_ids if given, else the order in
+    which the nodes first appear in the file.
+    """
+    edges = []
+    seen = {} if node_ids is None else None
+    with open(path) as edge_file:
+        for line in edge_file:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            node1, node2, latency_nanoseconds = line.split()
+            edges.append((node1, node2, int(latency_nanoseconds)))
+            if seen is not None:
+                seen.setdefault(node1, None)
+                seen.setdefault(node2, None)
+    return from_edges(list(seen) if node_ids is None else node_ids, edges)
+
+
+def save_csr(topology: CompiledTopology, path: str):
+    """Save a topology in the binary CSR format read by load_csr."""
+    encoded_ids = "\n".join(topology.node_ids).encode()
+    with open(path, "wb") as csr_file:
+        csr_file.write(CSR_HEADER.pack(CSR_MAGIC, topology.get_node_count(), len(topology.neighbor_indices), len(encoded_ids)))
+        for values in (topology.neighbor_offsets, topology.neighbor_indices, topology.edge_latencies_nanoseconds):
+            array("q", values).tofile(csr_file)
+        csr_file.write(encoded_ids)
+
+
+def load_csr(path: str):
+    """Load a topology saved by save_csr, the arrays are memory mapped instead of read."""
+    import numpy as np
+
+    with open(path, "rb") as csr_file:
+        magic, node_count, entry_count, ids_length = CSR_HEADER.unpack(csr_file.read(CSR_HEADER.size))
+        assert magic == CSR_MAGIC, f"{path} is not a CSR topology file."
+        csr_file.seek(CSR_HEADER.size + 8 * (node_count + 1 + 2 * entry_count))
+        node_ids = csr_file.read(ids_length).decode().split("\n") if node_count else []
+
+    def mapped(offset, length):
+        return np.memmap(path, dtype="<i8", mode="r", offset=CSR_HEADER.size + 8 * offset, shape=(length,))
+
+    return CompiledTopology(
+        node_ids,
+        mapped(0, node_count + 1),
+        mapped(node_count + 1, entry_count),
+        mapped(node_count + 1 + entry_count, entry_count),
+    )
@@ -0,0 +1,132 @@
+from typing import Callable
+import random
+
+from .csr import CompiledTopology, from_rows
+
+# Latency of every edge, or a function of the indices of its two nodes.
+Latency = int | Callable[[int, int], int]
+
+
+def from_index_edges(node_count: int, edges: list[tuple[int, int]], latency_nanoseconds: Latency, prefix: str = "N") -> CompiledTopology:
+    """Build a topology of node_count nodes named prefix + index from (i, j) index edges."""
+    latency = latency_nanoseconds if callable(latency_nanoseconds) else (lambda i, j: latency_nanoseconds)
+    rows = [([], []) for _ in range(node_count)]
+    for i, j in edges:
+        edge_latency = int(latency(i, j))
+        rows[i][0].append(j)
+        rows[i][1].append(edge_latency)
+        rows[j][0].append(i)
+        rows[j][1].append(edge_latency)
+    return from_rows([f"{prefix}{i}" for i in range(node_count)], rows)
+
+
+def random_latencies(choices: list[int], seed: int = 0) -> Callable[[int, int], int]:
+    """Latency function drawing every edge latency from choices, the same for a given seed and edge order."""
+    rng = random.Random(seed)
+    return lambda i, j: rng.choice(choices)
+
+
+def line(node_count: int, latency_nanoseconds: Latency = 1000, **kwargs):
+    """Nodes 0 - 1 - ... - n-1."""
+    return from_index_edges(node_count, [(i, i + 1) for i in range(node_count - 1)], latency_nanoseconds, **kwargs)
+
+
+def ring(node_count: int, latency_nanoseconds: Latency = 1000, **kwargs):
+    """A line closed into a cycle, needs at least 3 nodes."""
+    assert node_count >= 3, "A ring needs at least 3 nodes."
+    return from_index_edges(node_count, [(i, (i + 1) % node_count) for i in range(node_count)], latency_nanoseconds, **kwargs)
+
+
+def mesh_2d(rows: int, columns: int, latency_nanoseconds: Latency = 1000, **kwargs):
+    """Grid of rows x columns nodes, node r * columns + c is connected to its 4 neighbors."""
+    edges = []
+    for r in range(rows):
+        for c in range(columns):
+            i = r * columns + c
+            if c + 1 < columns:
+                edges.append((i, i + 1))
+            if r + 1 < rows:
+                edges.append((i, i + columns))
+    return from_index_edges(rows * columns, edges, latency_nanoseconds, **kwargs)
+
+
+def fat_tree(k: int, latency_nanoseconds: Latency = 1000, **kwargs):
+    """k-ary fat tree, every host and switch is a node.
+
+    Nodes are the k^3 / 4 hosts first, then for each of the k pods its k / 2 edge and k / 2 aggregation switches,
+    then the (k / 2)^2 core switches. Each edge switch connects k / 2 hosts to every aggregation switch of its pod,
+    aggregation switch a of a pod connects to core switches a * k / 2 to (a + 1) * k / 2 - 1.
+    """
+    assert k >= 2 and k % 2 == 0, "k must be even."
+    half = k // 2
+    host_count = k * half * half
+    edge_start = host_count
+    aggregation_start = edge_start + k * half
+    core_start = aggregation_start + k * half
+    edges = []
+    for pod in range(k):
+        for e in range(half):
+            edge_switch = edge_start + pod * half + e
+            for h in range(half):
+                edges.append(((pod * half + e) * half + h, edge_switch))
+            for a in range(half):
+                edges.append((edge_switch, aggregation_start + pod * half + a))
+        for a in range(half):
+            for c in range(half):
+                edges.append((aggregation_start + pod * half + a, core_start + a * half + c))
+    return from_index_edges(core_start + half * half, edges, latency_nanoseconds, **kwargs)
+
+
+def fat_tree_racks(k: int, prefix: str = "N") -> tuple[dict[str, tuple], dict[str, tuple]]:
+    """Rack and pod labels by node ID of topology.fat_tree(k), e.g. for HierarchicalSyncCost.
+
+    The k / 2 hosts of an edge switch and the switch itself form a rack, the racks and aggregation switches of a pod
+    form the pod. The aggregation switches of a pod share a rack of their own, and the core switches a rack and pod.
+    """
+    assert k >= 2 and k % 2 == 0, "k must be even."
+    half = k // 2
+    host_count = k * half * half
+    edge_start = host_count
+    aggregation_start = edge_start + k * half
+    core_start = aggregation_start + k * half
+    racks, pods = {}, {}
+    for pod in range(k):
+        for e in range(half):
+            for i in [edge_start + pod * half + e] + [(pod * half + e) * half + h for h in range(half)]:
+                racks[f"{prefix}{i}"] = ("edge", pod, e)
+                pods[f"{prefix}{i}"] = ("pod", pod)
+        for a in range(half):
+            racks[f"{prefix}{aggregation_start + pod * half + a}"] = ("aggregation", pod)
+            pods[f"{prefix}{aggregation_start + pod * half + a}"] = ("pod", pod)
+    for c in range(half * half):
+        racks[f"{prefix}{core_start + c}"] = ("core",)
+        pods[f"{prefix}{core_start + c}"] = ("core",)
+    return racks, pods
+
+
+def random_regular(node_count: int, degree: int, latency_nanoseconds: Latency = 1000, seed: int = 0, **kwargs):
+    """Random graph where every node has the same degree, node_count * degree must be even."""
+    import networkx as nx
+
+    graph = nx.random_regular_graph(degree, node_count, seed=seed)
+    return from_index_edges(node_count, list(graph.edges), latency_nanoseconds, **kwargs)
+
+
+def racks(rack_count: int, rack_size: int, latency_nanoseconds: Latency = 1000, uplink_latency_nanoseconds: int = 10000, **kwargs):
+    """rack_count racks of rack_size fully connected nodes, the first node of every rack is linked to the first node of every other rack.
+
+    Node r * rack_size + i is node i of rack r. Edges within a rack have latency_nanoseconds, uplinks between racks
+    uplink_latency_nanoseconds.
+    """
+    edges = []
+    for r in range(rack_count):
+        start = r * rack_size
+        edges += [(start + i, start + j) for i in range(rack_size) for j in range(i + 1, rack_size)]
+    uplinks = {(r * rack_size, s * rack_size) for r in range(rack_count) for s in range(r + 1, rack_count)}
+    latency = latency_nanoseconds if callable(latency_nanoseconds) else (lambda i, j: latency_nanoseconds)
+    return from_index_edges(
+        rack_count * rack_size,
+        edges + sorted(uplinks),
+        lambda i, j: uplink_latency_nanoseconds if (i, j) in uplinks else latency(i, j),
+        **kwargs,
+    )
@@ -0,0 +1,40 @@
+from typing import Hashable
+
+from .csr import CompiledTopology
+
+
+def group_indices(topology: CompiledTopology, groups: dict[str, Hashable]) -> list[int]:
+    """Group index of every node from a group label by node ID, nodes without a label get a group of their own.
+
+    Groups are numbered in the order their first node appears in the topology.
+    """
+    labels = {}
+    indices = []
+    for i, node_id in enumerate(topology.node_ids):
+        label = groups[node_id] if node_id in groups else ("ungrouped", i)
+        indices.append(labels.setdefault(label, len(labels)))
+    return indices
+
+
+def detect_communities(topology: CompiledTopology, resolution: float = 1.0, seed: int = 0) -> list[int]:
+    """Group index of every node from the Louvain communities of the topology.
+
+    Edges are weighted by the inverse of their latency, so the nodes close to each other end up in the same group and
+    the slow links are the ones between groups. The result is the same for a given seed.
+
+    Args:
+        topology (CompiledTopology): The topology to split.
+        resolution (float): Louvain resolution, higher values give more and smaller communities.
+        seed (int): Seed of the Louvain node ordering.
+    """
+    import networkx as nx
+
+    graph = nx.Graph()
+    graph.add_nodes_from(range(topology.get_node_count()))
+    for i, (neighbors, latencies) in enumerate(zip(*topology.rows())):
+        for j, latency in zip(neighbors, latencies):
+            if i < j:
+                graph.add_edge(i, j, weight=1 / max(latency, 1))
+    communities = nx.community.louvain_communities(graph, resolution=resolution, seed=seed)
+    labels = {i: min(community) for community in communities for i in community}
+    return group_indices(topology, {node_id: labels[i] for i, node_id in enumerate(topology.node_ids)})
@@ -0,0 +1,213 @@
+from collections import Counter
+from typing import Hashable
+import math
+
+from .csr import CompiledTopology
+from .groups import group_indices
+
+
+def breadth_first_distances(topology: CompiledTopology, source: int) -> list[int]:
+    """Number of hops from source to every node, -1 for nodes it can not reach."""
+    neighbors = topology.rows()[0]
+    distances = [-1] * topology.get_node_count()
+    distances[source] = 0
+    frontier = [source]
+    while frontier:
+        next_frontier = []
+        for i in frontier:
+            for j in neighbors[i]:
+                if distances[j] < 0:
+                    distances[j] = distances[i] + 1
+                    next_frontier.append(j)
+        frontier = next_frontier
+    return distances
+
+
+def estimate_diameter(topology: CompiledTopology):
+    """Diameter of the topology in hops, estimated with a double sweep (exact on trees, a lower bound otherwise)."""
+    if topology.get_node_count() == 0:
+        return 0
+    distances = breadth_first_distances(topology, 0)
+    farthest = max(range(len(distances)), key=lambda i: distances[i])
+    return max(breadth_first_distances(topology, farthest))
+
+
+class SyncCostModel:
+    """Communication cost of a barrier, as a function of the number of nodes taking part and how far apart they are.
+
+    A message costs message_overhead_nanoseconds plus message_bytes over bandwidth_bytes_per_nanosecond to send, and
+    hop_latency_nanoseconds per hop of graph distance to travel. With a global barrier every node takes part and the
+    messages travel up to the diameter of the graph, with local barriers a node synchronizes with its neighbors, one
+    hop away. The cost of every node becomes its synchronization communication overhead, the first part of each of
+    its BarrierExecution.
+    """
+
+    def __init__(self, message_overhead_nanoseconds: float = 500, message_bytes: int = 64,
+                 bandwidth_bytes_per_nanosecond: float = 12.5, hop_latency_nanoseconds: float = 100):
+        """Initialize the model.
+
+        Args:
+            message_overhead_nanoseconds (float): Software cost of sending or receiving a message.
+            message_bytes (int): Size of a barrier message.
+            bandwidth_bytes_per_nanosecond (float): Link bandwidth, 12.5 bytes/ns is 100 Gbit/s.
+            hop_latency_nanoseconds (float): Latency of every hop a message travels.
+        """
+        self.message_overhead_nanoseconds = message_overhead_nanoseconds
+        self.message_bytes = message_bytes
+        self.bandwidth_bytes_per_nanosecond = bandwidth_bytes_per_nanosecond
+        self.hop_latency_nanoseconds = hop_latency_nanoseconds
+
+    def get_message_nanoseconds(self, distance: int):
+        """Time for one message to reach a node distance hops away."""
+        return self.message_overhead_nanoseconds + self.message_bytes / self.bandwidth_bytes_per_nanosecond + self.hop_latency_nanoseconds * distance
+
+    def get_cost(self, participants: int, distance: int) -> float:
+        """Communication cost of one barrier between participants nodes at most distance hops apart."""
+        raise NotImplementedError("This method should be implemented in subclasses.")
+
+    def get_costs(self, topology: CompiledTopology, has_global_barrier: bool) -> list[int]:
+        """Communication cost of the barriers of every node, in nanoseconds."""
+        node_count = topology.get_node_count()
+        if has_global_barrier:
+            cost = math.ceil(self.get_cost(node_count, estimate_diameter(topology)))
+            return [cost] * node_count
+        return [math.ceil(self.get_cost(len(neighbors) + 1, 1)) for neighbors in topology.rows()[0]]
+
+
+class FlatSyncCost(SyncCostModel):
+    """The same cost whatever the size of the cluster, what the nodes assume on their own."""
+
+    def __init__(self, nanoseconds: float = 0, **kwargs):
+        """Initialize the model with the cost of every barrier, the message parameters are not used."""
+        super().__init__(**kwargs)
+        self.nanoseconds = nanoseconds
+
+    def get_cost(self, participants: int, distance: int):
+        return self.nanoseconds
+
+
+class LinearSyncCost(SyncCostModel):
+    """A coordinator gathers an arrival from every other participant, then sends each of them a release, one by one."""
+
+    def get_cost(self, participants: int, distance: int):
+        if participants <= 1:
+            return 0
+        messages = 2 * (participants - 1)
+        return messages * self.get_message_nanoseconds(0) + 2 * self.hop_latency_nanoseconds * distance
+
+
+class TreeSyncCost(SyncCostModel):
+    """Arrivals are reduced up a tree of the given arity and releases broadcast down it."""
+
+    def __init__(self, arity: int = 2, **kwargs):
+        """Initialize the model.
+
+        Args:
+            arity (int): Number of children of every tree node.
+        """
+        assert arity >= 2, "A reduction tree has at least 2 children per node."
+        super().__init__(**kwargs)
+        self.arity = arity
+
+    def get_cost(self, participants: int, distance: int):
+        if participants <= 1:
+            return 0
+        depth = math.ceil(math.log(participants, self.arity))
+        # Every level receives from all its children before forwarding, the messages cross the graph once each way.
+        per_level = self.arity * self.get_message_nanoseconds(0)
+        return 2 * depth * per_level + 2 * self.hop_latency_nanoseconds * distance
+
+
+class DisseminationSyncCost(SyncCostModel):
+    """Butterfly / dissemination barrier: in round k every node signals the one 2^k further, ceil(log2(n)) rounds."""
+
+    def get_cost(self, participants: int, distance: int):
+        if participants <= 1:
+            return 0
+        return math.ceil(math.log2(participants)) * self.get_message_nanoseconds(distance)
+
+
+class HierarchicalSyncCost(SyncCostModel):
+    """Dissemination within racks, then between the racks of a pod, then between pods, each level with its own latency.
+
+    The racks and pods are labels by node ID, like the barrier groups of MultiNodeSimulation (see group_indices), e.g.
+    from topology.fat_tree_racks. Without racks, node i sits in rack i // rack_size, which only matches topologies
+    numbered rack by rack like topology.racks. Without pods, the racks are put racks_per_pod at a time in pods in
+    the order they appear. A local barrier only climbs to the highest level that separates a node from one of its
+    neighbors.
+    """
+
+    def __init__(self, racks: dict[str, Hashable] = None, pods: dict[str, Hashable] = None, rack_size: int = 16,
+                 racks_per_pod: int = 8, rack_latency_nanoseconds: float = 200, pod_latency_nanoseconds: float = 1000,
+                 core_latency_nanoseconds: float = 3000, **kwargs):
+        """Initialize the model.
+
+        Args:
+            racks (dict[str, Hashable]): Rack label of every node ID, nodes without one are racks of their own.
+            pods (dict[str, Hashable]): Pod label of every node ID, nodes without one are pods of their own.
+            rack_size (int): Number of nodes per rack when racks is not given.
+            racks_per_pod (int): Number of racks per pod when pods is not given.
+            rack_latency_nanoseconds (float): Message latency within a rack.
+            pod_latency_nanoseconds (float): Message latency between racks of a pod.
+            core_latency_nanoseconds (float): Message latency between pods.
+        """
+        super().__init__(**kwargs)
+        self.racks = racks
+        self.pods = pods
+        self.rack_size = rack_size
+        self.racks_per_pod = racks_per_pod
+        self.level_latencies = (rack_latency_nanoseconds, pod_latency_nanoseconds, core_latency_nanoseconds)
+
+    def get_level_cost(self, groups: int, level: int):
+        """Dissemination between groups at a level (0 rack, 1 pod, 2 core)."""
+        if groups <= 1:
+            return 0
+        message = self.get_message_nanoseconds(0) + self.level_latencies[level]
+        return math.ceil(math.log2(groups)) * message
+
+    def get_cost(self, participants: int, distance: int):
+        racks = math.ceil(participants / self.rack_size)
+        pods = math.ceil(racks / self.racks_per_pod)
+        return (
+            self.get_level_cost(min(participants, self.rack_size), 0)
+            + self.get_level_cost(min(racks, self.racks_per_pod), 1)
+            + self.get_level_cost(pods, 2)
+        )
+
+    def get_racks_and_pods(self, topology: CompiledTopology) -> tuple[list[int], list[int]]:
+        """Rack index and pod index of every node of the topology."""
+        node_count = topology.get_node_count()
+        if self.racks is None:
+            racks = [i // self.rack_size for i in range(node_count)]
+        else:
+            racks = group_indices(topology, self.racks)
+        if self.pods is None:
+            pods = [rack // self.racks_per_pod for rack in racks]
+        else:
+            pods = group_indices(topology, self.pods)
+        return racks, pods
+
+    def get_costs(self, topology: CompiledTopology, has_global_barrier: bool) -> list[int]:
+        racks, pods = self.get_racks_and_pods(topology)
+
+        if has_global_barrier:
+            # Every rack disseminates in parallel, then every pod, so the largest of each sets the cost.
+            rack_members = Counter(racks)
+            pod_racks = Counter(pod for pod, _ in set(zip(pods, racks)))
+            cost = (
+                self.get_level_cost(max(rack_members.values(), default=0), 0)
+                + self.get_level_cost(max(pod_racks.values(), default=0), 1)
+                + self.get_level_cost(len(pod_racks), 2)
+            )
+            return [math.ceil(cost)] * topology.get_node_count()
+
+        costs = []
+        for i, neighbors in enumerate(topology.rows()[0]):
+            rack, pod = racks[i], pods[i]
+            neighbor_racks = {(pods[j], racks[j]) for j in neighbors} | {(pod, rack)}
+            racks_in_pod = {r for p, r in neighbor_racks if p == pod}
+            neighbor_pods = {p for p, _ in neighbor_racks}
+            in_rack = 1 + sum(racks[j] == rack for j in neighbors)
+            cost = self.get_level_cost(in_rack, 0) + self.get_level_cost(len(racks_in_pod), 1) + self.get_level_cost(len(neighbor_pods), 2)
+            costs.append(math.ceil(cost))
+        return costs
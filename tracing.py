@@ -0,0 +1,157 @@
+import json
+
+import numpy as np
+
+from simulation_nodes import SimulationNode
+from engines.vectorized import MODES, MODE_CODES
+
+# Columns of the timeline, one row per mode transition.
+COLUMNS = {
+    "node_index": np.int32,
+    "mode": np.int8,
+    "host_time_nanoseconds": np.int64,
+    "target_time_nanoseconds": np.int64,
+    "instructions": np.int64,
+}
+
+
+class TimelineRecorder:
+    """Records every mode transition of the nodes into growable NumPy buffers, for viewing the run in Perfetto.
+
+    A row holds the node index, the mode it entered (encoded with MODE_CODES) and the host time, target time and
+    instructions of the node at that moment. The buffers start at initial_capacity rows and double when full, so
+    recording is an append into preallocated arrays. The recorder listens to change_mode like the BarrierTracker,
+    engines that keep the node state elsewhere (engines.VectorizedEngine) record their transitions with record_many.
+    Periods skipped by fast forward are not recorded.
+    """
+
+    def __init__(self, nodes: list[SimulationNode], initial_capacity: int = 1 << 16):
+        """Initialize the recorder and start listening to the nodes.
+
+        Args:
+            nodes (list[SimulationNode]): The nodes of the simulation, in simulation order.
+            initial_capacity (int): Number of rows allocated up front.
+        """
+        self.nodes = nodes
+        self.index = {node.get_id(): i for i, node in enumerate(nodes)}
+        self.buffers = {name: np.empty(max(initial_capacity, 1), dtype=dtype) for name, dtype in COLUMNS.items()}
+        self.row_count = 0
+
+        # The nodes are already initialized, their first quanta started before the recorder existed.
+        for node in nodes:
+            self.on_mode_change(node, None)
+            node.add_mode_listener(self.on_mode_change)
+
+    def __getstate__(self):
+        """Pickle only the recorded rows, the buffers grow back when recording continues."""
+        state = self.__dict__.copy()
+        state["buffers"] = {name: buffer[:max(self.row_count, 1)].copy() for name, buffer in self.buffers.items()}
+        return state
+
+    def reserve(self, row_count: int):
+        """Make room for row_count more rows."""
+        needed = self.row_count + row_count
+        capacity = len(self.buffers["mode"])
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name, buffer in self.buffers.items():
+            grown = np.empty(capacity, dtype=buffer.dtype)
+            grown[:self.row_count] = buffer[:self.row_count]
+            self.buffers[name] = grown
+
+    def on_mode_change(self, node: SimulationNode, previous_mode: str):
+        """Mode listener, append the transition of the node."""
+        if self.row_count == len(self.buffers["mode"]):
+            self.reserve(1)
+        row = self.row_count
+        buffers = self.buffers
+        buffers["node_index"][row] = self.index[node.get_id()]
+        buffers["mode"][row] = MODE_CODES[node.MODE]
+        buffers["host_time_nanoseconds"][row] = node.current_host_time_nanoseconds
+        buffers["target_time_nanoseconds"][row] = node.current_target_time_nanoseconds
+        buffers["instructions"][row] = node.target_instructions_executed
+        self.row_count += 1
+
+    def record_many(self, node_indices: np.ndarray, mode: int, host_time_nanoseconds: int, target_time_nanoseconds: np.ndarray, instructions: np.ndarray):
+        """Append the transitions of several nodes entering the same mode at the same host time."""
+        count = len(node_indices)
+        self.reserve(count)
+        rows = slice(self.row_count, self.row_count + count)
+        self.buffers["node_index"][rows] = node_indices
+        self.buffers["mode"][rows] = mode
+        self.buffers["host_time_nanoseconds"][rows] = host_time_nanoseconds
+        self.buffers["target_time_nanoseconds"][rows] = target_time_nanoseconds
+        self.buffers["instructions"][rows] = instructions
+        self.row_count += count
+
+    def get_row_count(self):
+        """Get the number of recorded transitions."""
+        return self.row_count
+
+    def to_arrays(self):
+        """Get the recorded columns as arrays (views of the buffers), in recording order."""
+        return {name: buffer[:self.row_count] for name, buffer in self.buffers.items()}
+
+    def intervals(self):
+        """Get, for every recorded transition, how long the node stayed in that mode.
+
+        Returns the columns sorted by node and host time, with an extra "end_host_time_nanoseconds" column. The last
+        mode of each node ends at the last recorded host time.
+        """
+        columns = self.to_arrays()
+        order = np.lexsort((columns["host_time_nanoseconds"], columns["node_index"]))
+        columns = {name: values[order] for name, values in columns.items()}
+        end = np.empty(self.row_count, dtype=np.int64)
+        end[:-1] = columns["host_time_nanoseconds"][1:]
+        last_of_node = np.ones(self.row_count, dtype=bool)
+        last_of_node[:-1] = columns["node_index"][1:] != columns["node_index"][:-1]
+        end[last_of_node] = columns["host_time_nanoseconds"].max(initial=0)
+        columns["end_host_time_nanoseconds"] = end
+        return columns
+
+    def export_chrome_trace(self, path: str):
+        """Write the timeline as Chrome trace-event JSON, one track per node, which Perfetto and chrome://tracing open.
+
+        Each mode interval is a complete event named after the mode, with the target time and instructions as
+        arguments. Times are in microseconds as the format expects.
+        """
+        columns = self.intervals()
+        with open(path, "w") as trace_file:
+            trace_file.write('{"displayTimeUnit": "ns", "traceEvents": [\n')
+            events = (
+                {"name": "thread_name", "ph": "M", "pid": 0, "tid": i, "args": {"name": node.get_id()}}
+                for i, node in enumerate(self.nodes)
+            )
+            trace_file.write(",\n".join(json.dumps(event) for event in events))
+            rows = zip(*(columns[name].tolist() for name in (
+                "node_index", "mode", "host_time_nanoseconds", "end_host_time_nanoseconds", "target_time_nanoseconds", "instructions"
+            )))
+            for node_index, mode, start, end, target_time, instructions in rows:
+                if end <= start:
+                    continue
+                trace_file.write(",\n" + json.dumps({
+                    "name": MODES[mode], "ph": "X", "pid": 0, "tid": node_index, "ts": start / 1000, "dur": (end - start) / 1000,
+                    "args": {"target_time_nanoseconds": target_time, "instructions": instructions},
+                }))
+            trace_file.write("\n]}\n")
+
+    def export_parquet(self, path: str):
+        """Write the recorded transitions to a Parquet file, with the node IDs and mode names as dictionary columns. Needs pyarrow."""
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as error:
+            raise ImportError("Exporting the timeline to Parquet needs pyarrow, install it with pip install pyarrow.") from error
+
+        columns = self.to_arrays()
+        table = pa.table({
+            "node_index": columns["node_index"],
+            "node_id": pa.DictionaryArray.from_arrays(columns["node_index"], [node.get_id() for node in self.nodes]),
+            "mode": pa.DictionaryArray.from_arrays(columns["mode"], list(MODES)),
+            "host_time_nanoseconds": columns["host_time_nanoseconds"],
+            "target_time_nanoseconds": columns["target_time_nanoseconds"],
+            "instructions": columns["instructions"],
+        })
+        pq.write_table(table, path)